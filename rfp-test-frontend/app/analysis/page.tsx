@@ -262,7 +262,9 @@ export default function AnalysisPage() {
     const fetchSimilarityScore = async () => {
       try {
         console.log('Fetching similarity score...');
-        const response = await fetch('http://localhost:8000/api/rfp/compare-indexes/', {
+        const sessionId = localStorage.getItem('rfpSessionId');
+        const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+        const response = await fetch(`http://localhost:8000/api/rfp/compare-indexes/${query}`, {
           method: 'GET',
           headers: {
             'Content-Type': 'application/json',
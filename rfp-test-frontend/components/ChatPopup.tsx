@@ -77,22 +77,53 @@ Example questions you can ask:
     try {
       setChatHistory(prev => [...prev, { type: 'bot', content: '...' }])
 
-      const response = await fetch('http://127.0.0.1:8000/api/rfp/chat/', {
+      const response = await fetch('http://127.0.0.1:8000/api/rfp/chat/stream/', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Accept': 'text/event-stream',
         },
         body: JSON.stringify({
-          question: message
+          question: message,
+          session_id: localStorage.getItem('rfpSessionId')
         }),
       })
-
-      const data = await response.json()
-      
-      setChatHistory(prev => [...prev.slice(0, -1), { 
-        type: 'bot', 
-        content: data.answer.answer || data.answer // Handle both possible response formats
-      }])
+      if (!response.ok || !response.body) {
+        throw new Error(`Chat request failed: ${response.status}`)
+      }
+
+      // Show the answer as it is written: append each "token" event to the
+      // last bot message; "complete" carries the final answer
+      const setBotMessage = (update: (content: string) => string) =>
+        setChatHistory(prev => {
+          const last = prev[prev.length - 1]
+          const content = update(last.content === '...' ? '' : last.content)
+          return [...prev.slice(0, -1), { type: 'bot', content }]
+        })
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split('\n\n')
+        buffer = events.pop() || ''
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1]
+          const data = raw.match(/^data: (.*)$/m)?.[1]
+          if (!event || !data) continue
+          const payload = JSON.parse(data)
+          if (event === 'token') {
+            setBotMessage(content => content + payload.text)
+          } else if (event === 'complete') {
+            setBotMessage(() => payload.answer)
+          } else if (event === 'error') {
+            setBotMessage(() => payload.answer || 'Sorry, I encountered an error.')
+          }
+        }
+      }
     } catch (error) {
       console.error('Error:', error)
       setChatHistory(prev => [...prev.slice(0, -1), { 
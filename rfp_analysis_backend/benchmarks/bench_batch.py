@@ -0,0 +1,134 @@
+"""
+Compare the batch pipeline (analyze/batch/) with ingesting and analyzing the
+same PDFs one after another, as one analyze-pdf/ then one analyze/ call per
+file.
+
+--copies copies of each PDF are made distinct by a trailing comment after
+%%EOF, so every copy misses the ingestion and analysis caches. A local fake
+OpenAI server answers /embeddings at once and every section prompt after
+--llm-latency seconds. The pipeline runs first: later runs find the chunk
+embeddings cached, which only favours the sequential run. Reported are the
+time to the first finished PDF, the total time, and each stage's busy
+seconds and peak concurrency in the pipeline.
+
+    python benchmarks/bench_batch.py ../ACU.pdf rfp/education-rfp.pdf --copies 4 --llm-latency 1.5
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ["VECTOR_STORE_BACKEND"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ["ANALYSIS_SECTION_RETRIES"] = "0"
+_cache_dir = tempfile.mkdtemp(prefix="bench-batch-")
+for name, path in (("INGESTION_CACHE_DIR", "ingestion"), ("EMBEDDING_CACHE_PATH", "embeddings.sqlite3"),
+                   ("KEYWORD_INDEX_DIR", "keyword_index"), ("SIMILARITY_DIR", "similarity"),
+                   ("QUERY_EMBEDDINGS_DIR", "query_embeddings")):
+    os.environ[name] = os.path.join(_cache_dir, path)
+
+import django  # noqa: E402
+
+django.setup()
+
+from bench_chat_stream import make_handler  # noqa: E402
+
+
+def make_copies(pdfs, copies, directory, tag):
+    """Write byte-distinct copies of the PDFs and return BatchItems for them."""
+    from rfp.batch import BatchItem
+
+    items = []
+    for copy in range(copies):
+        for pdf in pdfs:
+            with open(pdf, "rb") as f:
+                data = f.read() + f"\n%{tag}-{copy}\n".encode()
+            path = os.path.join(directory, f"{tag}-{len(items):04d}.pdf")
+            with open(path, "wb") as f:
+                f.write(data)
+            items.append(BatchItem(len(items), os.path.basename(pdf), path, hashlib.sha256(data).hexdigest()))
+    return items
+
+
+def sequential(items):
+    """One analyze-pdf/ then one analyze/ per PDF, as the views run them."""
+    from asgiref.sync import async_to_sync
+    from pinecone_store import reset_document_store
+    from rfp.ingestion import ingest_pdf
+    from rfp.keyword_index import get_session_index
+    from rfp.models import RFPDocument
+    from rfp.rfp_analyzer import RFPAnalyzer
+
+    start = time.perf_counter()
+    first = None
+    for item in items:
+        store = reset_document_store(item.session_id)
+        ingestion = ingest_pdf(item.path, item.content_hash, store, session_id=item.session_id)
+        RFPDocument.objects.create(file=item.file_name, content_hash=item.content_hash,
+                                   session_id=item.session_id, extracted_text=ingestion.text)
+        analyzer = RFPAnalyzer(vector_store=store, keyword_index=get_session_index(item.session_id))
+        async_to_sync(analyzer.analyze_rfp)(ingestion.text)
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start, None
+
+
+def pipelined(items):
+    from rfp.batch import build_pipeline
+
+    pipeline = build_pipeline()
+    start = time.perf_counter()
+    first = None
+    for item in pipeline.run(items):
+        assert not item.error, item.error
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start, pipeline.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--copies", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="seconds per section prompt")
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(50, args.llm_latency, 0.0, args.dimension))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    from django.test.runner import DiscoverRunner
+    from rfp.batch import batch_settings
+
+    DiscoverRunner(verbosity=0).setup_databases()
+    directory = tempfile.mkdtemp(prefix="bench-batch-pdfs-")
+    try:
+        results = []
+        for name, run in (("pipeline", pipelined), ("sequential", sequential)):
+            items = make_copies(args.pdfs, args.copies, directory, name)
+            results.append((name, len(items)) + run(items))
+
+        limits = batch_settings()
+        print(f"\nstage limits: extracting {limits['extracting']}, embedding {limits['embedding']}, "
+              f"indexing {limits['indexing']}, analyzing {limits['analyzing']}; "
+              f"LLM latency {args.llm_latency}s per section")
+        print(f"{'mode':<12} {'pdfs':>5} {'first done s':>13} {'total s':>8} {'s/pdf':>6}")
+        for name, count, first, total, _ in results:
+            print(f"{name:<12} {count:>5} {first:>13.2f} {total:>8.2f} {total / count:>6.2f}")
+        print(f"\n{'stage':<12} {'busy s':>7} {'peak in flight':>15}")
+        for stage, stats in results[0][4].items():
+            print(f"{stage:<12} {stats['busy_seconds']:>7.2f} {stats['peak_in_flight']:>15}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(_cache_dir, ignore_errors=True)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
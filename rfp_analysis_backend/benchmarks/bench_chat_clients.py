@@ -0,0 +1,162 @@
+"""
+Measure the per-message cost of building a new OpenAI client for every chat
+message against the shared, keep-alive client from rfp.clients.
+
+A local fake OpenAI server answers /embeddings and /chat/completions over
+real TLS (a throwaway self-signed certificate made with the openssl CLI) and
+HTTP/1.1 keep-alive. --connect-latency adds a delay to every new connection
+to stand in for the network round trips of a TCP + TLS handshake to a
+remote API; --latency is the time the "model" takes per request. Retrieval
+runs against an in-memory session store.
+
+    python benchmarks/bench_chat_clients.py --messages 50 --connect-latency 0.1
+"""
+import argparse
+import json
+import os
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ["VECTOR_STORE_BACKEND"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+import django  # noqa: E402
+
+django.setup()
+
+
+def make_handler(latency, connect_latency, dimension, stats):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            with stats["lock"]:
+                stats["connections"] += 1
+            time.sleep(connect_latency)
+            super().setup()
+            # Answer in one segment instead of waiting on the client's delayed ACK
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if self.path.endswith("/embeddings"):
+                payload = {
+                    "object": "list",
+                    "data": [{"object": "embedding", "index": i, "embedding": [0.1] * dimension}
+                             for i in range(len(request["input"]))],
+                    "model": request["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }
+            else:
+                payload = {
+                    "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "The proposal is due on 1 May."}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeOpenAIHandler
+
+
+def start_tls_server(handler):
+    scratch = tempfile.mkdtemp()
+    cert, key = os.path.join(scratch, "cert.pem"), os.path.join(scratch, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # httpx trusts SSL_CERT_FILE, so both the fresh and the pooled clients accept the certificate
+    os.environ["SSL_CERT_FILE"] = cert
+    os.environ["OPENAI_BASE_URL"] = f"https://127.0.0.1:{server.server_port}/v1"
+    return server
+
+
+def run_messages(ask, count, threads):
+    def timed(i):
+        start = time.perf_counter()
+        response = ask(f"Question {i} {time.time_ns()}: when is the proposal due?")
+        assert response["success"], response
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(timed, range(count)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent chat requests in the last run")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake API request")
+    parser.add_argument("--connect-latency", type=float, default=0.1, help="extra seconds per new connection")
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    stats = {"connections": 0, "lock": threading.Lock()}
+    server = start_tls_server(make_handler(args.latency, args.connect_latency, args.dimension, stats))
+
+    from haystack import Document
+    from openai import OpenAI
+    from pinecone_store import get_document_store
+    from rfp.rfp_chatbot import RFPChatbot
+
+    session_id = "bench-chat"
+    get_document_store(session_id).write_documents([
+        Document(content=f"Section {i}: proposals are due on 1 May.", embedding=[0.1] * args.dimension)
+        for i in range(20)
+    ])
+
+    def fresh_client(question):
+        # What chat_with_rfp did before: a new client, and so a new connection pool, per message
+        return RFPChatbot(session_id=session_id, client=OpenAI()).get_response(question)
+
+    def pooled_client(question):
+        return RFPChatbot(session_id=session_id).get_response(question)
+
+    runs = [
+        ("new client per message", fresh_client, 1),
+        ("shared pooled client", pooled_client, 1),
+        (f"shared, {args.threads} threads", pooled_client, args.threads),
+    ]
+    print(f"{args.messages} messages, {args.latency}s per API call, {args.connect_latency}s per new connection")
+    print(f"{'client':<26} {'p50 ms':>8} {'p95 ms':>8} {'msg/s':>7} {'connections':>12}")
+    for name, ask, threads in runs:
+        before = stats["connections"]
+        latencies, elapsed = run_messages(ask, args.messages, threads)
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{name:<26} {statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} "
+              f"{args.messages / elapsed:>7.1f} {stats['connections'] - before:>12}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
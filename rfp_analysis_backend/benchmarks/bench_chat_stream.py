@@ -0,0 +1,151 @@
+"""
+Compare time to first token of the streaming chat endpoint (chat/stream/)
+with the time the blocking endpoint (chat/) takes to return anything.
+
+A local fake OpenAI server answers /embeddings at once and streams a
+/chat/completions answer of --tokens tokens, one every --token-latency
+seconds after --first-token-latency. Requests go through Django's test
+client against an in-memory session store. The fake embeddings are all the
+same, so the answer cache is switched off (a threshold no cosine reaches)
+and every question reaches the model.
+
+    python benchmarks/bench_chat_stream.py --messages 10 --tokens 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ["VECTOR_STORE_BACKEND"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ["ANSWER_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "answers.sqlite3")
+os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+
+import django  # noqa: E402
+
+django.setup()
+
+
+def make_handler(tokens, first_token_latency, token_latency, dimension):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _chunk(self, model, delta, finish_reason=None):
+            return {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.endswith("/embeddings"):
+                self._reply({
+                    "object": "list",
+                    "data": [{"object": "embedding", "index": i, "embedding": [0.1] * dimension}
+                             for i in range(len(request["input"]))],
+                    "model": request["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                })
+                return
+
+            words = [f"word{i} " for i in range(tokens)]
+            time.sleep(first_token_latency)
+            if not request.get("stream"):
+                time.sleep(token_latency * (tokens - 1))
+                self._reply({
+                    "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words)}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+                })
+                return
+
+            # Close-delimited event stream, one chunk per token
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(token_latency)
+                self.wfile.write(f"data: {json.dumps(self._chunk(request['model'], {'content': word}))}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(f"data: {json.dumps(self._chunk(request['model'], {}, 'stop'))}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def _reply(self, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeOpenAIHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per answer")
+    parser.add_argument("--first-token-latency", type=float, default=0.4)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    handler = make_handler(args.tokens, args.first_token_latency, args.token_latency, args.dimension)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    from django.test import Client
+    from haystack import Document
+    from pinecone_store import get_document_store
+
+    session_id = "bench-stream"
+    get_document_store(session_id).write_documents([
+        Document(content=f"Section {i}: proposals are due on 1 May.", embedding=[0.1] * args.dimension)
+        for i in range(20)
+    ])
+    client = Client()
+
+    def blocking(question):
+        start = time.perf_counter()
+        response = client.post("/api/rfp/chat/", {"question": question, "session_id": session_id},
+                               content_type="application/json")
+        assert response.json()["success"]
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+
+    def streaming(question):
+        start = time.perf_counter()
+        response = client.post("/api/rfp/chat/stream/", {"question": question, "session_id": session_id},
+                               content_type="application/json")
+        first = None
+        for chunk in response.streaming_content:
+            if first is None and chunk.startswith(b"event: token"):
+                first = time.perf_counter() - start
+        assert b"event: complete" in chunk
+        return first, time.perf_counter() - start
+
+    print(f"{args.tokens}-token answers, first token after {args.first_token_latency}s, "
+          f"{args.token_latency}s per token")
+    print(f"{'endpoint':<14} {'first byte ms':>14} {'complete ms':>12}")
+    for name, ask in (("chat/", blocking), ("chat/stream/", streaming)):
+        firsts, totals = [], []
+        for i in range(args.messages):
+            first, total = ask(f"Question {i} for {name} at {time.time_ns()}")
+            firsts.append(first)
+            totals.append(total)
+        print(f"{name:<14} {statistics.median(firsts) * 1000:>14.1f} {statistics.median(totals) * 1000:>12.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare the token-budgeted chunker with the previous sentence splitter on a PDF.
+
+For each chunker it reports the chunk count, token totals and the time to
+chunk, embed and index the PDF. Embedding goes to a local fake embedding
+server (see bench_embeddings.py) with a fixed per-request latency, and
+indexing to an in-memory LocalVectorDocumentStore, so the measured time
+tracks the number of chunks sent rather than network noise.
+
+The previous splitter is DocumentSplitter(split_by="sentence", split_length=3,
+split_overlap=1), which needs NLTK's punkt_tab data; without it, pass
+--baseline-split-by period to approximate it with period splitting.
+
+    python benchmarks/bench_chunking.py ../ACU.pdf --latency 0.2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from asgiref.sync import async_to_sync  # noqa: E402
+from haystack import Document  # noqa: E402
+from haystack.components.preprocessors import DocumentSplitter  # noqa: E402
+from bench_embeddings import make_handler  # noqa: E402
+from rfp.chunking import TokenChunker  # noqa: E402
+from rfp.embeddings import ConcurrentEmbedder  # noqa: E402
+from rfp.ingestion import chunking_settings, pages_to_text  # noqa: E402
+from rfp.local_store import LocalVectorDocumentStore  # noqa: E402
+from rfp.pdf_extraction import extract_pages  # noqa: E402
+from rfp.tokens import count_tokens, get_encoding  # noqa: E402
+
+
+def ingest(chunk, pages, args):
+    """Chunk, embed and index; returns (chunks, chunking seconds, total seconds)."""
+    start = time.perf_counter()
+    documents = chunk(pages)
+    chunked = time.perf_counter() - start
+    embedder = ConcurrentEmbedder(api_key="fake", batch_size=args.batch_size, max_in_flight=args.max_in_flight)
+    vectors = async_to_sync(embedder.embed)([doc.content for doc in documents])
+    for doc, vector in zip(documents, vectors):
+        doc.embedding = vector
+    LocalVectorDocumentStore(dimension=args.dimension).write_documents(documents)
+    return documents, chunked, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf")
+    parser.add_argument("--baseline-split-by", default="sentence", help="DocumentSplitter split_by for the baseline")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake embedding request")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, 0, args.dimension))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    pages = extract_pages(args.pdf)
+    chunking = chunking_settings()
+    if get_encoding() is None:
+        print("tiktoken encoding unavailable: token counts below are estimates\n")
+
+    splitter = DocumentSplitter(split_by=args.baseline_split_by, split_length=3, split_overlap=1)
+    splitter.warm_up()
+    chunker = TokenChunker(chunking["max_tokens"], chunking["overlap_tokens"], chunking["min_tokens"])
+    chunkers = {
+        f"DocumentSplitter ({args.baseline_split_by})":
+            lambda pages: splitter.run([Document(content=pages_to_text(pages))])["documents"],
+        f"TokenChunker ({chunking['max_tokens']} tokens)": lambda pages: chunker.run(pages)["documents"],
+    }
+
+    print(f"{args.pdf}: {len(pages)} pages, fake embedding latency {args.latency}s, batch {args.batch_size}")
+    print(f"{'chunker':<30} {'chunks':>7} {'tokens':>8} {'mean':>6} {'max':>6} {'chunk s':>8} {'ingest s':>9}")
+    results = {}
+    for name, chunk in chunkers.items():
+        documents, chunked, total = ingest(chunk, pages, args)
+        tokens = [count_tokens(doc.content) for doc in documents]
+        results[name] = (len(documents), total)
+        print(f"{name:<30} {len(documents):>7} {sum(tokens):>8} {sum(tokens) / len(tokens):>6.0f} "
+              f"{max(tokens):>6} {chunked:>8.3f} {total:>9.2f}")
+
+    (baseline_chunks, baseline_seconds), (chunks, seconds) = results.values()
+    print(f"\n{1 - chunks / baseline_chunks:.0%} fewer chunks, "
+          f"{1 - seconds / baseline_seconds:.0%} less ingestion time")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
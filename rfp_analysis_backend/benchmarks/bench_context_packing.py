@@ -0,0 +1,108 @@
+"""
+Measure what context packing saves: prompt tokens of the retrieved chunks
+pasted as they are against the same chunks merged, deduplicated and packed
+into a token budget, and whether the answer is still in the packed context.
+
+Retrieval is hybrid (vector + BM25 fused by reciprocal rank fusion) over the
+PDF's chunks, with bench_hybrid_retrieval.py's questions and embedders. For
+the chat questions, --top-k chunks are retrieved per question and packed at
+each of --budgets; for every analysis section, the section's registered
+queries are retrieved and packed at ANALYSIS_CONTEXT_MAX_TOKENS.
+
+    python benchmarks/bench_context_packing.py ../ACU.pdf --top-k 10 --budgets 3000 2000 1000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from asgiref.sync import async_to_sync  # noqa: E402
+from django.conf import settings  # noqa: E402
+from bench_hybrid_retrieval import ACU_QUESTIONS, hashing_embedder  # noqa: E402
+from rfp.analysis_schema import SECTIONS  # noqa: E402
+from rfp.chunking import TokenChunker  # noqa: E402
+from rfp.context_packing import pack_context, render_context, sum_stats  # noqa: E402
+from rfp.embeddings import ConcurrentEmbedder, EMBEDDING_MODEL  # noqa: E402
+from rfp.ingestion import chunking_settings  # noqa: E402
+from rfp.keyword_index import BM25Index, reciprocal_rank_fusion  # noqa: E402
+from rfp.local_store import LocalEmbeddingRetriever, LocalVectorDocumentStore  # noqa: E402
+from rfp.pdf_extraction import extract_pages  # noqa: E402
+from rfp.retrieval_queries import section_queries  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf")
+    parser.add_argument("--embeddings", choices=["openai", "hashing"], default="hashing")
+    parser.add_argument("--top-k", type=int, default=10, help="chunks retrieved per chat question")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[3000, 2000, 1500, 1000])
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    chunking = chunking_settings()
+    chunker = TokenChunker(chunking["max_tokens"], chunking["overlap_tokens"], chunking["min_tokens"])
+    documents = chunker.run(extract_pages(args.pdf))["documents"]
+    if args.embeddings == "openai":
+        embed = async_to_sync(ConcurrentEmbedder(model=EMBEDDING_MODEL).embed)
+    else:
+        embed = hashing_embedder(args.dimension)
+    for doc, vector in zip(documents, embed([doc.content for doc in documents])):
+        doc.embedding = vector
+    store = LocalVectorDocumentStore(dimension=len(documents[0].embedding))
+    store.write_documents(documents)
+    retriever = LocalEmbeddingRetriever(store)
+    keyword_index = BM25Index(documents)
+
+    def retrieve(queries, top_k_per_query, top_k):
+        vectors = embed(queries)
+        rankings = [retriever.run(query_embedding=vector, top_k=top_k_per_query)["documents"] for vector in vectors]
+        rankings += [keyword_index.search(query, top_k=top_k_per_query) for query in queries]
+        return reciprocal_rank_fusion(rankings, top_k=top_k)
+
+    print(f"{len(documents)} chunks, {args.embeddings} embeddings, overlap {chunking['overlap_tokens']} tokens")
+    retrieved = [retrieve([question], args.top_k, args.top_k) for question, _ in ACU_QUESTIONS]
+
+    def recall(contexts):
+        return sum(
+            bool(re.search(pattern, context, re.IGNORECASE)) for context, (_, pattern) in zip(contexts, ACU_QUESTIONS)
+        ) / len(ACU_QUESTIONS)
+
+    raw = [render_context(matches) for matches in retrieved]
+    raw_stats = [pack_context(matches, 10 ** 9).stats for matches in retrieved]
+    print(f"\nchat: {len(ACU_QUESTIONS)} questions, top {args.top_k} chunks each")
+    print(f"{'budget':>8} {'tokens/question':>16} {'passages':>9} {'recall':>7} {'pack ms':>8}")
+    print(f"{'raw':>8} {sum_stats(raw_stats)['raw_tokens'] / len(raw):>16.0f} "
+          f"{sum_stats(raw_stats)['chunks'] / len(raw):>9.1f} {recall(raw):>7.2f} {'':>8}")
+    for budget in [10 ** 9] + args.budgets:
+        start = time.perf_counter()
+        packed = [pack_context(matches, budget) for matches in retrieved]
+        elapsed = (time.perf_counter() - start) * 1000 / len(packed)
+        totals = sum_stats([entry.stats for entry in packed])
+        label = "none" if budget == 10 ** 9 else budget
+        print(f"{label:>8} {totals['packed_tokens'] / len(packed):>16.0f} {totals['passages'] / len(packed):>9.1f} "
+              f"{recall([render_context(entry.documents) for entry in packed]):>7.2f} {elapsed:>8.2f}")
+
+    budget = getattr(settings, "ANALYSIS_CONTEXT_MAX_TOKENS", 3000)
+    top_k = getattr(settings, "ANALYSIS_HYBRID_SECTION_TOP_K", 6)
+    field_top_k = getattr(settings, "ANALYSIS_FIELD_TOP_K", 4)
+    print(f"\nanalysis: top {top_k} fused chunks per section, budget {budget}")
+    print(f"{'section':<26} {'raw tokens':>11} {'packed':>7} {'saved':>6}")
+    section_stats = []
+    for section in SECTIONS:
+        stats = pack_context(retrieve(section_queries(section), field_top_k, top_k), budget).stats
+        section_stats.append(stats)
+        print(f"{section:<26} {stats['raw_tokens']:>11} {stats['packed_tokens']:>7} {stats['saved_tokens']:>6}")
+    totals = sum_stats(section_stats)
+    print(f"{'total':<26} {totals['raw_tokens']:>11} {totals['packed_tokens']:>7} {totals['saved_tokens']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the concurrent embedding stage against a local fake embedding server.
+
+The fake server answers OpenAI-style /embeddings requests after a fixed delay
+and, optionally, returns 429 once more than --server-capacity requests are in
+flight. Throughput should scale close to linearly with the in-flight limit
+until the limit (or the server capacity) is reached.
+
+    python benchmarks/bench_embeddings.py --chunks 3000 --latency 0.2
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from asgiref.sync import async_to_sync  # noqa: E402
+from rfp.embeddings import ConcurrentEmbedder  # noqa: E402
+
+
+def make_handler(latency, capacity, dimension):
+    state = {"in_flight": 0, "lock": threading.Lock()}
+    # The openai client asks for base64 vectors; encode one up front so the fake
+    # server's own CPU time does not drown out the network latency being simulated.
+    vector_b64 = base64.b64encode(np.full(dimension, 0.1, dtype=np.float32).tobytes()).decode("ascii")
+
+    class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with state["lock"]:
+                if capacity and state["in_flight"] >= capacity:
+                    self._reply(429, {"error": {"message": "Rate limit reached"}}, {"retry-after": "0.2"})
+                    return
+                state["in_flight"] += 1
+            try:
+                time.sleep(latency)
+                if request.get("encoding_format") == "base64":
+                    vector = vector_b64
+                else:
+                    vector = [0.1] * dimension
+                data = [
+                    {"object": "embedding", "index": i, "embedding": vector}
+                    for i in range(len(request["input"]))
+                ]
+                self._reply(200, {
+                    "object": "list",
+                    "data": data,
+                    "model": request["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                })
+            finally:
+                with state["lock"]:
+                    state["in_flight"] -= 1
+
+    return FakeEmbeddingHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake request")
+    parser.add_argument("--server-capacity", type=int, default=0, help="429 above this many in-flight requests")
+    parser.add_argument("--limits", default="1,2,4,8,16", help="in-flight limits to compare")
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, args.server_capacity, args.dimension))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    texts = [f"chunk {i} of a long government RFP" for i in range(args.chunks)]
+    baseline = None
+    print(f"{'in-flight':>9} {'seconds':>8} {'chunks/s':>9} {'speedup':>8} {'429s':>5}")
+    for limit in (int(value) for value in args.limits.split(",")):
+        embedder = ConcurrentEmbedder(api_key="fake", batch_size=args.batch_size, max_in_flight=limit)
+        vectors = async_to_sync(embedder.embed)(texts)
+        assert len(vectors) == len(texts)
+        stats = embedder.last_stats
+        baseline = baseline or stats["chunks_per_second"]
+        print(
+            f"{limit:>9} {stats['seconds']:>8.2f} {stats['chunks_per_second']:>9.1f} "
+            f"{stats['chunks_per_second'] / baseline:>7.2f}x {stats['rate_limited']:>5}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare the streaming write-only Excel report with building the same report
+in an in-memory openpyxl Workbook, for reports over many RFPs.
+
+Each RFP is a synthetic analysis with every schema field filled with
+--value-chars characters. Reports are the Summary and Details sheets from
+exports.write_report(). The in-memory version appends the same rows to a
+normal Workbook and saves it to a BytesIO, as download_report used to.
+Peak Python memory is measured with tracemalloc; "first byte" is when the
+streaming export hands its first chunk to the response, which comes once the
+rows are written and the workbook starts being zipped.
+
+    python benchmarks/bench_exports.py --rfps 50 200 500
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from openpyxl import Workbook  # noqa: E402
+from rfp.analysis_schema import SECTIONS  # noqa: E402
+from rfp.exports import iterate_xlsx, write_report  # noqa: E402
+
+
+def analyses(count, value_chars):
+    """Lazily generated analyses, like the report view's queryset iterator."""
+    for index in range(count):
+        result = {
+            section: {
+                field: {"value": f"RFP {index} {field} " + "x" * value_chars, "confidence": 0.8, "is_interpreted": False}
+                for field in fields
+            }
+            for section, fields in SECTIONS.items()
+        }
+        yield f"rfp_{index}.pdf", "2026-01-01 00:00", result
+
+
+class _InMemoryWorkbook(Workbook):
+    """A normal Workbook that write_report() can fill: sheets are created empty, without the default sheet."""
+
+    def __init__(self):
+        super().__init__()
+        self.remove(self.active)
+
+
+def in_memory(count, value_chars):
+    workbook = _InMemoryWorkbook()
+    write_report(workbook, analyses(count, value_chars))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return len(buffer.getvalue()), None
+
+
+def streaming(count, value_chars):
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in iterate_xlsx(lambda workbook: write_report(workbook, analyses(count, value_chars))):
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    return size, first_byte
+
+
+def measure(export, count, value_chars):
+    """Time one run, then trace a second one for peak memory (tracemalloc slows exports several times over)."""
+    start = time.perf_counter()
+    size, first_byte = export(count, value_chars)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    export(count, value_chars)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, seconds, first_byte, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rfps", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--value-chars", type=int, default=300)
+    args = parser.parse_args()
+
+    fields = sum(len(fields) for fields in SECTIONS.values())
+    print(f"{fields} fields per RFP, {args.value_chars} characters per value")
+    print(f"{'rfps':>6} {'export':<10} {'size MB':>8} {'seconds':>8} {'first byte s':>13} {'peak MB':>8}")
+    for count in args.rfps:
+        for name, export in (("in-memory", in_memory), ("streaming", streaming)):
+            size, seconds, first_byte, peak = measure(export, count, args.value_chars)
+            first = f"{first_byte:.2f}" if first_byte is not None else "-"
+            print(f"{count:>6} {name:<10} {size / 2 ** 20:>8.2f} {seconds:>8.2f} {first:>13} {peak / 2 ** 20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
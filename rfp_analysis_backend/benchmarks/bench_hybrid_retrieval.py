@@ -0,0 +1,141 @@
+"""
+Compare vector-only retrieval with hybrid (vector + BM25, fused by
+reciprocal rank fusion) on a PDF: recall@k over a set of questions whose
+answers are known, and the context tokens each needs to reach a given recall.
+
+The PDF is chunked with the ingestion chunker and indexed in a
+LocalVectorDocumentStore and a keyword_index.BM25Index. A question counts as
+recalled at k when one of its top k chunks matches the answer pattern. The
+built-in questions are about ACU.pdf; pass --questions with a JSON list of
+[question, regex] pairs for another PDF.
+
+--embeddings openai embeds with text-embedding-ada-002 (needs
+OPENAI_API_KEY and network). --embeddings hashing uses a local stand-in
+(hashed word and character-trigram features) so the benchmark runs offline;
+its vectors are far more lexical than ada-002's, which understates what
+keyword matching adds.
+
+    python benchmarks/bench_hybrid_retrieval.py ../ACU.pdf --embeddings openai
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from asgiref.sync import async_to_sync  # noqa: E402
+from rfp.chunking import TokenChunker  # noqa: E402
+from rfp.embeddings import ConcurrentEmbedder, EMBEDDING_MODEL  # noqa: E402
+from rfp.ingestion import chunking_settings  # noqa: E402
+from rfp.keyword_index import BM25Index, reciprocal_rank_fusion  # noqa: E402
+from rfp.local_store import LocalEmbeddingRetriever, LocalVectorDocumentStore  # noqa: E402
+from rfp.pdf_extraction import extract_pages  # noqa: E402
+from rfp.tokens import count_tokens  # noqa: E402
+
+ACU_QUESTIONS = [
+    ("Where do tenderers lodge their response online?", r"eprocure\.com\.au/acu"),
+    ("How long must the tender offer remain open?", r"valid for a period of 90 days"),
+    ("At what time on the closing date are tenders due?", r"3:00\s*PM"),
+    ("What public liability cover must the supplier hold?", r"\$20 million"),
+    ("What professional indemnity insurance is required?", r"\$10 million"),
+    ("Can the contract be extended beyond the initial term?", r"two \(2\) x one \(1\) year extension"),
+    ("Which modern slavery legislation applies to suppliers?", r"Modern Slavery Act 2018"),
+    ("What currency should prices be quoted in?", r"billing currency"),
+    ("Should prices include GST?", r"include GST"),
+    ("How much notice does ACU give to terminate for convenience?", r"at least 3 months written notice"),
+    ("Which law governs the agreement?", r"governed by the laws of the state"),
+    ("How long is the warranty period for goods?", r"twenty four \(24\) months"),
+    ("What KPIs will the supplier be measured against?", r"Key Performance Indicators"),
+]
+K_VALUES = (1, 2, 3, 5, 8, 10)
+
+
+def hashing_embedder(dimension):
+    """Offline stand-in for ada-002: signed hashed word and character-trigram counts, L2-normalized."""
+    def embed(texts):
+        vectors = []
+        for text in texts:
+            vector = np.zeros(dimension, dtype=np.float32)
+            words = re.findall(r"\w+", text.lower())
+            features = words + [f"#{word[i:i + 3]}" for word in words for i in range(max(1, len(word) - 2))]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % dimension
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            vectors.append((vector / (np.linalg.norm(vector) or 1)).tolist())
+        return vectors
+    return embed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf")
+    parser.add_argument("--embeddings", choices=["openai", "hashing"], default="hashing")
+    parser.add_argument("--questions", help="JSON file of [question, regex] pairs")
+    parser.add_argument("--candidates", type=int, default=20, help="hits taken from each ranking before fusion")
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    questions = ACU_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [tuple(pair) for pair in json.load(f)]
+
+    settings = chunking_settings()
+    chunker = TokenChunker(settings["max_tokens"], settings["overlap_tokens"], settings["min_tokens"])
+    documents = chunker.run(extract_pages(args.pdf))["documents"]
+    if args.embeddings == "openai":
+        embed = async_to_sync(ConcurrentEmbedder(model=EMBEDDING_MODEL).embed)
+    else:
+        embed = hashing_embedder(args.dimension)
+    for doc, vector in zip(documents, embed([doc.content for doc in documents])):
+        doc.embedding = vector
+    store = LocalVectorDocumentStore(dimension=len(documents[0].embedding))
+    store.write_documents(documents)
+    retriever = LocalEmbeddingRetriever(store, top_k=args.candidates)
+    keyword_index = BM25Index(documents)
+    question_vectors = embed([question for question, _ in questions])
+
+    rankings = {"vector": [], "hybrid": []}
+    for (question, _), vector in zip(questions, question_vectors):
+        vector_hits = retriever.run(query_embedding=vector)["documents"]
+        keyword_hits = keyword_index.search(question, top_k=args.candidates)
+        rankings["vector"].append(vector_hits)
+        rankings["hybrid"].append(reciprocal_rank_fusion([vector_hits, keyword_hits]))
+
+    def recall(ranked_lists, k):
+        return sum(
+            any(re.search(pattern, doc.content or "", re.IGNORECASE) for doc in ranked[:k])
+            for ranked, (_, pattern) in zip(ranked_lists, questions)
+        ) / len(questions)
+
+    def context_tokens(ranked_lists, k):
+        return sum(count_tokens(doc.content or "") for ranked in ranked_lists for doc in ranked[:k]) / len(questions)
+
+    print(f"{len(documents)} chunks, {len(questions)} questions, {args.embeddings} embeddings")
+    print(f"{'k':>3} {'vector recall':>14} {'hybrid recall':>14} {'vector tokens':>14} {'hybrid tokens':>14}")
+    for k in K_VALUES:
+        print(f"{k:>3} {recall(rankings['vector'], k):>14.2f} {recall(rankings['hybrid'], k):>14.2f} "
+              f"{context_tokens(rankings['vector'], k):>14.0f} {context_tokens(rankings['hybrid'], k):>14.0f}")
+
+    target = recall(rankings["vector"], max(K_VALUES))
+    needed = next((k for k in range(1, max(K_VALUES) + 1) if recall(rankings["hybrid"], k) >= target), None)
+    if needed is None:
+        print(f"hybrid does not reach vector recall@{max(K_VALUES)} ({target:.2f}) within {max(K_VALUES)} chunks")
+    else:
+        print(f"hybrid reaches vector recall@{max(K_VALUES)} ({target:.2f}) with {needed} chunks: "
+              f"{context_tokens(rankings['hybrid'], needed):.0f} instead of "
+              f"{context_tokens(rankings['vector'], max(K_VALUES)):.0f} context tokens per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare query latency of the session vector store backends on a session-sized
+corpus of random 1536-d vectors.
+
+Always measured: LocalVectorDocumentStore (float32 and int8) and Haystack's
+InMemoryDocumentStore. The remote Pinecone path is measured too when
+PINECONE_API_KEY and PINECONE_ENV are set; it writes to a scratch namespace
+of the session index and deletes it afterwards.
+
+    python benchmarks/bench_local_store.py --chunks 3000 --queries 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from haystack import Document  # noqa: E402
+from haystack.document_stores.in_memory import InMemoryDocumentStore  # noqa: E402
+import pinecone_store  # noqa: E402
+from rfp.local_store import LocalVectorDocumentStore  # noqa: E402
+
+
+def measure(search, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), results
+
+
+def recall(results, reference):
+    hits = [len({doc.id for doc in got} & {doc.id for doc in want}) / max(1, len(want))
+            for got, want in zip(results, reference)]
+    return sum(hits) / len(hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.chunks, args.dimension)).astype(np.float32)
+    documents = [Document(content=f"chunk {i}", embedding=vector.tolist()) for i, vector in enumerate(vectors)]
+    queries = rng.normal(size=(args.queries, args.dimension)).astype(np.float32).tolist()
+
+    backends = {}
+    reference = InMemoryDocumentStore(embedding_similarity_function="cosine")
+    reference.write_documents(documents)
+    backends["haystack in-memory"] = lambda q: reference.embedding_retrieval(q, top_k=args.top_k)
+
+    scratch = tempfile.mkdtemp()
+    for quantization in ("float32", "int8"):
+        store = LocalVectorDocumentStore(path=os.path.join(scratch, quantization), quantization=quantization)
+        store.write_documents(documents)
+        # Reopen from disk so the search runs over the memory-mapped file
+        store = LocalVectorDocumentStore(path=os.path.join(scratch, quantization), quantization=quantization)
+        backends[f"local {quantization}"] = (lambda s: lambda q: s.embedding_retrieval(q, top_k=args.top_k))(store)
+
+    remote = None
+    if os.environ.get("PINECONE_API_KEY") and os.environ.get("PINECONE_ENV"):
+        remote = pinecone_store.PineconeSessionBackend()
+        session_id = f"bench-{uuid.uuid4().hex[:8]}"
+        store = remote.get_store(session_id)
+        store.write_documents(documents)
+        time.sleep(10)  # let the serverless index catch up with the writes
+        retriever = remote.get_retriever(store, top_k=args.top_k)
+        backends["pinecone (remote)"] = lambda q: retriever.run(query_embedding=q)["documents"]
+    else:
+        print("PINECONE_API_KEY/PINECONE_ENV not set; skipping the remote Pinecone path\n")
+
+    try:
+        _, _, exact = measure(backends["local float32"], queries)
+        print(f"{args.chunks} vectors x {args.dimension}d, {args.queries} queries, top_k={args.top_k}")
+        print(f"{'backend':<20} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+        for name, search in backends.items():
+            p50, p95, results = measure(search, queries)
+            print(f"{name:<20} {p50:>8.2f} {p95:>8.2f} {recall(results, exact):>7.3f}")
+    finally:
+        if remote is not None:
+            remote.clear(session_id)
+
+
+if __name__ == "__main__":
+    main()
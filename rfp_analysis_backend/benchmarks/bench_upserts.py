@@ -0,0 +1,128 @@
+"""
+Compare the embed-then-write ingestion path with batched concurrent upserts
+that overlap with embedding.
+
+Embedding goes to a local fake embedding server (see bench_embeddings.py).
+The document store is a stand-in for a remote index: every write_documents
+call sleeps for --write-latency plus a per-document cost, and fails at
+random with probability --failure-rate. The sequential path writes all
+documents in one call (as before) and has no retries, so it is only timed
+with failures switched off.
+
+    python benchmarks/bench_upserts.py --chunks 3000 --latency 0.2 --write-latency 0.15
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from asgiref.sync import async_to_sync  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+from haystack import Document  # noqa: E402
+from haystack.document_stores.in_memory import InMemoryDocumentStore  # noqa: E402
+from bench_embeddings import make_handler  # noqa: E402
+from rfp.embeddings import ConcurrentEmbedder  # noqa: E402
+from rfp.upserts import BatchUpserter  # noqa: E402
+
+
+class SlowStore(InMemoryDocumentStore):
+    """In-memory store with the latency (and failures) of a remote index."""
+
+    def __init__(self, latency, per_document, failure_rate, request_size=100):
+        super().__init__(embedding_similarity_function="cosine")
+        self.latency = latency
+        self.per_document = per_document
+        self.failure_rate = failure_rate
+        self.request_size = request_size
+
+    def write_documents(self, documents, policy=None):
+        # One round trip per request_size documents, like PineconeDocumentStore's upsert
+        for start in range(0, len(documents), self.request_size):
+            chunk = documents[start:start + self.request_size]
+            time.sleep(self.latency + self.per_document * len(chunk))
+            if random.random() < self.failure_rate:
+                raise ConnectionError("simulated upsert failure")
+        return super().write_documents(documents, policy=policy) if policy else super().write_documents(documents)
+
+
+def make_documents(count):
+    return [Document(content=f"chunk {i} of a long government RFP", meta={"split_id": i}) for i in range(count)]
+
+
+def sequential(args, store):
+    documents = make_documents(args.chunks)
+    start = time.perf_counter()
+    embedder = ConcurrentEmbedder(api_key="fake", max_in_flight=args.max_in_flight)
+    vectors = async_to_sync(embedder.embed)([doc.content for doc in documents])
+    for doc, vector in zip(documents, vectors):
+        doc.embedding = vector
+    store.write_documents(documents)
+    return time.perf_counter() - start, {}
+
+
+def overlapped(args, store):
+    documents = make_documents(args.chunks)
+    start = time.perf_counter()
+    embedder = ConcurrentEmbedder(api_key="fake", max_in_flight=args.max_in_flight)
+    executor = ThreadPoolExecutor(max_workers=args.upsert_in_flight)
+
+    with BatchUpserter(store, executor=executor) as upserter:
+        def ready(offset, vectors):
+            batch = documents[offset:offset + len(vectors)]
+            for doc, vector in zip(batch, vectors):
+                doc.embedding = vector
+            upserter.add(batch)
+
+        async_to_sync(embedder.embed)([doc.content for doc in documents], on_batch=ready)
+    executor.shutdown()
+    assert store.count_documents() == args.chunks
+    return time.perf_counter() - start, upserter.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake embedding request")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="concurrent embedding requests")
+    parser.add_argument("--write-latency", type=float, default=0.15, help="seconds per upsert request")
+    parser.add_argument("--write-per-document", type=float, default=0.0005, help="extra seconds per document")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="chance an upsert request fails")
+    parser.add_argument("--upsert-in-flight", type=int, default=8)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, 0, args.dimension))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    random.seed(0)
+
+    print(f"{args.chunks} chunks, embedding latency {args.latency}s, upsert latency {args.write_latency}s")
+    runs = [
+        ("embed, then one write", sequential, 0.0),
+        ("overlapped batches", overlapped, 0.0),
+        (f"overlapped, {args.failure_rate:.0%} failures", overlapped, args.failure_rate),
+    ]
+    baseline = None
+    print(f"{'path':<28} {'seconds':>8} {'speedup':>8} {'batches':>8} {'retries':>8}")
+    for name, run, failure_rate in runs:
+        store = SlowStore(args.write_latency, args.write_per_document, failure_rate)
+        seconds, stats = run(args, store)
+        baseline = baseline or seconds
+        print(f"{name:<28} {seconds:>8.2f} {baseline / seconds:>7.2f}x "
+              f"{stats.get('batches', '-'):>8} {stats.get('retries', '-'):>8}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ load_dotenv()  # load environment variables immediately
 from haystack import Document
 from haystack.components.embedders import OpenAIDocumentEmbedder
 from haystack.utils import Secret
-from rfp_analysis_backend.pinecone_store import document_store
+from rfp_analysis_backend.pinecone_store import get_uploads_document_store
 from haystack_integrations.components.retrievers.pinecone import PineconeEmbeddingRetriever
 
 def answer_query(query_text):
@@ -26,7 +26,7 @@ def answer_query(query_text):
     query_embedding = embedding_result["documents"][0].embedding
 
     # Create the PineconeEmbeddingRetriever using the document store.
-    retriever = PineconeEmbeddingRetriever(document_store=document_store)
+    retriever = PineconeEmbeddingRetriever(document_store=get_uploads_document_store())
 
     # Query the Pinecone document store using the query embedding.
     retriever_result = retriever.run(query_embedding=query_embedding, top_k=3)
@@ -44,6 +44,10 @@ MEDIA_URL = "/uploads/"
 MEDIA_URL = "/uploads/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "uploads")
 
+# Uploads are streamed to a temporary file and hashed as they arrive, never held in memory
+FILE_UPLOAD_HANDLERS = ["rfp.uploads.HashingTemporaryFileUploadHandler"]
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR") or None
+
 # REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
@@ -72,6 +76,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Ingestion workers write job progress from background threads; wait
+        # for the write lock instead of failing with "database is locked"
+        "OPTIONS": {"timeout": 20},
     }
 }
 
@@ -82,3 +89,118 @@ PROTECTED_INDEXES = [
     "paidmediabids"
 ]
 
+
+# PDF extraction: number of worker processes used to extract pages in parallel.
+# Defaults to the number of CPUs.
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", "0")) or None
+
+# Chunking: token budget per chunk, tokens repeated between consecutive chunks,
+# and the size a chunk must reach before a heading starts a new one
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 400))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 50))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", 100))
+
+# Content-addressed cache of extracted pages, chunks and vectors, keyed by PDF hash
+INGESTION_CACHE_DIR = os.getenv("INGESTION_CACHE_DIR", os.path.join(BASE_DIR, "cache", "ingestion"))
+
+# Shared on-disk embedding cache (float32 vectors in SQLite, LRU-evicted past the size limit)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(BASE_DIR, "cache", "embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Semantic chat answer cache: a question within ANSWER_CACHE_THRESHOLD cosine
+# similarity of an earlier one in the same session reuses its answer. Entries
+# per session are capped; a TTL of 0 keeps them until the session's documents change.
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(BASE_DIR, "cache", "answers.sqlite3"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 200))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 0))
+
+# OpenAI HTTP clients: request and connect timeouts (seconds), connection pool
+# size, idle connections kept alive and for how long, and retries per request.
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 32))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 16))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 60))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+
+# Chunk embedding: texts per request and the ceiling on concurrent requests.
+# Concurrency backs off automatically when OpenAI rate-limits us.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", 8))
+
+# Vector upserts: documents and estimated bytes per batch (Pinecone rejects
+# requests over 2 MB), concurrent batches per process and retries per batch.
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 100))
+UPSERT_MAX_BATCH_BYTES = int(os.getenv("UPSERT_MAX_BATCH_BYTES", 1_500_000))
+UPSERT_MAX_IN_FLIGHT = int(os.getenv("UPSERT_MAX_IN_FLIGHT", 8))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", 3))
+
+# RFP analysis: each schema section is extracted by its own concurrent LLM call
+ANALYSIS_SECTION_TOP_K = int(os.getenv("ANALYSIS_SECTION_TOP_K", 10))
+# Each section runs one vector search per registered field query (top-k each)
+# and keeps the best ANALYSIS_SECTION_TOP_K of the deduplicated union.
+ANALYSIS_FIELD_TOP_K = int(os.getenv("ANALYSIS_FIELD_TOP_K", 4))
+ANALYSIS_SEARCH_WORKERS = int(os.getenv("ANALYSIS_SEARCH_WORKERS", 16))
+QUERY_EMBEDDINGS_DIR = os.getenv("QUERY_EMBEDDINGS_DIR", os.path.join(BASE_DIR, "cache"))
+ANALYSIS_MAX_CONCURRENT_SECTIONS = int(os.getenv("ANALYSIS_MAX_CONCURRENT_SECTIONS", 11))
+ANALYSIS_SECTION_RETRIES = int(os.getenv("ANALYSIS_SECTION_RETRIES", 2))
+
+# Hybrid retrieval: ingestion also builds a per-session BM25 keyword index
+# under KEYWORD_INDEX_DIR, and analysis and chat merge its rankings with the
+# vector ones by reciprocal rank fusion (RRF_K damps the weight of top ranks).
+# Hybrid sections keep ANALYSIS_HYBRID_SECTION_TOP_K fused chunks instead of
+# ANALYSIS_SECTION_TOP_K (see benchmarks/bench_hybrid_retrieval.py), and
+# CHAT_TOP_K chunks are sent as context with each chat question.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", os.path.join(BASE_DIR, "cache", "keyword_index"))
+RRF_K = int(os.getenv("RRF_K", 60))
+ANALYSIS_HYBRID_SECTION_TOP_K = int(os.getenv("ANALYSIS_HYBRID_SECTION_TOP_K", 6))
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", 5))
+
+# Prompt context budgets in tokens: retrieved chunks are merged with their
+# neighbours, stripped of repeated overlap sentences and packed by relevance
+# into at most this many tokens per analysis section or chat question.
+ANALYSIS_CONTEXT_MAX_TOKENS = int(os.getenv("ANALYSIS_CONTEXT_MAX_TOKENS", 3000))
+CHAT_CONTEXT_MAX_TOKENS = int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", 2000))
+
+# Local pre-extraction: emails, the RFP number, key dates and the budget are
+# matched in the extracted text, and fields found with at least this
+# confidence are not sent to the LLM.
+PRE_EXTRACTION = os.getenv("PRE_EXTRACTION", "true").lower() in ("1", "true", "yes")
+PRE_EXTRACTION_MIN_CONFIDENCE = float(os.getenv("PRE_EXTRACTION_MIN_CONFIDENCE", 0.8))
+
+# Background ingestion jobs: worker threads per process, where queued PDFs are
+# kept until ingested, how long a running job may go without a heartbeat before
+# it is requeued, and how many attempts a job gets.
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+INGESTION_JOB_DIR = os.getenv("INGESTION_JOB_DIR", os.path.join(MEDIA_ROOT, "ingestion_jobs"))
+INGESTION_JOB_STALE_SECONDS = int(os.getenv("INGESTION_JOB_STALE_SECONDS", 120))
+INGESTION_JOB_MAX_ATTEMPTS = int(os.getenv("INGESTION_JOB_MAX_ATTEMPTS", 3))
+
+# Batch analysis (batch/): concurrent PDFs per pipeline stage (extraction
+# processes default to the number of CPUs), PDFs admitted into the pipeline at
+# once (0: the sum of the stage limits), PDFs per batch, and the most bytes
+# an uploaded zip may unpack to.
+BATCH_EXTRACTION_CONCURRENCY = int(os.getenv("BATCH_EXTRACTION_CONCURRENCY", "0")) or None
+BATCH_EMBEDDING_CONCURRENCY = int(os.getenv("BATCH_EMBEDDING_CONCURRENCY", 2))
+BATCH_INDEXING_CONCURRENCY = int(os.getenv("BATCH_INDEXING_CONCURRENCY", 2))
+BATCH_ANALYSIS_CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_CONCURRENCY", 2))
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", 0))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 50))
+BATCH_MAX_ARCHIVE_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", 500 * 1024 * 1024))
+
+# Similarity of an RFP to past bids: where fingerprints and the bid corpus
+# matrix are stored, and the Pinecone index/namespace the corpus is built from
+SIMILARITY_DIR = os.getenv("SIMILARITY_DIR", os.path.join(BASE_DIR, "cache", "similarity"))
+SIMILARITY_CORPUS_INDEX = os.getenv("SIMILARITY_CORPUS_INDEX", "paidmediabids")
+SIMILARITY_CORPUS_NAMESPACE = os.getenv("SIMILARITY_CORPUS_NAMESPACE", "default")
+
+# Logging: diagnostics from the rfp app (analysis timings, section retries)
+# go to the console at RFP_LOG_LEVEL.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"rfp": {"handlers": ["console"], "level": os.getenv("RFP_LOG_LEVEL", "INFO")}},
+}
@@ -1,119 +1,260 @@
+import functools
 import os
-import time
+import shutil
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import NotFoundException
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from haystack.components.retrievers.in_memory import InMemoryEmbeddingRetriever
 from haystack_integrations.document_stores.pinecone import PineconeDocumentStore
+from haystack_integrations.components.retrievers.pinecone import PineconeEmbeddingRetriever
+
+# Nothing in this module talks to Pinecone at import time. Clients, index
+# handles and stores are created on first use and memoized per process; a
+# forked worker rebuilds them rather than sharing its parent's connections.
+# Pre-fork servers can call warm_up() in each worker (e.g. gunicorn's
+# post_fork hook) to pay the connection cost before the first request.
+
+_memo = {}
+_memo_lock = threading.RLock()
+
+
+def per_process(fn):
+    """Memoize a zero-argument factory once per process."""
+    @functools.wraps(fn)
+    def wrapper():
+        key = (fn.__name__, os.getpid())
+        with _memo_lock:
+            if key not in _memo:
+                _memo[key] = fn()
+            return _memo[key]
+    return wrapper
+
+
+@per_process
+def get_pinecone_client():
+    """Pinecone client, created on first use"""
+    # Retrieve your Pinecone API key and environment from environment variables.
+    if not os.environ.get("PINECONE_API_KEY") or not os.environ.get("PINECONE_ENV"):
+        raise ValueError("Pinecone API key or environment is not set. "
+                         "Please set the PINECONE_API_KEY and PINECONE_ENV environment variables.")
+    return Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
 
-# Retrieve your Pinecone API key and environment from environment variables.
-PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
-PINECONE_ENV = os.environ.get("PINECONE_ENV")  # e.g., "us-west-2"
-if not PINECONE_API_KEY or not PINECONE_ENV:
-    raise ValueError("Pinecone API key or environment is not set. "
-                     "Please set the PINECONE_API_KEY and PINECONE_ENV environment variables.")
 
-pc = Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
 index_name_base = "rfp-analysis"
 
-def get_session_index_name(session_id):
-    """Generate a unique index name for a session"""
-    # Use only the first 8 characters of the UUID to keep the name short
-    short_id = session_id[:8]
-    return f"{index_name_base}-{short_id}"
-
-def create_session_index(session_id):
-    """Create a new index for a specific session"""
-    index_name = get_session_index_name(session_id)
-    
-    # Ensure the index name is valid for Pinecone (max 45 chars)
-    if len(index_name) > 45:
-        # Truncate if necessary
-        index_name = index_name[:45]
-    
-    # Check if the index already exists
-    if index_name not in pc.list_indexes().names():
-        # Create a new index
-        pc.create_index(
-            name=index_name,
-            dimension=1536,  # OpenAI embedding dimension
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-west-2")
-        )
-    
-    # Return the index
-    return pc.Index(index_name)
+# Every session lives in its own namespace of this one pre-provisioned index.
+SESSION_INDEX_NAME = os.environ.get("PINECONE_SESSION_INDEX", index_name_base)
+DEFAULT_NAMESPACE = "default"
+EMBEDDING_DIMENSION = 1536
+# Connections kept open per index handle; concurrent upserts and queries share them
+CONNECTION_POOL_SIZE = int(os.environ.get("PINECONE_CONNECTION_POOL_SIZE", 32))
 
-def get_document_store(session_id=None):
-    """Get or create a document store for a specific session"""
-    if session_id:
-        index = create_session_index(session_id)
-        index_name = get_session_index_name(session_id)
-        return PineconeDocumentStore(
-            index=index_name,
+
+def get_session_namespace(session_id):
+    """Namespace holding a session's vectors in the shared session index"""
+    return f"session-{session_id}" if session_id else DEFAULT_NAMESPACE
+
+
+class PineconeSessionBackend:
+    """Session stores backed by namespaces of one shared Pinecone index."""
+
+    def __init__(self, index_name=SESSION_INDEX_NAME):
+        self.index_name = index_name
+        self._index = None
+        self._index_pid = None
+        self._lock = threading.Lock()
+
+    def get_index(self):
+        """Return the shared index handle, creating the index only if it has never been provisioned."""
+        with self._lock:
+            if self._index is None or self._index_pid != os.getpid():
+                pc = get_pinecone_client()
+                if self.index_name not in pc.list_indexes().names():
+                    pc.create_index(
+                        name=self.index_name,
+                        dimension=EMBEDDING_DIMENSION,
+                        metric="cosine",
+                        spec=ServerlessSpec(cloud="aws", region=os.environ.get("PINECONE_ENV"))
+                    )
+                self._index = pc.Index(self.index_name, connection_pool_maxsize=CONNECTION_POOL_SIZE)
+                self._index_pid = os.getpid()
+            return self._index
+
+    def get_store(self, session_id):
+        store = PineconeDocumentStore(
+            index=self.index_name,
+            namespace=get_session_namespace(session_id),
+            dimension=EMBEDDING_DIMENSION,
         )
-    else:
-        # Default index for backward compatibility
-        index_name = "rfp-analysis"
-        if index_name not in pc.list_indexes().names():
-            pc.create_index(
-                name=index_name,
-                dimension=1536,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-west-2")
-            )
-        return PineconeDocumentStore(
-            index=index_name,
+        # Share one index handle instead of letting every store list indexes and
+        # describe stats on first use.
+        store._index = self.get_index()
+        return store
+
+    def clear(self, session_id):
+        try:
+            self.get_index().delete(delete_all=True, namespace=get_session_namespace(session_id))
+        except NotFoundException:
+            # Namespaces only exist once something has been written to them
+            pass
+
+    def get_retriever(self, document_store, top_k=10):
+        return PineconeEmbeddingRetriever(document_store=document_store, top_k=top_k)
+
+
+class InMemorySessionBackend:
+    """
+    Local fake of the session store, one InMemoryDocumentStore per session.
+    Used by tests and offline development in place of Pinecone.
+    """
+
+    def __init__(self):
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def get_store(self, session_id):
+        with self._lock:
+            namespace = get_session_namespace(session_id)
+            if namespace not in self._stores:
+                self._stores[namespace] = InMemoryDocumentStore(embedding_similarity_function="cosine")
+            return self._stores[namespace]
+
+    def clear(self, session_id):
+        with self._lock:
+            self._stores.pop(get_session_namespace(session_id), None)
+
+    def get_retriever(self, document_store, top_k=10):
+        return InMemoryEmbeddingRetriever(document_store=document_store, top_k=top_k)
+
+
+class LocalSessionBackend:
+    """
+    Session stores kept in this process as LocalVectorDocumentStore matrices,
+    persisted under LOCAL_VECTOR_STORE_DIR (one directory per session). Retrieval
+    is an exact in-memory search with no network round trip; sessions are only
+    visible to processes sharing that directory. A store is reloaded whenever
+    another process has saved over it.
+    """
+
+    def __init__(self, base_dir=None, quantization=None):
+        self.base_dir = base_dir or os.environ.get(
+            "LOCAL_VECTOR_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "vectors")
         )
+        self.quantization = quantization or os.environ.get("LOCAL_VECTOR_STORE_QUANTIZATION", "float32")
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def _path(self, session_id):
+        return os.path.join(self.base_dir, get_session_namespace(session_id))
+
+    def get_store(self, session_id):
+        from rfp.local_store import LocalVectorDocumentStore, stored_version
+
+        with self._lock:
+            namespace = get_session_namespace(session_id)
+            store = self._stores.get(namespace)
+            if store is None or store.version != stored_version(self._path(session_id)):
+                self._stores[namespace] = LocalVectorDocumentStore(
+                    path=self._path(session_id), quantization=self.quantization, dimension=EMBEDDING_DIMENSION
+                )
+            return self._stores[namespace]
+
+    def clear(self, session_id):
+        with self._lock:
+            self._stores.pop(get_session_namespace(session_id), None)
+            shutil.rmtree(self._path(session_id), ignore_errors=True)
+
+    def get_retriever(self, document_store, top_k=10):
+        from rfp.local_store import LocalEmbeddingRetriever
+
+        return LocalEmbeddingRetriever(document_store=document_store, top_k=top_k)
+
+
+_backends = {
+    "pinecone": PineconeSessionBackend,
+    "memory": InMemorySessionBackend,
+    "local": LocalSessionBackend,
+}
+_backend = None
+
+
+def get_backend():
+    """Return the session store backend selected by VECTOR_STORE_BACKEND (default: pinecone)"""
+    global _backend
+    with _memo_lock:
+        if _backend is None:
+            _backend = _backends[os.environ.get("VECTOR_STORE_BACKEND", "pinecone")]()
+        return _backend
+
+
+def use_backend(backend):
+    """Swap in a different session store backend, e.g. InMemorySessionBackend() in tests"""
+    global _backend
+    with _memo_lock:
+        _backend = backend
+
+
+def get_document_store(session_id=None):
+    """Get the document store for a specific session"""
+    return get_backend().get_store(session_id)
+
 
 def reset_document_store(session_id=None):
-    """Reset a document store for a specific session"""
-    index_name = get_session_index_name(session_id) if session_id else "rfp-analysis"
-    
-    # Delete the index if it exists
-    if index_name in pc.list_indexes().names():
-        pc.delete_index(index_name)
-    
-    # Create a new index
-    pc.create_index(
-        name=index_name,
-        dimension=1536,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-west-2")
-    )
-    
-    # Return a new document store
-    from haystack_integrations.document_stores.pinecone import PineconeDocumentStore
-    return PineconeDocumentStore(
-        index=index_name,
-    )
-
-# Create a default document store
-document_store = get_document_store()
-
-# Create a Pinecone client instance using the new API
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Define your index name (must be lowercase and use hyphens) and embedding dimension.
-index_name = "rfpuploads"
-dimension = 1536
-
-# Create a ServerlessSpec with your preferred cloud and region.
-spec = ServerlessSpec(cloud="aws", region=PINECONE_ENV)
-
-# List existing indexes and check if our index already exists.
-existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
-if index_name not in existing_indexes:
-    print(f"Index '{index_name}' not found. Creating index...")
-    pc.create_index(name=index_name, dimension=dimension, metric="cosine", spec=spec)
-else:
-    print(f"Index '{index_name}' already exists.")
-
-# Initialize the PineconeDocumentStore with the created index.
-document_store = PineconeDocumentStore(
-    index=index_name,
-    metric="cosine"
-)
-
-print(f"Pinecone index '{index_name}' is ready and connected.")
\ No newline at end of file
+    """Reset a session's document store by clearing its namespace"""
+    backend = get_backend()
+    backend.clear(session_id)
+    return backend.get_store(session_id)
+
+
+def delete_session(session_id):
+    """Delete everything stored for a session"""
+    get_backend().clear(session_id)
+
+
+def get_embedding_retriever(document_store, top_k=10):
+    """Embedding retriever component matching the session store backend"""
+    return get_backend().get_retriever(document_store, top_k=top_k)
+
+
+UPLOADS_INDEX_NAME = "rfpuploads"
+
+
+@per_process
+def get_uploads_index():
+    """Index handle for the legacy "rfpuploads" index, shared by every request"""
+    return get_pinecone_client().Index(UPLOADS_INDEX_NAME, connection_pool_maxsize=CONNECTION_POOL_SIZE)
+
+
+@per_process
+def get_uploads_document_store():
+    """Document store for the legacy "rfpuploads" index, created on first use"""
+    pc = get_pinecone_client()
+
+    # Define your index name (must be lowercase and use hyphens) and embedding dimension.
+    index_name = UPLOADS_INDEX_NAME
+
+    # List existing indexes and check if our index already exists.
+    if index_name not in pc.list_indexes().names():
+        print(f"Index '{index_name}' not found. Creating index...")
+        spec = ServerlessSpec(cloud="aws", region=os.environ.get("PINECONE_ENV"))
+        pc.create_index(name=index_name, dimension=EMBEDDING_DIMENSION, metric="cosine", spec=spec)
+
+    store = PineconeDocumentStore(index=index_name, metric="cosine", dimension=EMBEDDING_DIMENSION)
+    store._index = get_uploads_index()
+    print(f"Pinecone index '{index_name}' is ready and connected.")
+    return store
+
+
+def warm_up():
+    """
+    Create this process's Pinecone client and index handles ahead of the first
+    request. Safe to call repeatedly; later calls are no-ops.
+    """
+    backend = get_backend()
+    if isinstance(backend, PineconeSessionBackend):
+        backend.get_index()
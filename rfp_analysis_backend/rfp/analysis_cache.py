@@ -0,0 +1,122 @@
+"""
+Analysis results persisted on RFPDocument.analysis_results.
+
+Each entry is keyed by the PDF's content hash plus everything that changes
+the analysis output (schema/prompt version, LLM model, chunking, embedding
+model and retrieval settings), so a repeat analysis of the same PDF is read
+back from the database instead of re-running the LLM. Entries only go away
+when invalidated explicitly.
+"""
+import hashlib
+import json
+import time
+from django.db import transaction
+from django.utils import timezone
+from .models import RFPDocument
+
+
+def analysis_cache_key(content_hash, analyzer):
+    """Key an analysis by the PDF's content hash and the analyzer's result-affecting settings."""
+    from .analysis_schema import SCHEMA_VERSION
+    from .embeddings import EMBEDDING_MODEL
+    from .ingestion import chunking_settings
+    from .retrieval_queries import registry_fingerprint
+    from .rfp_analyzer import LLM_MODEL
+
+    fingerprint = json.dumps(
+        {
+            "content_hash": content_hash,
+            "schema_version": SCHEMA_VERSION,
+            "model": LLM_MODEL,
+            "chunking": chunking_settings(),
+            "embedding_model": EMBEDDING_MODEL,
+            "queries": registry_fingerprint(),
+            "top_k": analyzer.top_k,
+            "field_top_k": analyzer.field_top_k,
+            "retrieval": analyzer.retrieval_settings(),
+            "context_max_tokens": analyzer.context_max_tokens,
+            "pre_extraction": analyzer.pre_extraction_settings(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def get_session_document(session_id):
+    """The most recently uploaded RFPDocument for a session, or None."""
+    if not session_id:
+        return None
+    return RFPDocument.objects.filter(session_id=session_id).order_by("-uploaded_at", "-id").first()
+
+
+def load(content_hash, key):
+    """
+    Return the stored analysis for a key, or None on a miss. Any RFPDocument
+    with the same content hash can serve it, so re-uploading a PDF in a new
+    session is still a hit.
+    """
+    start = time.perf_counter()
+    documents = RFPDocument.objects.filter(content_hash=content_hash).only("analysis_results")
+    for document in documents.iterator():
+        entry = (document.analysis_results or {}).get(key)
+        if entry:
+            print(f"Analysis cache hit for {content_hash[:12]} in {time.perf_counter() - start:.3f}s")
+            return entry
+    return None
+
+
+def store(document, key, result, timings=None):
+    """Save an analysis on a document under a key, alongside any other cached analyses."""
+    entry = {
+        "result": result,
+        "timings": timings or {},
+        "created_at": timezone.now().isoformat(),
+    }
+    with transaction.atomic():
+        # Re-read under a row lock so concurrent analyses don't drop each other's entries
+        locked = RFPDocument.objects.select_for_update().get(pk=document.pk)
+        results = dict(locked.analysis_results or {})
+        results[key] = entry
+        locked.analysis_results = results
+        locked.save(update_fields=["analysis_results"])
+    return entry
+
+
+def invalidate(content_hash=None):
+    """
+    Drop cached analyses for one PDF, or for every document when no content
+    hash is given. Returns the number of documents that had entries removed.
+    """
+    documents = RFPDocument.objects.exclude(analysis_results={})
+    if content_hash:
+        documents = documents.filter(content_hash=content_hash)
+    return documents.update(analysis_results={})
+
+
+def resolve(session_id, analyzer):
+    """
+    Return (document, key) for the PDF last uploaded in a session, or
+    (None, None) when there is nothing to key the analysis on.
+    """
+    document = get_session_document(session_id)
+    if document is None or not document.content_hash:
+        return None, None
+    return document, analysis_cache_key(document.content_hash, analyzer)
+
+
+def latest_entry(document):
+    """
+    The most recently stored analysis of a document's PDF, whatever settings
+    it was run with, or None if it was never analyzed. Like load(), any
+    RFPDocument with the same content hash can supply it.
+    """
+    candidates = [document]
+    if not document.analysis_results and document.content_hash:
+        candidates = RFPDocument.objects.filter(content_hash=document.content_hash).exclude(analysis_results={})
+        candidates = candidates.only("analysis_results").iterator()
+    latest = None
+    for candidate in candidates:
+        for entry in (candidate.analysis_results or {}).values():
+            if latest is None or entry.get("created_at", "") > latest.get("created_at", ""):
+                latest = entry
+    return latest
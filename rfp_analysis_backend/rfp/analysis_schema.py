@@ -0,0 +1,187 @@
+"""
+The RFP analysis schema: which sections and fields the analyzer extracts,
+what to ask the vector store for each section, and the extraction
+instructions shared by every section prompt.
+
+Every field in the output has the shape
+{"value": "", "confidence": 0.0, "is_interpreted": false}.
+"""
+import json
+
+# Bump whenever sections, fields or prompts change in a way that changes results.
+SCHEMA_VERSION = "2"
+
+SECTIONS = {
+    "strategic_summary": [
+        "overview",
+        "key_differentiators",
+        "risks_and_challenges",
+        "recommended_approach",
+        "resource_needs",
+        "competitive_landscape",
+    ],
+    "introduction/background": [
+        "introduction",
+        "background",
+    ],
+    "bid_summary": [
+        "client_name",
+        "rfp_number",
+        "services_required",
+        "client_contact",
+        "email",
+        "incumbent",
+    ],
+    "key_dates": [
+        "start_date",
+        "submission_deadline",
+        "clarifications_deadline",
+        "issuance_of_response_to_bidder_questions",
+        "instruction_to_clarification_question",
+        "fully_executed_agreement",
+        "site_visit_date",
+        "contract_award_date",
+        "method_of_submission",
+        "submission_instructions",
+    ],
+    "work_portfolio": [
+        "experience",
+        "case_studies",
+        "case_studies_specifications",
+        "integration_requirements",
+        "other_requirements",
+        "references",
+    ],
+    "requirements": [
+        "confidentiality",
+        "compliances",
+        "security",
+        "foreign_workers_limitations",
+        "notary",
+        "on_site_requirements",
+        "resumes_required",
+        "registration_requirements",
+        "contract_length",
+        "other_requirements",
+    ],
+    "submission_details": [
+        "method",
+        "instructions",
+    ],
+    "checklist": [
+        "insurances",
+        "resumes",
+        "business_registrations",
+    ],
+    "commercials": [
+        "budget",
+        "contract_length",
+        "price_quality_ratio",
+    ],
+    "website_details": [
+        "web_address",
+        "current_cms",
+        "preferred_cms",
+    ],
+    "flags": [
+        "workload_summary",
+        "total_wordcount",
+        "targets_provided",
+        "design_required",
+        "media_plan",
+        "pricing_summary",
+        "notes",
+    ],
+}
+
+# What to search the vector store for when extracting each section.
+SECTION_QUERIES = {
+    "strategic_summary": "project overview, scope of work, goals, evaluation criteria, risks and competition",
+    "introduction/background": "introduction, background, organization history, purpose of this request for proposal",
+    "bid_summary": "client organization name, RFP number, services required, contact person and email, incumbent vendor",
+    "key_dates": "schedule of key dates, proposal submission deadline, questions and clarifications deadline, site visit, contract award",
+    "work_portfolio": "vendor experience, case studies, portfolio, references, integration requirements",
+    "requirements": "confidentiality, compliance, security, insurance, notary, on-site work, resumes, registration, contract term",
+    "submission_details": "how to submit the proposal, submission method, format and delivery instructions",
+    "checklist": "required insurance certificates, staff resumes, business registrations and licenses",
+    "commercials": "budget, not-to-exceed amount, pricing, cost proposal, contract length, price and quality weighting",
+    "website_details": "website address, current content management system, preferred CMS, hosting",
+    "flags": "deliverables, workload, word or page limits, targets, design work, media plan, pricing requirements",
+}
+
+# Extra guidance for sections that need more than plain extraction.
+SECTION_GUIDANCE = {
+    "strategic_summary": """First, analyze the documents and provide a strategic summary that includes:
+            - The core opportunity and its strategic value
+            - Key differentiators needed to win
+            - Major risks or challenges to consider
+            - Recommended approach or win themes
+            - Resource implications
+            - Any competitive insights""",
+    "introduction/background": """For the introduction and background sections:
+            - Look for any opening paragraphs that describe the project overview
+            - Identify any background context about the organization
+            - Include historical information or previous related projects
+            - Capture the overall purpose and goals""",
+}
+
+FIELD_INSTRUCTIONS = """For each field:
+            1. Set "value" to the extracted information from the RFP
+            2. Set "confidence" to a value between 0.0 and 1.0 indicating your confidence in the extraction
+            3. Set "is_interpreted" to true if you had to interpret or infer the information rather than directly extract it
+
+            If information is explicitly stated in the RFP, set confidence high (0.8-1.0) and is_interpreted to false.
+            If information is implied but not explicitly stated, provide your best interpretation, set confidence lower (0.4-0.7), and set is_interpreted to true.
+            If you're making an educated guess based on context, set confidence even lower (0.1-0.3) and set is_interpreted to true.
+            If information is completely absent, leave value as empty string, set confidence to 0.0, and is_interpreted to false.
+
+            For example:
+            - If the RFP clearly states "Budget: $500,000", set {"value": "$500,000", "confidence": 1.0, "is_interpreted": false}
+            - If the RFP mentions "work must be completed within 12 months" but doesn't explicitly state contract length, set {"value": "12 months", "confidence": 0.6, "is_interpreted": true}
+            - If there's no mention of the incumbent, leave as {"value": "", "confidence": 0.0, "is_interpreted": false}"""
+
+
+def empty_field():
+    return {"value": "", "confidence": 0.0, "is_interpreted": False}
+
+
+def section_structure(section, fields=None):
+    """JSON skeleton the LLM must fill for one section."""
+    fields = SECTIONS[section] if fields is None else fields
+    return json.dumps({section: {field: empty_field() for field in fields}}, indent=4)
+
+
+def normalize_section(section, parsed, fields=None):
+    """
+    Pull one section out of a parsed LLM reply and coerce it to the schema:
+    every expected field present, each with value/confidence/is_interpreted.
+    Raises ValueError if the reply does not contain the section at all.
+    """
+    fields = SECTIONS[section] if fields is None else fields
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected a JSON object for section {section}")
+    data = parsed.get(section, parsed)
+    if not isinstance(data, dict) or not any(field in data for field in fields):
+        raise ValueError(f"Reply does not contain section {section}")
+
+    normalized = {}
+    for field in fields:
+        item = data.get(field)
+        if isinstance(item, dict) and "value" in item:
+            normalized[field] = {
+                "value": item.get("value", ""),
+                "confidence": _confidence(item.get("confidence")),
+                "is_interpreted": bool(item.get("is_interpreted", False)),
+            }
+        elif item in (None, ""):
+            normalized[field] = empty_field()
+        else:
+            normalized[field] = {"value": item, "confidence": 0.5, "is_interpreted": True}
+    return normalized
+
+
+def _confidence(value):
+    try:
+        return min(1.0, max(0.0, float(value or 0.0)))
+    except (TypeError, ValueError):
+        return 0.0
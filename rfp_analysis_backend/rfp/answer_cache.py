@@ -0,0 +1,177 @@
+"""
+Per-session semantic cache of chat answers.
+
+Bid teams ask the same few questions about an RFP again and again, worded a
+little differently each time. Every answered question is stored with its
+embedding under the session's namespace; a new question whose embedding is
+within ANSWER_CACHE_THRESHOLD cosine similarity of a stored one gets the
+stored answer back without a vector search or a completion.
+
+Entries live in SQLite next to the embedding cache, so every process on the
+host shares them, and a session's entries are dropped whenever its documents
+change (re-ingestion, reset or cleanup). Hit and miss counters are kept per
+process.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+from django.conf import settings
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _session_key(session_id):
+    from pinecone_store import get_session_namespace
+
+    return get_session_namespace(session_id)
+
+
+class AnswerCache:
+    """
+    Chat responses keyed by question embedding, one small set per session.
+    A lookup scores every stored question of the session in one matrix product.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.95, max_entries: int = 200, ttl_seconds: int = 0):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_session ON answers (session, created)")
+
+    def lookup(self, session_id, query_embedding: List[float]) -> Optional[dict]:
+        """
+        The stored response for the most similar earlier question in the session,
+        with ``question`` and ``similarity`` added, or None below the threshold.
+        """
+        session = _session_key(session_id)
+        with self._lock:
+            if self.ttl_seconds:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE session = ? AND created < ?",
+                    (session, time.time() - self.ttl_seconds),
+                )
+            rows = self._conn.execute(
+                "SELECT id, question, vector, response FROM answers WHERE session = ?", (session,)
+            ).fetchall()
+            best = None
+            if rows:
+                query = np.asarray(query_embedding, dtype=np.float32)
+                query = query / (np.linalg.norm(query) or 1)
+                # Stored vectors are normalized on the way in
+                similarities = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows]) @ query
+                index = int(np.argmax(similarities))
+                if similarities[index] >= self.threshold:
+                    best = rows[index], float(similarities[index])
+            if best is None:
+                self.misses += 1
+                return None
+            (entry_id, question, _, response), similarity = best
+            self.hits += 1
+            self._conn.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (entry_id,))
+        return dict(json.loads(response), question=question, similarity=round(similarity, 4))
+
+    def store(self, session_id, question: str, query_embedding: List[float], response: dict) -> None:
+        """Remember a response, keeping at most max_entries per session (oldest dropped first)."""
+        session = _session_key(session_id)
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO answers (session, question, vector, response, created) VALUES (?, ?, ?, ?, ?)",
+                    (session, question, vector.tobytes(), json.dumps(response), time.time()),
+                )
+                self._conn.execute(
+                    """
+                    DELETE FROM answers WHERE session = ? AND id NOT IN (
+                        SELECT id FROM answers WHERE session = ? ORDER BY created DESC LIMIT ?
+                    )
+                    """,
+                    (session, session, self.max_entries),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def invalidate(self, session_id=None, all_sessions=False) -> int:
+        """Drop a session's answers (or every session's); returns how many were dropped."""
+        with self._lock:
+            if all_sessions:
+                deleted = self._conn.execute("DELETE FROM answers").rowcount
+            else:
+                deleted = self._conn.execute(
+                    "DELETE FROM answers WHERE session = ?", (_session_key(session_id),)
+                ).rowcount
+        if deleted:
+            print(f"Answer cache dropped {deleted} entries")
+        return deleted
+
+    def stats(self, session_id=None) -> dict:
+        with self._lock:
+            query = "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM answers"
+            params = ()
+            if session_id is not None:
+                query += " WHERE session = ?"
+                params = (_session_key(session_id),)
+            entries, entry_hits = self._conn.execute(query, params).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                # Hits served by the stored entries, across every process
+                "entry_hits": entry_hits,
+                "threshold": self.threshold,
+            }
+
+
+def get_answer_cache() -> AnswerCache:
+    """Return the per-process answer cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache(
+                getattr(settings, "ANSWER_CACHE_PATH", os.path.join(settings.BASE_DIR, "cache", "answers.sqlite3")),
+                threshold=getattr(settings, "ANSWER_CACHE_THRESHOLD", 0.95),
+                max_entries=getattr(settings, "ANSWER_CACHE_MAX_ENTRIES", 200),
+                ttl_seconds=getattr(settings, "ANSWER_CACHE_TTL_SECONDS", 0),
+            )
+        return _cache
+
+
+def invalidate_session(session_id):
+    """Drop a session's cached answers because its documents changed; never raises."""
+    try:
+        get_answer_cache().invalidate(session_id)
+    except Exception as e:
+        print(f"Failed to invalidate answer cache for session {session_id}: {e}")
@@ -0,0 +1,328 @@
+"""
+Batch analysis of many RFPs through a pipeline of stages.
+
+Each PDF in a batch goes through extraction, embedding, indexing and
+analysis. Every stage has its own worker threads and concurrency limit, and
+a PDF moves on to the next stage as soon as it leaves the previous one, so
+while one PDF is being analyzed the next is being embedded and a third
+extracted. The batch takes about as long as its slowest stage, instead of
+the sum of every stage for every PDF.
+
+- extracting: whole PDFs are parsed in the PDF extraction process pool,
+  one PDF per worker process
+- embedding: chunks are embedded through the embedding cache with the
+  concurrent async embedder
+- indexing: embedded chunks are written to the PDF's own session store in
+  batched, concurrent upserts, and an RFPDocument is recorded
+- analyzing: sections are extracted by concurrent LLM calls, with stored
+  analyses served from the database
+
+The ingestion and analysis caches apply as they do for single uploads, so
+resubmitting a batch only reruns what changed. Results come back in the
+order the PDFs finish.
+"""
+import functools
+import hashlib
+import os
+import queue
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+
+Stage = namedtuple("Stage", ["name", "run", "concurrency"])
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BatchError(ValueError):
+    """Raised when a batch upload cannot be accepted."""
+
+
+class BatchItem:
+    """One PDF of a batch and what the stages have produced for it so far."""
+
+    def __init__(self, index, file_name, path, content_hash):
+        self.index = index
+        self.file_name = file_name
+        self.path = path
+        self.content_hash = content_hash
+        self.session_id = str(uuid.uuid4())
+        self.timings = {}
+        self.error = None
+        self.failed_stage = None
+        self.cache = {}
+        self.cache_key = None
+        self.pages = None
+        self.chunks = None
+        self.store = None
+        self.document = None
+        self.result = None
+        self.failed_sections = []
+
+    def report(self):
+        """JSON-serializable outcome, sent to the client when the PDF finishes."""
+        return {
+            "index": self.index,
+            "file_name": self.file_name,
+            "status": "failed" if self.error else "succeeded",
+            "error": self.error,
+            "failed_stage": self.failed_stage,
+            "session_id": self.session_id,
+            "document_id": self.document.pk if self.document else None,
+            "content_hash": self.content_hash,
+            "cache": self.cache,
+            "timings": self.timings,
+            "result": self.result,
+            "failed_sections": self.failed_sections,
+        }
+
+
+class StagePipeline:
+    """
+    Run items through stages in order. Each stage has a pool of
+    ``concurrency`` worker threads, and an item is handed to the next stage
+    the moment a stage finishes with it. An item whose stage raises skips the
+    remaining stages. At most ``max_in_flight`` items are admitted at once,
+    which bounds the pages and vectors held in memory.
+
+    Busy seconds and the peak number of items each stage worked on at once
+    are kept in ``stats``.
+    """
+
+    def __init__(self, stages, max_in_flight=None):
+        self.stages = stages
+        self.max_in_flight = max_in_flight or sum(stage.concurrency for stage in stages)
+        self.stats = {stage.name: {"completed": 0, "failed": 0, "busy_seconds": 0.0, "peak_in_flight": 0}
+                      for stage in stages}
+        self._running = {stage.name: 0 for stage in stages}
+        self._lock = threading.Lock()
+
+    def run(self, items):
+        """Yield each item once it has been through every stage (or failed), in the order they finish."""
+        finished = queue.Queue()
+        admitted = threading.Semaphore(self.max_in_flight)
+        cancelled = threading.Event()
+        executors = [
+            ThreadPoolExecutor(max_workers=stage.concurrency, thread_name_prefix=f"batch-{stage.name}")
+            for stage in self.stages
+        ]
+
+        def advance(position, item):
+            if position == len(self.stages) or item.error or cancelled.is_set():
+                admitted.release()
+                finished.put(item)
+                return
+            try:
+                executors[position].submit(step, position, item)
+            except RuntimeError:
+                # The consumer went away and the executors were shut down
+                admitted.release()
+
+        def step(position, item):
+            stage = self.stages[position]
+            stats = self.stats[stage.name]
+            with self._lock:
+                self._running[stage.name] += 1
+                stats["peak_in_flight"] = max(stats["peak_in_flight"], self._running[stage.name])
+            start = time.perf_counter()
+            try:
+                stage.run(item)
+            except Exception as e:
+                print(f"Batch item {item.index} ({item.file_name}) failed in {stage.name}: {e}")
+                item.error = str(e)
+                item.failed_stage = stage.name
+            finally:
+                seconds = time.perf_counter() - start
+                item.timings[stage.name] = round(seconds, 2)
+                with self._lock:
+                    self._running[stage.name] -= 1
+                    stats["busy_seconds"] = round(stats["busy_seconds"] + seconds, 2)
+                    stats["failed" if item.error else "completed"] += 1
+                # Stages query the database from pool threads; don't leave their connections open
+                close_old_connections()
+            advance(position + 1, item)
+
+        def feed():
+            for item in items:
+                while not admitted.acquire(timeout=1):
+                    if cancelled.is_set():
+                        return
+                if cancelled.is_set():
+                    return
+                advance(0, item)
+
+        feeder = threading.Thread(target=feed, name="batch-feeder", daemon=True)
+        feeder.start()
+        try:
+            for _ in range(len(items)):
+                yield finished.get()
+        finally:
+            cancelled.set()
+            for executor in executors:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+
+def batch_settings():
+    """Per-stage concurrency limits and batch size limits."""
+    from .pdf_extraction import default_worker_count
+
+    return {
+        "extracting": getattr(settings, "BATCH_EXTRACTION_CONCURRENCY", None) or default_worker_count(),
+        "embedding": getattr(settings, "BATCH_EMBEDDING_CONCURRENCY", 2),
+        "indexing": getattr(settings, "BATCH_INDEXING_CONCURRENCY", 2),
+        "analyzing": getattr(settings, "BATCH_ANALYSIS_CONCURRENCY", 2),
+        "max_in_flight": getattr(settings, "BATCH_MAX_IN_FLIGHT", 0) or None,
+        "max_files": getattr(settings, "BATCH_MAX_FILES", 50),
+        "max_archive_bytes": getattr(settings, "BATCH_MAX_ARCHIVE_BYTES", 500 * 1024 * 1024),
+    }
+
+
+def spool_batch(uploaded_files, directory, max_files, max_archive_bytes):
+    """
+    Copy uploaded PDFs, and the PDFs inside uploaded zip archives, into
+    ``directory``. Returns a BatchItem per PDF. Archive members are written
+    under generated names, never their own paths, and are copied in chunks
+    with their total size capped so a zip bomb cannot fill the disk.
+    """
+    from .uploads import spool_upload
+
+    items = []
+
+    def add(file_name, chunks):
+        if len(items) >= max_files:
+            raise BatchError(f"A batch can hold at most {max_files} PDFs")
+        path = os.path.join(directory, f"{len(items):04d}.pdf")
+        hasher = hashlib.sha256()
+        with open(path, "wb") as destination:
+            for chunk in chunks:
+                hasher.update(chunk)
+                destination.write(chunk)
+        items.append(BatchItem(len(items), file_name, path, hasher.hexdigest()))
+
+    for uploaded_file in uploaded_files:
+        name = uploaded_file.name
+        if name.lower().endswith(".pdf"):
+            add(name, uploaded_file.chunks(COPY_CHUNK_SIZE))
+            continue
+        if not name.lower().endswith(".zip"):
+            raise BatchError(f"{name} is neither a PDF nor a zip archive")
+        with spool_upload(uploaded_file) as upload:
+            try:
+                archive = zipfile.ZipFile(upload.path)
+            except (zipfile.BadZipFile, OSError):
+                raise BatchError(f"{name} is not a valid zip archive")
+            with archive:
+                members = [
+                    member for member in archive.infolist()
+                    if not member.is_dir() and member.filename.lower().endswith(".pdf")
+                    and not member.filename.startswith("__MACOSX/")
+                ]
+                remaining = max_archive_bytes
+                for member in sorted(members, key=lambda member: member.filename):
+                    def chunks(member=member):
+                        nonlocal remaining
+                        try:
+                            with archive.open(member) as source:
+                                while chunk := source.read(COPY_CHUNK_SIZE):
+                                    remaining -= len(chunk)
+                                    if remaining < 0:
+                                        raise BatchError(f"{name} unpacks to more than {max_archive_bytes} bytes")
+                                    yield chunk
+                        # Encrypted members raise RuntimeError, unsupported compression NotImplementedError,
+                        # and corrupt data BadZipFile or zlib.error
+                        except (RuntimeError, NotImplementedError, OSError, zipfile.BadZipFile, zlib.error) as e:
+                            raise BatchError(f"Cannot read {member.filename} from {name}: {e}")
+
+                    add(os.path.basename(member.filename), chunks())
+
+    if not items:
+        raise BatchError("No PDFs found in the upload")
+    return items
+
+
+def extract(item, workers):
+    """Pages of the PDF, from the ingestion cache or parsed in a worker process."""
+    from . import ingestion
+    from .pdf_extraction import extract_pages, run_in_pool
+
+    item.cache_key, cached = ingestion.load_cached(item.content_hash)
+    item.cache["ingestion"] = bool(cached)
+    if cached:
+        item.pages, item.chunks = cached.pages, cached.documents
+        return
+    # One PDF per process: the pool's parallelism is spread across the batch instead of one PDF's pages
+    item.pages, _ = ingestion.extract(
+        item.path, extractor=lambda path: run_in_pool(workers, extract_pages, [(path, 1)])[0]
+    )
+
+
+def embed(item):
+    """Split the pages into chunks and embed them; only chunks missing from the embedding cache reach the API."""
+    from . import ingestion
+
+    if item.cache["ingestion"]:
+        return
+    item.chunks = ingestion.embed(ingestion.split(item.pages))
+
+
+def index(item):
+    """Write the chunks to the PDF's session store and keyword index, and record its RFPDocument."""
+    from pinecone_store import reset_document_store
+    from . import ingestion
+    from .upserts import upsert_documents
+
+    item.store = reset_document_store(item.session_id)
+    upsert_documents(item.store, item.chunks)
+    # Cached, fingerprinted and keyword-indexed only once the chunks are in the store, as ingest_pdf does
+    result = ingestion.finish(item.cache_key, item.content_hash, item.session_id,
+                              item.pages, item.chunks, item.cache["ingestion"])
+    item.document = ingestion.record_document(item.file_name, item.content_hash, item.session_id, result)
+    # Analysis reads the text from the document; the pages and vectors can go
+    item.pages = item.chunks = None
+
+
+def analyze(item):
+    """Analyze the PDF like analyze/, serving a stored analysis when there is one."""
+    from asgiref.sync import async_to_sync
+    from . import analysis_cache
+    from .keyword_index import get_session_index
+    from .rfp_analyzer import RFPAnalyzer
+
+    analyzer = RFPAnalyzer(vector_store=item.store, keyword_index=get_session_index(item.session_id))
+    cache_key = analysis_cache.analysis_cache_key(item.content_hash, analyzer)
+    cached = analysis_cache.load(item.content_hash, cache_key)
+    item.cache["analysis"] = bool(cached)
+    if cached:
+        item.result = cached["result"]
+        return
+    result = async_to_sync(analyzer.analyze_rfp)(item.document.extracted_text)
+    if not result:
+        raise RuntimeError("Analysis returned no result")
+    item.result = result
+    item.failed_sections = analyzer.last_failed_sections
+    # An analysis with sections the LLM never answered is not stored, so the next batch retries it
+    if not item.failed_sections:
+        analysis_cache.store(item.document, cache_key, result, analyzer.last_timings)
+
+
+def build_pipeline(analyze_documents=True, limits=None):
+    """
+    The stage pipeline for a batch, with each stage's concurrency from
+    batch_settings(). With ``analyze_documents`` false the PDFs are only
+    ingested.
+    """
+    limits = limits or batch_settings()
+    stages = [
+        Stage("extracting", functools.partial(extract, workers=limits["extracting"]), limits["extracting"]),
+        Stage("embedding", embed, limits["embedding"]),
+        Stage("indexing", index, limits["indexing"]),
+    ]
+    if analyze_documents:
+        stages.append(Stage("analyzing", analyze, limits["analyzing"]))
+    return StagePipeline(stages, limits["max_in_flight"])
@@ -0,0 +1,149 @@
+"""
+Token-budgeted chunking of extracted PDF pages.
+
+Chunks are packed sentence by sentence up to ``max_tokens`` and never span
+two pages, so every chunk has one exact page number. A heading ("SECTION C -
+SCOPE OF WORK", "A3.4 Contact Information", "Schedule 2") starts a new chunk
+once the current one holds at least ``min_tokens``, so sections are not
+mixed while small ones are still merged instead of becoming tiny chunks.
+Pages are consumed one at a time, so chunks can be produced while later
+pages are still being read.
+"""
+import re
+from typing import Any, Dict, Iterable, Iterator, List
+from haystack import Document
+from .tokens import count_tokens, split_tokens
+
+# Lines that open a section: keyword headings, numbered headings and short all-caps lines
+HEADING_PATTERNS = [
+    re.compile(r"^(?i:section|part|article|chapter|appendix|attachment|annex|annexure|exhibit|schedule)\s+[A-Z0-9]"),
+    re.compile(r"^[A-Z]{0,2}\d+(\.\d+)*\.?\s+[A-Z]"),
+    re.compile(r"^[A-Z][A-Z0-9&,'()/\- ]+$"),
+]
+MAX_HEADING_CHARS = 100
+# Longer numbered lines are the first line of a wrapped clause, not a heading
+MAX_NUMBERED_HEADING_CHARS = 70
+# Table-of-contents entries look like headings but end in dot leaders and a page number
+DOT_LEADER = re.compile(r"(\.\s*){4,}")
+# Cover pages drawn with a shadow font extract with every character doubled ("RREEQQUUEESSTT")
+DOUBLED_CHARACTERS = re.compile(r"^(?:(\S)\1|\s)+$")
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9\"“(\[•])|\s*•\s*")
+WHITESPACE = re.compile(r"\s+")
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS or DOT_LEADER.search(line) or line[-1] in ".,;:":
+        return False
+    if DOUBLED_CHARACTERS.match(line):
+        return False
+    keyword, numbered, capitals = (bool(pattern.match(line)) for pattern in HEADING_PATTERNS)
+    if numbered and len(line) > MAX_NUMBERED_HEADING_CHARS:
+        numbered = False
+    if capitals:
+        # Two or more words, mostly letters: skips codes, reference numbers and lone acronyms
+        letters = sum(char.isalpha() for char in line)
+        capitals = len(line.split()) >= 2 and letters >= len(line.replace(" ", "")) / 2
+    return (keyword and line[0].isupper()) or numbered or capitals
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in (WHITESPACE.sub(" ", part).strip() for part in SENTENCE_BOUNDARY.split(text))
+            if sentence]
+
+
+class TokenChunker:
+    """Split extracted pages into Documents of at most ``max_tokens`` tokens each."""
+
+    def __init__(self, max_tokens: int = 400, overlap_tokens: int = 50, min_tokens: int = 100):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+
+    def run(self, pages: Iterable[Dict[str, Any]]) -> Dict[str, List[Document]]:
+        return {"documents": list(self.iter_chunks(pages))}
+
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Document]:
+        """Yield chunks page by page, with page_number, section and split_id metadata."""
+        split_id = 0
+        section = ""
+        for page in pages:
+            for content, chunk_section, section in self._chunk_page(page["text"], section):
+                yield Document(content=content, meta={
+                    "page_number": page["page_number"],
+                    "section": chunk_section,
+                    "split_id": split_id,
+                })
+                split_id += 1
+
+    def _units(self, text):
+        """(sentence, tokens, opens_section) for each sentence on a page."""
+        block = []
+        heading = None
+        for line in text.splitlines():
+            if is_heading(line):
+                yield from self._block_units(block, heading)
+                block, heading = [line], line.strip()
+            else:
+                block.append(line)
+        yield from self._block_units(block, heading)
+
+    def _block_units(self, lines, heading):
+        for index, sentence in enumerate(split_sentences("\n".join(lines))):
+            yield sentence, count_tokens(sentence), WHITESPACE.sub(" ", heading) if heading and index == 0 else None
+
+    def _chunk_page(self, text, section):
+        """Yield (content, section at chunk start, section after chunk) for one page."""
+        current = []
+        current_tokens = 0
+        chunk_section = section
+
+        def flush(keep_overlap):
+            nonlocal current, current_tokens, chunk_section
+            content = " ".join(sentence for sentence, _ in current)
+            overlap = []
+            if keep_overlap:
+                kept = 0
+                for sentence, tokens in reversed(current[1:]):
+                    if kept + tokens > self.overlap_tokens:
+                        break
+                    overlap.insert(0, (sentence, tokens))
+                    kept += tokens
+            current, current_tokens = overlap, sum(tokens for _, tokens in overlap)
+            started_in = chunk_section
+            chunk_section = section
+            return content, started_in
+
+        for sentence, tokens, opens_section in self._units(text):
+            if tokens > self.max_tokens:
+                # A single run-on "sentence" (tables, lists without punctuation): cut by tokens
+                if current:
+                    content, started_in = flush(keep_overlap=False)
+                    yield content, started_in, section
+                if opens_section:
+                    section = chunk_section = opens_section
+                for piece in split_tokens(sentence, self.max_tokens):
+                    yield piece, section, section
+                continue
+
+            if opens_section and current and current_tokens >= self.min_tokens:
+                content, started_in = flush(keep_overlap=False)
+                yield content, started_in, section
+            elif current and current_tokens + tokens > self.max_tokens:
+                content, started_in = flush(keep_overlap=True)
+                yield content, started_in, section
+                while current and current_tokens + tokens > self.max_tokens:
+                    current_tokens -= current.pop(0)[1]
+            if opens_section:
+                section = opens_section
+                if not current:
+                    chunk_section = section
+            current.append((sentence, tokens))
+            current_tokens += tokens
+
+        if current:
+            content, started_in = flush(keep_overlap=False)
+            yield content, started_in, section
@@ -0,0 +1,59 @@
+"""
+Long-lived OpenAI clients shared by every request in a process.
+
+Building an OpenAI client per request opens a new connection pool, so every
+chat message paid for a fresh TCP and TLS handshake. The client returned by
+get_openai_client() is built once per process (a forked worker builds its
+own) on an httpx connection pool that keeps connections alive between
+requests. httpx clients are thread-safe, so concurrent requests share it.
+
+Pool sizes, keep-alive and timeouts come from the OPENAI_* settings.
+"""
+import os
+import httpx
+from django.conf import settings
+from pinecone_store import per_process
+
+
+def openai_timeout():
+    return httpx.Timeout(
+        getattr(settings, "OPENAI_TIMEOUT", 60.0),
+        connect=getattr(settings, "OPENAI_CONNECT_TIMEOUT", 5.0),
+    )
+
+
+def openai_limits():
+    return httpx.Limits(
+        max_connections=getattr(settings, "OPENAI_MAX_CONNECTIONS", 32),
+        max_keepalive_connections=getattr(settings, "OPENAI_MAX_KEEPALIVE_CONNECTIONS", 16),
+        keepalive_expiry=getattr(settings, "OPENAI_KEEPALIVE_EXPIRY", 60.0),
+    )
+
+
+@per_process
+def get_openai_client():
+    """The OpenAI client for this process, on a keep-alive connection pool"""
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=openai_timeout(),
+        max_retries=getattr(settings, "OPENAI_MAX_RETRIES", 2),
+        http_client=httpx.Client(limits=openai_limits(), timeout=openai_timeout()),
+    )
+
+
+def make_async_openai_client(api_key=None, max_retries=0):
+    """
+    An AsyncOpenAI client with the configured pool limits and timeouts.
+    Async clients are bound to the event loop they first run on, so these
+    are made per batch of work rather than shared across the process.
+    """
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=api_key or os.getenv("OPENAI_API_KEY"),
+        timeout=openai_timeout(),
+        max_retries=max_retries,
+        http_client=httpx.AsyncClient(limits=openai_limits(), timeout=openai_timeout()),
+    )
@@ -0,0 +1,117 @@
+"""
+Per-process pool of the Haystack components used by analysis and ingestion.
+
+Building these is the expensive part of a request: PromptBuilder compiles the
+section template, OpenAIGenerator sets up an HTTP client and the chunker
+loads the tiktoken encoding. They hold no per-request state,
+so one instance of each is built per process and shared by every request.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from haystack.components.builders import PromptBuilder
+from haystack.components.generators import OpenAIGenerator
+from haystack.utils import Secret
+from pinecone_store import per_process
+
+
+class ComponentPool:
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+        self._components = {}
+
+    def _get(self, name, factory):
+        component = self._components.get(name)
+        if component is not None:
+            return component
+        with self._lock:
+            if name not in self._components:
+                start = time.perf_counter()
+                self._components[name] = factory()
+                self.timings[name] = round(time.perf_counter() - start, 3)
+                print(f"Built {name} in {self.timings[name]}s")
+            return self._components[name]
+
+    @property
+    def section_prompt_builder(self):
+        from .rfp_analyzer import SECTION_TEMPLATE
+
+        return self._get("section_prompt_builder", lambda: PromptBuilder(
+            template=SECTION_TEMPLATE,
+            required_variables=["documents", "query", "structure", "instructions"],
+        ))
+
+    @property
+    def llm(self):
+        from .rfp_analyzer import LLM_MODEL
+
+        from .clients import get_openai_client
+
+        def build():
+            generator = OpenAIGenerator(
+                api_key=Secret.from_token(os.getenv("OPENAI_API_KEY")),
+                model=LLM_MODEL,
+                generation_kwargs={"response_format": {"type": "json_object"}},
+            )
+            # Share the process-wide client and its keep-alive connection pool
+            generator.client = get_openai_client()
+            return generator
+
+        return self._get("llm", build)
+
+    @property
+    def chunker(self):
+        from .chunking import TokenChunker
+        from .ingestion import chunking_settings
+
+        def build():
+            chunking = chunking_settings()
+            return TokenChunker(
+                max_tokens=chunking["max_tokens"],
+                overlap_tokens=chunking["overlap_tokens"],
+                min_tokens=chunking["min_tokens"],
+            )
+
+        return self._get("chunker", build)
+
+    @property
+    def search_executor(self):
+        return self._get("search_executor", lambda: ThreadPoolExecutor(
+            max_workers=getattr(settings, "ANALYSIS_SEARCH_WORKERS", 16),
+            thread_name_prefix="vector-search",
+        ))
+
+    @property
+    def section_executor(self):
+        # Retrieval and the LLM call of each analysis section; one worker per section allowed to run at once
+        return self._get("section_executor", lambda: ThreadPoolExecutor(
+            max_workers=getattr(settings, "ANALYSIS_MAX_CONCURRENT_SECTIONS", 11),
+            thread_name_prefix="analysis-section",
+        ))
+
+    @property
+    def upsert_executor(self):
+        return self._get("upsert_executor", lambda: ThreadPoolExecutor(
+            max_workers=getattr(settings, "UPSERT_MAX_IN_FLIGHT", 8),
+            thread_name_prefix="vector-upsert",
+        ))
+
+    def warm_up(self):
+        """Build every pooled component now and return how long each took, in seconds."""
+        self.section_prompt_builder
+        self.chunker
+        self.search_executor
+        self.section_executor
+        self.upsert_executor
+        if os.getenv("OPENAI_API_KEY"):
+            self.llm
+        return dict(self.timings)
+
+
+@per_process
+def get_component_pool():
+    """The component pool for this process"""
+    return ComponentPool()
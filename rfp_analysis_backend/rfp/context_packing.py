@@ -0,0 +1,155 @@
+"""
+Assembly of retrieved chunks into the context sent to the LLM.
+
+Consecutive chunks repeat up to CHUNK_OVERLAP_TOKENS of each other's
+sentences, and retrieval often returns neighbours together, so pasting the
+chunks as they come sends the same sentences twice. pack_context() joins
+chunks that are neighbours in the PDF back into passages, dropping the
+repeated sentences, then keeps passages in order of relevance until the
+token budget is spent. The kept passages are returned in reading order.
+Tokens are counted with the model's tokenizer (see tokens.py), with counts
+cached per sentence since the same chunks come back for many queries.
+"""
+import functools
+from collections import namedtuple
+from typing import Dict, List
+from haystack import Document
+from .chunking import split_sentences
+from .tokens import count_tokens
+
+PackedContext = namedtuple("PackedContext", ["documents", "stats"])
+
+PASSAGE_SEPARATOR = "\n\n"
+# A passage cut to fit the budget must keep at least this many tokens to be worth sending
+MIN_PARTIAL_TOKENS = 40
+
+
+@functools.lru_cache(maxsize=65536)
+def sentence_tokens(sentence: str) -> int:
+    return count_tokens(sentence)
+
+
+class _Passage:
+    """Consecutive chunks joined into one run of sentences."""
+
+    def __init__(self, rank, doc):
+        self.rank = rank
+        self.first = doc
+        self.score = doc.score
+        self.sentences = []
+        # Where the best-ranked chunk's sentences start; a cut passage keeps those
+        self.best_start = 0
+        self.pages = []
+        self.add(rank, doc)
+
+    def add(self, rank, doc):
+        sentences = split_sentences(doc.content or "")
+        offset = len(self.sentences)
+        for size in range(min(len(self.sentences), len(sentences)), 0, -1):
+            # Drop the sentences this chunk repeats from the end of the previous one
+            if self.sentences[-size:] == sentences[:size]:
+                offset -= size
+                sentences = sentences[size:]
+                break
+        self.sentences += sentences
+        if rank < self.rank:
+            self.rank = rank
+            self.best_start = offset
+            self.score = doc.score
+        page = (doc.meta or {}).get("page_number")
+        if page is not None and page not in self.pages:
+            self.pages.append(page)
+
+
+def _passages(documents: List[Document]) -> List[_Passage]:
+    """Group chunks whose split_ids are consecutive into passages, best-ranked first."""
+    ranked = {}
+    for rank, doc in enumerate(documents):
+        ranked.setdefault(doc.id, (rank, doc))
+    placed = sorted(
+        (entry for entry in ranked.values() if (entry[1].meta or {}).get("split_id") is not None),
+        key=lambda entry: entry[1].meta["split_id"],
+    )
+    passages = []
+    previous_split = None
+    for rank, doc in placed:
+        if passages and doc.meta["split_id"] == previous_split + 1:
+            passages[-1].add(rank, doc)
+        else:
+            passages.append(_Passage(rank, doc))
+        previous_split = doc.meta["split_id"]
+    # Chunks without a split_id (older indexes) cannot be placed, so each stands alone
+    passages += [_Passage(rank, doc) for rank, doc in ranked.values() if (doc.meta or {}).get("split_id") is None]
+    return sorted(passages, key=lambda passage: passage.rank)
+
+
+def pack_context(documents: List[Document], max_tokens: int) -> PackedContext:
+    """
+    Merge, deduplicate and pack retrieved chunks (best first) into at most
+    ``max_tokens`` tokens. Returns the passages as Documents in reading
+    order, and stats comparing the packed context with the raw chunks.
+    """
+    # What pasting every chunk as retrieved would have cost
+    raw_tokens = count_tokens(render_context(documents))
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    remaining = max_tokens
+    packed = []
+    for passage in _passages(documents):
+        cost = separator_tokens if packed else 0
+        # A passage that does not fit whole is cut, keeping its best-ranked chunk
+        sentences = passage.sentences
+        total = cost + sum(sentence_tokens(sentence) + 1 for sentence in sentences)
+        if total > remaining:
+            sentences = sentences[passage.best_start:]
+        kept = []
+        for sentence in sentences:
+            tokens = sentence_tokens(sentence) + 1  # the joining space
+            if cost + tokens > remaining:
+                break
+            kept.append(sentence)
+            cost += tokens
+        if not kept or (len(kept) < len(passage.sentences) and cost < MIN_PARTIAL_TOKENS):
+            continue
+        packed.append((passage, kept))
+        remaining -= cost
+
+    def render(entries):
+        return PASSAGE_SEPARATOR.join(" ".join(kept) for _, kept in entries)
+
+    # Per-sentence counts can differ slightly from the joined text's; trim the least relevant passage to be exact
+    while packed and count_tokens(render(packed)) > max_tokens:
+        least = max(range(len(packed)), key=lambda i: packed[i][0].rank)
+        packed[least][1].pop()
+        if not packed[least][1]:
+            packed.pop(least)
+
+    packed.sort(key=lambda entry: (entry[0].first.meta or {}).get("split_id", float("inf")))
+    passages = [
+        Document(
+            content=" ".join(kept),
+            meta=dict(passage.first.meta or {}, page_numbers=passage.pages),
+            score=passage.score,
+        )
+        for passage, kept in packed
+    ]
+    packed_tokens = count_tokens(render(packed))
+    stats = {
+        "chunks": len(documents),
+        "passages": len(passages),
+        "truncated_passages": sum(len(kept) < len(passage.sentences) for passage, kept in packed),
+        "raw_tokens": raw_tokens,
+        "packed_tokens": packed_tokens,
+        "saved_tokens": raw_tokens - packed_tokens,
+        "budget": max_tokens,
+    }
+    return PackedContext(passages, stats)
+
+
+def render_context(documents: List[Document]) -> str:
+    return PASSAGE_SEPARATOR.join(doc.content or "" for doc in documents)
+
+
+def sum_stats(stats: List[Dict]) -> Dict:
+    """Totals of several pack_context stats, for requests that pack more than one context."""
+    keys = ("chunks", "passages", "truncated_passages", "raw_tokens", "packed_tokens", "saved_tokens")
+    return {key: sum(entry[key] for entry in stats) for key in keys}
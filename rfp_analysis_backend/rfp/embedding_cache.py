@@ -0,0 +1,230 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+from django.conf import settings
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Evict down to this fraction of the limit so we don't evict again on the very next write.
+EVICTION_TARGET = 0.9
+
+# Keep embeddings_size in step with the embeddings table
+SIZE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings BEGIN
+        UPDATE embeddings_size SET entries = entries + 1, bytes = bytes + LENGTH(new.vector);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings BEGIN
+        UPDATE embeddings_size SET entries = entries - 1, bytes = bytes - LENGTH(old.vector);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS embeddings_size_update AFTER UPDATE OF vector ON embeddings BEGIN
+        UPDATE embeddings_size SET bytes = bytes + LENGTH(new.vector) - LENGTH(old.vector);
+    END
+    """,
+]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def text_key(model: str, text: str) -> str:
+    """Cache key for a text embedded with a given model."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache shared by every process on the host.
+
+    Vectors are stored as float32 blobs in SQLite, keyed by model and a hash of
+    the text. When the stored vectors outgrow ``max_bytes`` the least recently
+    used entries are evicted. Hit and miss counters are kept per process.
+
+    The entry count and total vector bytes are kept up to date by triggers in
+    a one-row ``embeddings_size`` table, so checking the size on every write
+    never scans the whole table, and every process sees the same total.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                )
+                """
+            )
+            for trigger in SIZE_TRIGGERS:
+                self._conn.execute(trigger)
+            # Caches created before the size table was added are summed once
+            self._conn.execute(
+                "INSERT OR IGNORE INTO embeddings_size "
+                "SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for texts; missing entries come back as None."""
+        keys = [text_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [time.time(), *batch],
+                    )
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store embeddings for texts, then evict old entries if over the size limit."""
+        now = time.time()
+        rows = [
+            (text_key(model, text), model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete fires no trigger
+                self._conn.executemany(
+                    "INSERT INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET vector = excluded.vector, last_used = excluded.last_used",
+                    rows,
+                )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        total_bytes = self._conn.execute("SELECT bytes FROM embeddings_size").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        to_free = total_bytes - int(self.max_bytes * EVICTION_TARGET)
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= to_free:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        print(f"Embedding cache evicted {len(doomed)} entries ({freed} bytes)")
+
+    def get_or_embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        on_ready: Optional[Callable[[List[int], List[List[float]]], None]] = None,
+    ) -> List[List[float]]:
+        """
+        Return embeddings for texts, calling ``embed_fn`` only for cache misses.
+        Duplicate texts within a call are embedded once.
+
+        With ``on_ready(positions, vectors)``, vectors are also handed over as
+        soon as they are available: cache hits straight away, misses batch by
+        batch through ``embed_fn(missing, on_batch=...)`` (ConcurrentEmbedder.embed).
+        """
+        vectors = self.get_many(model, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if on_ready is not None:
+            hits = [position for position, vector in enumerate(vectors) if vector is not None]
+            if hits:
+                on_ready(hits, [vectors[position] for position in hits])
+        if missing:
+            if on_ready is None:
+                embedded = embed_fn(missing)
+            else:
+                positions = defaultdict(list)
+                for position, (text, vector) in enumerate(zip(texts, vectors)):
+                    if vector is None:
+                        positions[text].append(position)
+
+                def on_batch(start, batch_vectors):
+                    ready = [(position, vector)
+                             for text, vector in zip(missing[start:start + len(batch_vectors)], batch_vectors)
+                             for position in positions[text]]
+                    on_ready([position for position, _ in ready], [vector for _, vector in ready])
+
+                embedded = embed_fn(missing, on_batch=on_batch)
+            fresh = dict(zip(missing, embedded))
+            self.put_many(model, missing, [fresh[text] for text in missing])
+            vectors = [vector if vector is not None else fresh[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total_bytes = self._conn.execute("SELECT entries, bytes FROM embeddings_size").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the per-process embedding cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                getattr(settings, "EMBEDDING_CACHE_PATH", os.path.join(settings.BASE_DIR, "cache", "embeddings.sqlite3")),
+                getattr(settings, "EMBEDDING_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+            )
+        return _cache
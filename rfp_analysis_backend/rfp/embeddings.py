@@ -0,0 +1,133 @@
+import asyncio
+import os
+import random
+import time
+from typing import List, Sequence
+from django.conf import settings
+from .clients import make_async_openai_client
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limiter that halves its limit on every rate-limit response and
+    creeps back up by one after a run of successful requests (AIMD), never
+    exceeding the configured ceiling.
+    """
+
+    def __init__(self, max_in_flight: int, recovery_successes: int = 4):
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self.recovery_successes = recovery_successes
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, rate_limited: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.recovery_successes and self.limit < self.max_in_flight:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class ConcurrentEmbedder:
+    """
+    Embed texts in batches with several requests in flight at once.
+
+    Concurrency is capped at ``max_in_flight`` and shrinks automatically when
+    the API answers 429. Results are returned in input order regardless of
+    the order batches complete in. Throughput of the last run is kept in
+    ``last_stats``.
+    """
+
+    def __init__(self, model=EMBEDDING_MODEL, api_key=None, batch_size=None, max_in_flight=None, max_retries=6):
+        self.model = model
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.batch_size = batch_size or getattr(settings, "EMBEDDING_BATCH_SIZE", 100)
+        self.max_in_flight = max_in_flight or getattr(settings, "EMBEDDING_MAX_IN_FLIGHT", 8)
+        self.max_retries = max_retries
+        self.last_stats = {}
+
+    async def _embed_batch(self, client, limiter, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            rate_limited = False
+            try:
+                # Newlines hurt embedding quality; strip them the same way Haystack's embedders do
+                response = await client.embeddings.create(
+                    model=self.model, input=[text.replace("\n", " ") for text in batch]
+                )
+                return [list(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                rate_limited = isinstance(e, RateLimitError)
+                retry_after = _retry_after(e)
+                delay = retry_after if retry_after is not None else min(30.0, 0.5 * 2 ** attempt)
+                self.last_stats["retries"] += 1
+                if rate_limited:
+                    self.last_stats["rate_limited"] += 1
+            finally:
+                await limiter.release(rate_limited)
+            await asyncio.sleep(delay * (1 + random.random() * 0.25))
+
+    async def embed(self, texts: Sequence[str], on_batch=None) -> List[List[float]]:
+        """
+        Embed texts concurrently, returning one vector per text in input order.
+
+        ``on_batch(start, vectors)`` is called as each batch completes, with the
+        offset of its first text, so callers can use vectors before the rest arrive.
+        """
+        texts = list(texts)
+        self.last_stats = {"chunks": len(texts), "retries": 0, "rate_limited": 0}
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        limiter = AdaptiveLimiter(self.max_in_flight)
+
+        async def run(client, index, batch):
+            vectors = await self._embed_batch(client, limiter, batch)
+            if on_batch is not None:
+                on_batch(index * self.batch_size, vectors)
+            return vectors
+
+        start = time.perf_counter()
+        # Retries are handled here so 429s can feed back into the concurrency limit
+        async with make_async_openai_client(api_key=self.api_key) as client:
+            results = await asyncio.gather(*(run(client, index, batch) for index, batch in enumerate(batches)))
+        elapsed = time.perf_counter() - start
+
+        self.last_stats.update({
+            "batches": len(batches),
+            "seconds": round(elapsed, 3),
+            "chunks_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+            "final_in_flight_limit": limiter.limit,
+        })
+        print(f"Embedded {len(texts)} chunks in {len(batches)} batches: {self.last_stats}")
+        return [vector for batch in results for vector in batch]
+
+
+def _retry_after(error):
+    """Seconds to wait according to the response's Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,232 @@
+"""
+Excel exports of analyses and bid matrices, streamed to the client.
+
+Workbooks are built in openpyxl's write-only mode: each appended row is
+serialized straight to a temporary file instead of being kept as cell
+objects, so a report over hundreds of RFPs holds one RFP's analysis in
+memory at a time. When the rows are written, the workbook is zipped into
+64 KB chunks that a StreamingHttpResponse sends as they are produced.
+"""
+import json
+import queue
+import threading
+from django.http import StreamingHttpResponse
+from .analysis_schema import SECTIONS
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CHUNK_SIZE = 64 * 1024
+# Excel refuses cells longer than this
+MAX_CELL_CHARACTERS = 32767
+
+DETAIL_COLUMNS = [("RFP", 30), ("Section", 24), ("Field", 34), ("Value", 80), ("Confidence", 12), ("Interpreted", 12)]
+MATRIX_COLUMNS = [
+    ("Section", 24), ("Category", 18), ("Requirement", 80), ("Priority", 10),
+    ("Status", 12), ("Assigned To", 18), ("Notes", 48),
+]
+
+
+def title(name):
+    """'introduction/background' -> 'Introduction/Background'."""
+    return name.replace("_", " ").title()
+
+
+def cell_text(value):
+    """Render a field value for a cell: scalars as they are, lists one item per line, anything else as JSON."""
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        value = "\n".join(str(cell_text(item)) for item in value)
+    elif not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    # PDF text keeps form feeds and other control characters that openpyxl rejects
+    return ILLEGAL_CHARACTERS_RE.sub("", value)[:MAX_CELL_CHARACTERS]
+
+
+def field_rows(result):
+    """
+    Flatten an analysis result into (section, field, value, confidence,
+    interpreted) rows in schema order, followed by any sections or fields
+    the schema does not know about. Fields stored as bare values (older
+    analyses) get an empty confidence.
+    """
+    result = result or {}
+    sections = list(SECTIONS) + [name for name in result if name not in SECTIONS]
+    for section in sections:
+        data = result.get(section)
+        if not isinstance(data, dict):
+            continue
+        fields = [name for name in SECTIONS.get(section, []) if name in data]
+        fields += [name for name in data if name not in fields]
+        for field in fields:
+            item = data[field]
+            if isinstance(item, dict) and "value" in item:
+                yield section, field, item.get("value"), item.get("confidence"), item.get("is_interpreted")
+            else:
+                yield section, field, item, None, None
+
+
+def _header(worksheet, columns):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    for index, (_, width) in enumerate(columns, start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+    worksheet.freeze_panes = "A2"
+    cells = []
+    for name, _ in columns:
+        cell = WriteOnlyCell(worksheet, value=name)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    worksheet.append(cells)
+
+
+def write_report(workbook, analyses):
+    """
+    Write analyses into a "Summary" sheet (one row per RFP, one column per
+    field value) and a "Details" sheet (one row per field with its
+    confidence and whether it was interpreted).
+
+    ``analyses`` yields (label, uploaded_at, result) and is consumed once,
+    so it can be a lazy queryset iterator. Write-only sheets are filled one
+    at a time, so the detail rows are buffered in a temporary file on disk
+    until the summary is done.
+    """
+    import tempfile
+
+    summary = workbook.create_sheet("Summary")
+    columns = [(section, field) for section, fields in SECTIONS.items() for field in fields]
+    _header(summary, [("RFP", 30), ("Uploaded", 20)] + [(f"{title(s)}: {title(f)}", 30) for s, f in columns])
+
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as details:
+        count = 0
+        for label, uploaded_at, result in analyses:
+            values = {}
+            for section, field, value, confidence, interpreted in field_rows(result):
+                values[(section, field)] = value
+                row = [label, title(section), title(field), cell_text(value), confidence, interpreted]
+                details.write(json.dumps(row, default=str) + "\n")
+            summary.append([cell_text(label), uploaded_at] + [cell_text(values.get(column)) for column in columns])
+            count += 1
+
+        detail_sheet = workbook.create_sheet("Details")
+        _header(detail_sheet, DETAIL_COLUMNS)
+        details.seek(0)
+        for line in details:
+            label, section, field, value, confidence, interpreted = json.loads(line)
+            detail_sheet.append([cell_text(label), section, field, value, confidence, interpreted])
+    return count
+
+
+def write_matrix(workbook, matrix):
+    """Write a bid matrix from RFPAnalyzer.generate_bid_matrix(), one row per item."""
+    worksheet = workbook.create_sheet("Bid Matrix")
+    _header(worksheet, MATRIX_COLUMNS)
+    for section in matrix.get("sections", []):
+        for item in section.get("items", []):
+            worksheet.append([
+                cell_text(section.get("name")),
+                cell_text(item.get("category")),
+                cell_text(item.get("requirement")),
+                cell_text(item.get("priority")),
+                cell_text(item.get("status")),
+                cell_text(item.get("assigned_to", "")),
+                cell_text(item.get("notes")),
+            ])
+
+
+class _ChunkWriter:
+    """File-like sink for zipfile that hands fixed-size chunks to a queue; it has no tell(), so the zip streams."""
+
+    def __init__(self, chunks, cancelled):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+        self.aborted = False
+
+    def write(self, data):
+        if self.cancelled.is_set():
+            if self.aborted:
+                # zipfile and openpyxl still flush on their way out; drop it quietly
+                return len(data)
+            self.aborted = True
+            raise ConnectionAbortedError("Export cancelled")
+        self.buffer += data
+        while len(self.buffer) >= CHUNK_SIZE:
+            self._put(bytes(self.buffer[:CHUNK_SIZE]))
+            del self.buffer[:CHUNK_SIZE]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def _put(self, chunk):
+        if not _put(self.chunks, self.cancelled, ("chunk", chunk)) and not self.aborted:
+            self.aborted = True
+            raise ConnectionAbortedError("Export cancelled")
+
+
+def _put(items, cancelled, item):
+    """Put onto a bounded queue, giving up once the consumer has gone away."""
+    while not cancelled.is_set():
+        try:
+            items.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iterate_xlsx(write):
+    """
+    Build a write-only workbook with write(workbook) in a worker thread and
+    yield the .xlsx file in chunks as it is zipped. At most a few chunks are
+    held in memory; exceptions from write() are re-raised in the caller.
+    """
+    from django.db import connection
+    from openpyxl import Workbook
+
+    chunks = queue.Queue(maxsize=8)
+    cancelled = threading.Event()
+
+    def run():
+        sink = _ChunkWriter(chunks, cancelled)
+        try:
+            workbook = Workbook(write_only=True)
+            write(workbook)
+            workbook.save(sink)
+            sink.close()
+            _put(chunks, cancelled, ("done", None))
+        except BaseException as e:
+            _put(chunks, cancelled, ("error", e))
+        finally:
+            # Querysets iterated by write() opened this thread's own connection
+            connection.close()
+
+    thread = threading.Thread(target=run, name="xlsx-export", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = chunks.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        cancelled.set()
+
+
+def xlsx_response(write, filename):
+    """A StreamingHttpResponse downloading the workbook built by write(workbook)."""
+    response = StreamingHttpResponse(iterate_xlsx(write), content_type=XLSX_CONTENT_TYPE)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,278 @@
+import json
+import os
+import queue
+import threading
+from collections import namedtuple
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from . import ingestion_cache, similarity
+from .components import get_component_pool
+from .embedding_cache import get_embedding_cache
+from .embeddings import ConcurrentEmbedder, EMBEDDING_MODEL
+from .keyword_index import build_session_index, delete_session_index
+from .pdf_extraction import NoExtractableTextError, extract_pages
+from .tokens import ENCODING_NAME, get_encoding
+from .upserts import BatchUpserter, upsert_documents
+
+IngestionResult = namedtuple("IngestionResult", ["text", "pages", "documents", "cache_hit"])
+
+# Chunks embedded (and cached) per step; bounds the work lost to an interrupted run.
+EMBEDDING_CHECKPOINT_CHUNKS = 500
+
+# Stages reported to ingest_pdf's progress callback, in order.
+INGESTION_STAGES = ["extracting", "splitting", "embedding", "indexing"]
+
+
+def chunking_settings():
+    """Chunker settings; part of the ingestion and analysis cache keys."""
+    return {
+        "chunker": "token",
+        "max_tokens": getattr(settings, "CHUNK_MAX_TOKENS", 400),
+        "overlap_tokens": getattr(settings, "CHUNK_OVERLAP_TOKENS", 50),
+        "min_tokens": getattr(settings, "CHUNK_MIN_TOKENS", 100),
+        # Estimated counts give different chunks than real ones, so they are cached apart
+        "encoding": ENCODING_NAME if get_encoding() else "estimate",
+    }
+
+
+def pages_to_text(pages):
+    """Join extracted pages with form feeds, one page per form-feed-separated block."""
+    return "\f".join(page["text"] for page in pages)
+
+
+def _load_checkpoint(checkpoint_dir):
+    path = checkpoint_dir and os.path.join(checkpoint_dir, "pages.json")
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_checkpoint(checkpoint_dir, pages):
+    if not checkpoint_dir:
+        return
+    path = os.path.join(checkpoint_dir, "pages.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_cached(content_hash):
+    """
+    Return (cache_key, CachedIngestion or None) for a PDF. The key covers the
+    chunking and embedding settings, so changing either misses the cache.
+    """
+    cache_key = ingestion_cache.ingestion_cache_key(content_hash, chunking_settings(), EMBEDDING_MODEL)
+    return cache_key, ingestion_cache.load(cache_key)
+
+
+def extract(file_path, checkpoint_dir=None, extractor=extract_pages):
+    """
+    Return (pages, from_checkpoint) for a PDF. With a ``checkpoint_dir``,
+    pages saved there by an earlier, interrupted run are reused, and newly
+    extracted pages are saved for the next one. ``extractor(file_path)``
+    does the parsing (default: extract_pages across the process pool).
+    """
+    pages = _load_checkpoint(checkpoint_dir)
+    if pages is not None:
+        return pages, True
+    pages = extractor(file_path)
+    if not pages_to_text(pages).strip():
+        raise NoExtractableTextError("No extractable text found in PDF")
+    _save_checkpoint(checkpoint_dir, pages)
+    return pages, False
+
+
+def split(pages):
+    """Chunk pages to the token budget with the pooled chunker."""
+    return get_component_pool().chunker.run(pages)["documents"]
+
+
+def embed(chunks, on_ready=None, on_embedded=None):
+    """
+    Set the embedding of every chunk. Only chunks missing from the embedding
+    cache reach the API, in concurrent batches. Each slice of
+    EMBEDDING_CHECKPOINT_CHUNKS is cached as soon as it is embedded, so a run
+    interrupted part-way resumes from the last finished slice.
+
+    ``on_ready(chunks)`` receives chunks as soon as their vectors arrive, so
+    indexing can overlap with embedding; ``on_embedded(count)`` is called
+    after each slice. Both run on the calling thread, so they may use the ORM.
+    """
+    embed_texts = async_to_sync(ConcurrentEmbedder(model=EMBEDDING_MODEL).embed)
+    for start in range(0, len(chunks), EMBEDDING_CHECKPOINT_CHUNKS):
+        batch = chunks[start:start + EMBEDDING_CHECKPOINT_CHUNKS]
+        texts = [doc.content for doc in batch]
+        if on_ready is None:
+            vectors = get_embedding_cache().get_or_embed(EMBEDDING_MODEL, texts, embed_texts)
+            for doc, vector in zip(batch, vectors):
+                doc.embedding = vector
+        else:
+            for positions, vectors in _embed_in_background(texts, embed_texts):
+                for position, vector in zip(positions, vectors):
+                    batch[position].embedding = vector
+                on_ready([batch[position] for position in positions])
+        if on_embedded is not None:
+            on_embedded(start + len(batch))
+    print(f"Embedding cache: {get_embedding_cache().stats()}")
+    return chunks
+
+
+def _embed_in_background(texts, embed_texts):
+    """
+    Yield (positions, vectors) as the embedding cache and the embedder hand
+    them over. The embedder calls back from async_to_sync's event loop,
+    where Django refuses database access, so the embedding runs in a helper
+    thread and its callbacks are queued for the caller's thread instead.
+    """
+    ready = queue.Queue()
+    finished = object()
+
+    def run():
+        try:
+            get_embedding_cache().get_or_embed(
+                EMBEDDING_MODEL, texts, embed_texts, on_ready=lambda positions, vectors: ready.put((positions, vectors))
+            )
+            ready.put((finished, None))
+        except BaseException as e:
+            ready.put((finished, e))
+
+    thread = threading.Thread(target=run, name="ingestion-embed", daemon=True)
+    thread.start()
+    try:
+        while True:
+            positions, vectors = ready.get()
+            if positions is finished:
+                if vectors is not None:
+                    raise vectors
+                return
+            yield positions, vectors
+    finally:
+        # Let the embedder finish what it started; its vectors are cached either way
+        thread.join()
+
+
+def finish(cache_key, content_hash, session_id, pages, chunks, cache_hit):
+    """
+    After the chunks are in the store: cache the ingestion (unless it came
+    from the cache), fingerprint the PDF for similarity and build the
+    session's keyword index.
+    """
+    if not cache_hit:
+        try:
+            ingestion_cache.store(cache_key, pages, chunks)
+        except Exception as e:
+            print(f"Failed to store ingestion cache entry for {content_hash}: {e}")
+    if not cache_hit or similarity.load_fingerprint(content_hash) is None:
+        fingerprint_chunks(content_hash, chunks)
+    index_keywords(session_id, chunks)
+    return IngestionResult(pages_to_text(pages), pages, chunks, cache_hit)
+
+
+def ingest_pdf(file_path, content_hash, document_store, progress=None, checkpoint_dir=None, session_id=None):
+    """
+    Extract, split, embed and index a PDF into the given document store.
+
+    Results are cached by content hash plus chunking and embedding settings,
+    so a PDF that has been ingested before skips straight to writing its
+    stored vectors into the store.
+
+    ``progress(stage, status, **info)`` is called as each of INGESTION_STAGES
+    starts ("running") and finishes ("done" or "cached"). With a
+    ``checkpoint_dir``, extracted pages are saved there and reused by the
+    next run, so resuming an interrupted ingestion skips extraction.
+
+    The chunks are also indexed for keyword search under ``session_id``
+    (the session owning ``document_store``); see keyword_index.
+    """
+    progress = progress or (lambda stage, status, **info: None)
+    # The old keyword index describes chunks the store no longer holds
+    delete_session_index(session_id)
+
+    cache_key, cached = load_cached(content_hash)
+    if cached:
+        for stage in INGESTION_STAGES[:-1]:
+            progress(stage, "cached")
+        progress("indexing", "running", chunks=len(cached.documents))
+        upsert_documents(document_store, cached.documents)
+        progress("indexing", "done", chunks=len(cached.documents))
+        print(f"Ingestion cache hit for {content_hash}: wrote {len(cached.documents)} cached chunks")
+        return finish(cache_key, content_hash, session_id, cached.pages, cached.documents, True)
+
+    progress("extracting", "running")
+    pages, from_checkpoint = extract(file_path, checkpoint_dir)
+    progress("extracting", "cached" if from_checkpoint else "done", pages=len(pages))
+    print(f"Extracted {len(pages)} pages, text length: {len(pages_to_text(pages))}")
+
+    progress("splitting", "running")
+    chunks = split(pages)
+    progress("splitting", "done", chunks=len(chunks))
+    print(f"Split into {len(chunks)} document chunks")
+
+    # Chunks are handed to the upserter batch by batch as their vectors
+    # arrive, so indexing overlaps with embedding instead of waiting for it
+    progress("embedding", "running", chunks=len(chunks), embedded=0)
+    with BatchUpserter(document_store) as upserter:
+        def ready(documents):
+            upserter.add(documents)
+            progress("indexing", "running", chunks=len(chunks), indexed=upserter.written)
+
+        embed(chunks, on_ready=ready,
+              on_embedded=lambda count: progress("embedding", "running", chunks=len(chunks), embedded=count))
+        progress("embedding", "done", chunks=len(chunks), embedded=len(chunks))
+    progress("indexing", "done", chunks=len(chunks), indexed=upserter.written)
+    print(f"Wrote {upserter.written} documents to the document store")
+
+    return finish(cache_key, content_hash, session_id, pages, chunks, False)
+
+
+def ingest_session(file_path, content_hash, session_id, file_name=None, progress=None, checkpoint_dir=None):
+    """
+    Replace a session's documents with a PDF: clear the session's store,
+    ingest the PDF into it and, given a ``file_name``, record its
+    RFPDocument. The session's cached chat answers are dropped before and
+    after ingesting, since answers given while the new chunks were being
+    written are stale too. Returns (IngestionResult, RFPDocument or None).
+    """
+    from pinecone_store import reset_document_store
+    from .answer_cache import invalidate_session
+
+    document_store = reset_document_store(session_id)
+    invalidate_session(session_id)
+    try:
+        ingestion = ingest_pdf(
+            file_path, content_hash, document_store, progress=progress, checkpoint_dir=checkpoint_dir,
+            session_id=session_id,
+        )
+    finally:
+        invalidate_session(session_id)
+    document = record_document(file_name, content_hash, session_id, ingestion) if file_name else None
+    return ingestion, document
+
+
+def record_document(file_name, content_hash, session_id, ingestion):
+    """The RFPDocument for an ingested PDF, which analyses are keyed and stored on."""
+    from .models import RFPDocument
+
+    return RFPDocument.objects.create(
+        file=file_name,
+        content_hash=content_hash,
+        session_id=session_id or "",
+        extracted_text=ingestion.text,
+    )
+
+
+def fingerprint_chunks(content_hash, documents):
+    """Store the PDF's similarity fingerprint; failures never fail the ingestion."""
+    try:
+        similarity.fingerprint_documents(content_hash, documents)
+    except Exception as e:
+        print(f"Failed to fingerprint {content_hash}: {e}")
+
+
+def index_keywords(session_id, documents):
+    """Build the session's keyword index; without one, retrieval falls back to vectors only."""
+    try:
+        build_session_index(session_id, documents)
+    except Exception as e:
+        print(f"Failed to build keyword index for session {session_id}: {e}")
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
+from haystack import Document
+
+CachedIngestion = namedtuple("CachedIngestion", ["pages", "documents"])
+
+
+def get_cache_dir():
+    return getattr(settings, "INGESTION_CACHE_DIR", os.path.join(settings.BASE_DIR, "cache", "ingestion"))
+
+
+def ingestion_cache_key(content_hash, chunking, embedding_model):
+    """
+    Key an ingestion by the SHA-256 of the PDF bytes plus everything that
+    changes its output: the chunking settings and the embedding model.
+    """
+    fingerprint = json.dumps(
+        {"content_hash": content_hash, "chunking": chunking, "embedding_model": embedding_model},
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def load(key):
+    """Return the cached pages and embedded chunks for a key, or None on a miss."""
+    entry_dir = os.path.join(get_cache_dir(), key)
+    if not os.path.isdir(entry_dir):
+        return None
+    try:
+        with open(os.path.join(entry_dir, "pages.json"), encoding="utf-8") as f:
+            pages = json.load(f)
+        with open(os.path.join(entry_dir, "chunks.json"), encoding="utf-8") as f:
+            chunks = json.load(f)
+        vectors = np.load(os.path.join(entry_dir, "vectors.npy"), mmap_mode="r")
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable ingestion cache entry {key}: {e}")
+        return None
+    if len(chunks) != len(vectors):
+        # zip() would silently drop the unmatched chunks; rebuild the entry instead
+        print(f"Removing ingestion cache entry {key}: {len(chunks)} chunks but {len(vectors)} vectors")
+        del vectors
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        return None
+
+    documents = []
+    for chunk, vector in zip(chunks, vectors):
+        doc = Document.from_dict(chunk)
+        doc.embedding = vector.tolist()
+        documents.append(doc)
+    return CachedIngestion(pages, documents)
+
+
+def store(key, pages, documents):
+    """
+    Store extracted pages and embedded chunks under a key. The entry is built
+    in a scratch directory and renamed into place, so readers never see a
+    half-written entry.
+    """
+    cache_dir = get_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, key)
+    scratch_dir = os.path.join(cache_dir, f".{key}.{uuid.uuid4().hex}")
+    os.makedirs(scratch_dir)
+    try:
+        chunks = []
+        for doc in documents:
+            chunk = doc.to_dict(flatten=False)
+            chunk.pop("embedding", None)
+            chunks.append(chunk)
+        vectors = np.asarray([doc.embedding for doc in documents], dtype=np.float32)
+
+        with open(os.path.join(scratch_dir, "pages.json"), "w", encoding="utf-8") as f:
+            json.dump(pages, f)
+        with open(os.path.join(scratch_dir, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        np.save(os.path.join(scratch_dir, "vectors.npy"), vectors)
+
+        os.replace(scratch_dir, entry_dir)
+    except OSError:
+        # Another worker stored the same entry first; theirs is just as good.
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        if not os.path.isdir(entry_dir):
+            raise
@@ -0,0 +1,278 @@
+"""
+Background ingestion jobs.
+
+Submitting a PDF copies it into the job directory, records an IngestionJob
+row and returns straight away. A pool of worker threads claims queued jobs
+from the database and runs them through ingest_pdf, recording each stage's
+progress on the job. The database is the only queue, so no broker is needed
+and any process (the web server or `manage.py ingestion_worker`) can work
+through it.
+
+Running jobs send a heartbeat. A job whose heartbeat goes stale (its worker
+crashed or the process was killed) is put back on the queue until it runs
+out of attempts. Retries resume rather than restart: extracted pages are
+checkpointed in the job directory and embeddings are cached as they are
+computed, so only unfinished work is repeated.
+"""
+import os
+import shutil
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from pinecone_store import per_process
+from .models import IngestionJob
+
+HEARTBEAT_INTERVAL = 10
+POLL_INTERVAL = 2
+
+
+def get_job_dir(job_id):
+    base = getattr(settings, "INGESTION_JOB_DIR", os.path.join(settings.MEDIA_ROOT, "ingestion_jobs"))
+    return os.path.join(base, str(job_id))
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def submit_ingestion(upload, file_name, session_id):
+    """
+    Queue a spooled upload for ingestion and return its IngestionJob. The PDF
+    is copied out of the request's temporary file so it outlives the request.
+    """
+    job = IngestionJob(
+        session_id=session_id,
+        file_name=file_name,
+        content_hash=upload.sha256,
+    )
+    job_dir = get_job_dir(job.id)
+    os.makedirs(job_dir, exist_ok=True)
+    job.file_path = os.path.join(job_dir, "source.pdf")
+    shutil.copyfile(upload.path, job.file_path)
+    job.save()
+    get_worker_pool().notify()
+    return job
+
+
+def retry_job(job):
+    """Put a failed job back on the queue with a fresh set of attempts."""
+    if not os.path.exists(job.file_path):
+        raise ValueError("The job's PDF is no longer available; upload it again")
+    IngestionJob.objects.filter(pk=job.pk, status=IngestionJob.FAILED).update(
+        status=IngestionJob.QUEUED, attempts=0, error="", finished_at=None
+    )
+    get_worker_pool().notify()
+
+
+def job_status(job):
+    """JSON-serializable view of a job for the status endpoint."""
+    from .ingestion import INGESTION_STAGES
+
+    stages = job.progress.get("stages", {})
+    finished = sum(1 for stage in INGESTION_STAGES if stages.get(stage, {}).get("status") in ("done", "cached"))
+    return {
+        "job_id": str(job.id),
+        "session_id": job.session_id,
+        "file_name": job.file_name,
+        "status": job.status,
+        "stage": job.stage,
+        "stages": {stage: stages.get(stage, {"status": "pending"}) for stage in INGESTION_STAGES},
+        "percent": round(100 * finished / len(INGESTION_STAGES)),
+        "attempts": job.attempts,
+        "error": job.error,
+        "document_id": job.document_id,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def requeue_stale_jobs():
+    """
+    Return jobs whose worker stopped sending heartbeats to the queue, or fail
+    them if they have used up their attempts. Returns how many were requeued.
+    """
+    stale_after = getattr(settings, "INGESTION_JOB_STALE_SECONDS", 120)
+    max_attempts = getattr(settings, "INGESTION_JOB_MAX_ATTEMPTS", 3)
+    stale = IngestionJob.objects.filter(
+        status=IngestionJob.RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=stale_after),
+    )
+    stale.filter(attempts__gte=max_attempts).update(
+        status=IngestionJob.FAILED,
+        error="Worker stopped responding and no attempts are left",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status=IngestionJob.QUEUED,
+        error="Worker stopped responding; retrying",
+    )
+    if requeued:
+        print(f"Requeued {requeued} stale ingestion jobs")
+    return requeued
+
+
+def claim_next_job():
+    """Atomically claim the oldest queued job for this worker, or return None."""
+    while True:
+        job = IngestionJob.objects.filter(status=IngestionJob.QUEUED).order_by("created_at").first()
+        if job is None:
+            return None
+        # Only one worker's conditional update can flip the row from queued to running
+        claimed = IngestionJob.objects.filter(pk=job.pk, status=IngestionJob.QUEUED).update(
+            status=IngestionJob.RUNNING,
+            worker=worker_name(),
+            heartbeat_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+class _Heartbeat:
+    """Keep a running job's heartbeat fresh from a background thread."""
+
+    def __init__(self, claim):
+        self.claim = claim
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ingestion-heartbeat", daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(HEARTBEAT_INTERVAL):
+                self.claim.update(heartbeat_at=timezone.now())
+        finally:
+            close_old_connections()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(job):
+    """Run one claimed job through ingestion, recording progress and the outcome."""
+    from PyPDF2.errors import PdfReadError
+    from .ingestion import ingest_session, record_document
+    from .pdf_extraction import NoExtractableTextError
+
+    job_dir = os.path.dirname(job.file_path)
+    # Every write goes through this claim, so if the job was requeued while
+    # this worker was presumed dead, its late updates are simply dropped
+    claim = _claim(job)
+    progress = dict(job.progress or {})
+    progress.setdefault("stages", {})
+
+    def report(stage, status, **info):
+        entry = progress["stages"].setdefault(stage, {})
+        if status == "running" and entry.get("status") != "running":
+            entry["started_at"] = time.time()
+        if status in ("done", "cached") and "started_at" in entry:
+            entry["seconds"] = round(time.time() - entry["started_at"], 2)
+        entry.update(info, status=status)
+        claim.update(stage=stage, progress=progress, heartbeat_at=timezone.now())
+
+    print(f"Running ingestion job {job.id} (attempt {job.attempts}) for {job.file_name}")
+    try:
+        with _Heartbeat(claim):
+            # Every attempt starts from an empty namespace so retries never duplicate chunks
+            ingestion, _ = ingest_session(
+                job.file_path, job.content_hash, job.session_id, progress=report, checkpoint_dir=job_dir,
+            )
+    except (NoExtractableTextError, PdfReadError) as e:
+        # The PDF itself is unusable; retrying will not help. Anything else
+        # (an API error, a bug) takes the retry path below
+        _finish(claim, IngestionJob.FAILED, error=f"Failed to read PDF: {e}")
+        return
+    except Exception as e:
+        import traceback
+        print(f"Ingestion job {job.id} failed: {e}")
+        print(traceback.format_exc())
+        max_attempts = getattr(settings, "INGESTION_JOB_MAX_ATTEMPTS", 3)
+        if job.attempts < max_attempts:
+            claim.update(status=IngestionJob.QUEUED, error=str(e))
+        else:
+            _finish(claim, IngestionJob.FAILED, error=str(e))
+        return
+
+    if not claim.exists():
+        print(f"Ingestion job {job.id} was taken over by another worker; discarding this run")
+        return
+    document = record_document(job.file_name, job.content_hash, job.session_id, ingestion)
+    _finish(claim, IngestionJob.SUCCEEDED, document=document)
+    shutil.rmtree(job_dir, ignore_errors=True)
+    print(f"Ingestion job {job.id} finished: {len(ingestion.documents)} chunks (cache hit: {ingestion.cache_hit})")
+
+
+def _claim(job):
+    """Queryset matching a job only while it is still running under this claim."""
+    return IngestionJob.objects.filter(
+        pk=job.pk, status=IngestionJob.RUNNING, worker=job.worker, attempts=job.attempts
+    )
+
+
+def _finish(claim, status, error="", document=None):
+    claim.update(status=status, error=error, document=document, finished_at=timezone.now())
+
+
+class IngestionWorkerPool:
+    """
+    Worker threads that claim and run queued jobs. Each loop also requeues
+    stale jobs, so work left behind by a crashed process is picked up by
+    whichever process is running workers.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or getattr(settings, "INGESTION_WORKERS", 2)
+        self._wake = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"ingestion-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"Started {self.workers} ingestion workers")
+
+    def notify(self):
+        """Start the workers if needed and wake an idle one to check the queue."""
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                close_old_connections()
+                requeue_stale_jobs()
+                job = claim_next_job()
+                if job is None:
+                    self._wake.wait(POLL_INTERVAL)
+                    self._wake.clear()
+                    continue
+                run_job(job)
+            except Exception as e:
+                print(f"Ingestion worker error: {e}")
+                time.sleep(POLL_INTERVAL)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+@per_process
+def get_worker_pool():
+    """The ingestion worker pool for this process, started on first use"""
+    return IngestionWorkerPool()
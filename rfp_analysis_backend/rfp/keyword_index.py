@@ -0,0 +1,170 @@
+"""
+Per-session BM25 keyword index over a session's chunks.
+
+ada-002 vectors match meaning well but exact strings (RFP numbers, email
+addresses, dates, dollar amounts) poorly. Every ingestion therefore also
+builds a small inverted index over the session's chunks, persisted under
+KEYWORD_INDEX_DIR so every process can load it. Retrieval runs the same
+queries against both and merges the rankings with reciprocal rank fusion,
+so a chunk ranked well by either one makes the cut.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import replace
+from typing import Iterable, List, Optional
+import numpy as np
+from django.conf import settings
+from haystack import Document
+
+# Emails and URLs first, then words with internal separators kept together
+# ("acu-rft-037", "3:00", "22/10/2024", "$10,000"), then plain words
+TOKEN_PATTERN = re.compile(
+    r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+    r"|(?:https?://|www\.)[^\s<>\"']+"
+    r"|\$?\w+(?:[-/.:,']\w+)*"
+)
+PART_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with"
+    " what which who how when where".split()
+)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound tokens also contribute their parts, so "ACU-RFT-037" matches "037"."""
+    terms = []
+    for match in TOKEN_PATTERN.finditer((text or "").lower()):
+        token = match.group().rstrip(".,:'")
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1 or token != (parts[0] if parts else ""):
+            terms.append(token)
+        terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of Documents, scored with NumPy."""
+
+    def __init__(self, documents: Iterable[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = [replace(doc, embedding=None, score=None) for doc in documents]
+        self.k1 = k1
+        self.b = b
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for row, doc in enumerate(self.documents):
+            terms = tokenize(doc.content)
+            lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                rows, counts = postings[term]
+                rows.append(row)
+                counts.append(count)
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        average = float(self.lengths.mean()) if len(lengths) else 0.0
+        self._norms = self.k1 * (1 - self.b + self.b * self.lengths / (average or 1))
+        count = len(self.documents)
+        self.postings = {}
+        for term, (rows, counts) in postings.items():
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            self.postings[term] = (np.asarray(rows), np.asarray(counts, dtype=np.float32), idf)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query: str, top_k: int = 10) -> List[Document]:
+        """Best-scoring documents for the query, best first; documents sharing no term are left out."""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, counts, idf = self.postings[term]
+            scores[rows] += idf * counts * (self.k1 + 1) / (counts + self._norms[rows])
+        matched = int(np.count_nonzero(scores))
+        top_k = min(top_k, matched)
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [replace(self.documents[row], score=float(scores[row])) for row in best]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Document]], k: Optional[int] = None,
+                           top_k: Optional[int] = None) -> List[Document]:
+    """
+    Merge ranked lists into one: each document scores the sum of 1 / (k + rank)
+    over every list it appears in. The returned documents carry that score.
+    """
+    k = k if k is not None else getattr(settings, "RRF_K", 60)
+    scores = defaultdict(float)
+    documents = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc.id] += 1.0 / (k + rank)
+            documents.setdefault(doc.id, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [replace(documents[doc_id], score=scores[doc_id]) for doc_id in ranked]
+
+
+def get_keyword_index_dir():
+    return getattr(settings, "KEYWORD_INDEX_DIR", os.path.join(settings.BASE_DIR, "cache", "keyword_index"))
+
+
+def _index_path(session_id):
+    from pinecone_store import get_session_namespace
+
+    return os.path.join(get_keyword_index_dir(), f"{get_session_namespace(session_id)}.json")
+
+
+def build_session_index(session_id, documents: List[Document]) -> BM25Index:
+    """Index a session's chunks and persist them, replacing any earlier index."""
+    index = BM25Index(documents)
+    path = _index_path(session_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    scratch = f"{path}.{os.getpid()}.tmp"
+    with open(scratch, "w", encoding="utf-8") as f:
+        json.dump({"documents": [doc.to_dict(flatten=False) for doc in index.documents]}, f)
+    os.replace(scratch, path)
+    with _indexes_lock:
+        _indexes[path] = (os.stat(path).st_mtime_ns, index)
+    print(f"Built keyword index of {len(index)} chunks for session {session_id}")
+    return index
+
+
+def delete_session_index(session_id) -> None:
+    path = _index_path(session_id)
+    with _indexes_lock:
+        _indexes.pop(path, None)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_session_index(session_id) -> Optional[BM25Index]:
+    """
+    The session's keyword index, or None if hybrid retrieval is off or the
+    session has none. Reloaded whenever another process has rebuilt it.
+    """
+    if not getattr(settings, "HYBRID_RETRIEVAL", True):
+        return None
+    path = _index_path(session_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, encoding="utf-8") as f:
+        stored = json.load(f)
+    index = BM25Index(Document.from_dict(data) for data in stored["documents"])
+    with _indexes_lock:
+        _indexes[path] = (mtime, index)
+    return index
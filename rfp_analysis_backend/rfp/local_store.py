@@ -0,0 +1,275 @@
+"""
+In-process vector store for session-sized corpora.
+
+A session holds a few thousand 1536-d chunk vectors, small enough to search
+exactly in memory. LocalVectorDocumentStore keeps them as one contiguous,
+L2-normalized float32 matrix (or int8 codes with a per-row scale) and
+answers a query with a single matrix-vector product, so retrieval never
+leaves the process. Each store can persist to a directory whose vector file
+is memory-mapped on load, so a restarted process picks a session back up
+without copying its vectors into memory.
+
+Persisting rewrites every file, so bulk writes (a whole ingestion through
+BatchUpserter) go through deferred_save() and persist once at the end.
+"""
+import json
+import os
+from contextlib import contextmanager
+import threading
+import time
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+import numpy as np
+from haystack import Document, component, default_from_dict, default_to_dict
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
+from haystack.utils.filters import document_matches_filter
+
+QUANTIZATIONS = ("float32", "int8")
+
+
+def stored_version(path):
+    """
+    What identifies the store saved at ``path``, or None if nothing is saved
+    there. Every save renames a new documents.json into place, so this changes
+    whenever any process saves the store.
+    """
+    try:
+        stat = os.stat(os.path.join(path, "documents.json"))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class LocalVectorDocumentStore:
+    """
+    Haystack document store holding documents and their embeddings in NumPy
+    arrays. Scores are cosine similarities, matching the Pinecone indexes.
+
+    Writes take a lock and swap in new arrays; searches read whichever arrays
+    were current when they started, so they never block on a write.
+    """
+
+    def __init__(self, path: Optional[str] = None, quantization: str = "float32", dimension: int = 1536):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+        self.path = path
+        self.quantization = quantization
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        # (documents, vectors, scales), replaced as a whole on every write
+        self._state = ([], np.empty((0, dimension), dtype=np.int8 if quantization == "int8" else np.float32),
+                       np.empty(0, dtype=np.float32))
+        self._positions: Dict[str, int] = {}
+        self._deferred = 0
+        self._dirty = False
+        # stored_version() of the files this store last loaded or saved
+        self.version = None
+        if path and os.path.exists(os.path.join(path, "documents.json")):
+            self._load()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return default_to_dict(self, path=self.path, quantization=self.quantization, dimension=self.dimension)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LocalVectorDocumentStore":
+        return default_from_dict(cls, data)
+
+    def count_documents(self) -> int:
+        return len(self._state[0])
+
+    def filter_documents(self, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        documents, vectors, scales = self._state
+        matches = []
+        for row, doc in enumerate(documents):
+            if filters and not document_matches_filter(filters=filters, document=doc):
+                continue
+            matches.append(self._with_embedding(doc, vectors, scales, row))
+        return matches
+
+    def write_documents(self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.NONE) -> int:
+        if policy == DuplicatePolicy.NONE:
+            policy = DuplicatePolicy.FAIL
+
+        with self._lock:
+            stored, vectors, stored_scales = self._state
+            positions = self._positions
+            new_rows = {}
+            for doc in documents:
+                if doc.embedding is None:
+                    raise ValueError(f"Document {doc.id} has no embedding")
+                if doc.id in positions or doc.id in new_rows:
+                    if policy == DuplicatePolicy.FAIL:
+                        raise DuplicateDocumentError(f"ID '{doc.id}' already exists.")
+                    if policy == DuplicatePolicy.SKIP:
+                        continue
+                new_rows[doc.id] = doc
+            if not new_rows:
+                return 0
+
+            overwritten = [positions[doc_id] for doc_id in new_rows if doc_id in positions]
+            keep = np.ones(len(stored), dtype=bool)
+            keep[overwritten] = False
+            incoming = list(new_rows.values())
+            codes, scales = self._encode(np.asarray([doc.embedding for doc in incoming], dtype=np.float32))
+
+            documents = [doc for doc, kept in zip(stored, keep) if kept]
+            documents += [replace(doc, embedding=None) for doc in incoming]
+            self._set_state(
+                documents,
+                np.concatenate([vectors[keep], codes]),
+                np.concatenate([stored_scales[keep], scales]),
+            )
+            self._persist()
+            return len(incoming)
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        with self._lock:
+            documents, vectors, scales = self._state
+            doomed = [self._positions[doc_id] for doc_id in document_ids if doc_id in self._positions]
+            if not doomed:
+                return
+            keep = np.ones(len(documents), dtype=bool)
+            keep[doomed] = False
+            self._set_state([doc for doc, kept in zip(documents, keep) if kept], vectors[keep], scales[keep])
+            self._persist()
+
+    @contextmanager
+    def deferred_save(self):
+        """
+        Persist writes made inside the block once, when the last open block
+        exits, instead of after every write_documents() call. Blocks may be
+        entered from several threads at once.
+        """
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred and self._dirty:
+                    self._save()
+
+    def embedding_retrieval(
+        self,
+        query_embedding: List[float],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        return_embedding: bool = False,
+    ) -> List[Document]:
+        """Exact cosine top-k over every stored vector, best first."""
+        documents, vectors, scales = self._state
+        if not documents:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = vectors @ query
+        if self.quantization == "int8":
+            scores = scores * scales
+
+        if filters:
+            mask = np.array([document_matches_filter(filters=filters, document=doc) for doc in documents])
+            scores = np.where(mask, scores, -np.inf)
+            top_k = min(top_k, int(mask.sum()))
+        top_k = min(top_k, len(documents))
+        if top_k <= 0:
+            return []
+
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        results = []
+        for row in best:
+            doc = self._with_embedding(documents[row], vectors, scales, row) if return_embedding else documents[row]
+            results.append(replace(doc, score=float(scores[row])))
+        return results
+
+    def _set_state(self, documents, vectors, scales):
+        self._positions = {doc.id: row for row, doc in enumerate(documents)}
+        self._state = (documents, vectors, scales)
+
+    def _encode(self, embeddings):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized = embeddings / np.where(norms == 0, 1, norms)
+        if self.quantization == "float32":
+            return normalized.astype(np.float32), np.ones(len(normalized), dtype=np.float32)
+        # Symmetric per-row int8 quantization: row ~= codes * scale
+        scales = np.abs(normalized).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.round(normalized / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _decode(self, vectors, scales, row):
+        return (vectors[row].astype(np.float32) * scales[row]).tolist()
+
+    def _with_embedding(self, doc, vectors, scales, row):
+        return replace(doc, embedding=self._decode(vectors, scales, row))
+
+    def _persist(self):
+        if self._deferred:
+            self._dirty = True
+        else:
+            self._save()
+
+    def _save(self):
+        self._dirty = False
+        if not self.path:
+            return
+        documents, vectors, scales = self._state
+        os.makedirs(self.path, exist_ok=True)
+        # Every file is written under a scratch name and renamed into place.
+        # documents.json records the row count, so a load that races a write
+        # notices the mismatch and reads again.
+        np.save(os.path.join(self.path, "vectors.tmp.npy"), vectors)
+        np.save(os.path.join(self.path, "scales.tmp.npy"), scales)
+        with open(os.path.join(self.path, "documents.tmp.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "quantization": self.quantization,
+                "rows": len(documents),
+                "documents": [doc.to_dict(flatten=False) for doc in documents],
+            }, f)
+        for name in ("vectors.npy", "scales.npy", "documents.json"):
+            scratch = name.replace(".", ".tmp.", 1)
+            os.replace(os.path.join(self.path, scratch), os.path.join(self.path, name))
+        self.version = stored_version(self.path)
+
+    def _load(self, attempts=3):
+        for attempt in range(attempts):
+            version = stored_version(self.path)
+            with open(os.path.join(self.path, "documents.json"), encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored["quantization"] != self.quantization:
+                raise ValueError(f"{self.path} holds {stored['quantization']} vectors, not {self.quantization}")
+            # Searched straight from the page cache; the first write copies them into memory
+            vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+            scales = np.load(os.path.join(self.path, "scales.npy"), mmap_mode="r")
+            if len(vectors) == len(scales) == stored["rows"]:
+                self._set_state([Document.from_dict(data) for data in stored["documents"]], vectors, scales)
+                self.version = version
+                return
+            time.sleep(0.05 * (attempt + 1))
+        raise ValueError(f"{self.path} is being written by another process; try again")
+
+
+@component
+class LocalEmbeddingRetriever:
+    """Embedding retriever for LocalVectorDocumentStore."""
+
+    def __init__(self, document_store: LocalVectorDocumentStore, top_k: int = 10,
+                 filters: Optional[Dict[str, Any]] = None):
+        self.document_store = document_store
+        self.top_k = top_k
+        self.filters = filters
+
+    @component.output_types(documents=List[Document])
+    def run(self, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None,
+            top_k: Optional[int] = None):
+        documents = self.document_store.embedding_retrieval(
+            query_embedding=query_embedding,
+            filters=filters or self.filters,
+            top_k=top_k or self.top_k,
+        )
+        return {"documents": documents}
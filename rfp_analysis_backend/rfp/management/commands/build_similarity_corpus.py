@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from rfp.similarity import refresh_corpus
+
+
+class Command(BaseCommand):
+    help = "Rebuild the past-bid similarity corpus from its Pinecone index."
+
+    def handle(self, *args, **options):
+        corpus = refresh_corpus()
+        self.stdout.write(f"Similarity corpus holds {len(corpus)} bids")
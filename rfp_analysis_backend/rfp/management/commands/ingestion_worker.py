@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from rfp.jobs import IngestionWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run background ingestion workers until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Number of worker threads")
+
+    def handle(self, *args, workers=None, **options):
+        pool = IngestionWorkerPool(workers)
+        pool.start()
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping ingestion workers")
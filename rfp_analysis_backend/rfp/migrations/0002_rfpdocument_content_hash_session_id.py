@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-16 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rfp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rfpdocument',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='rfpdocument',
+            name='session_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -1,11 +1,48 @@
+import uuid
 from django.db import models
 
 class RFPDocument(models.Model):
     id = models.AutoField(primary_key=True)
     file = models.FileField(upload_to="rfp_documents/")
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    session_id = models.CharField(max_length=64, blank=True, db_index=True)
     extracted_text = models.TextField(blank=True)
     analysis_results = models.JSONField(default=dict)
 
     def __str__(self):
         return self.file.name
+
+
+class IngestionJob(models.Model):
+    """A PDF queued for background ingestion, with per-stage progress."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session_id = models.CharField(max_length=64, db_index=True)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=1024)
+    content_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    stage = models.CharField(max_length=32, blank=True)
+    progress = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=128, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    document = models.ForeignKey(RFPDocument, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
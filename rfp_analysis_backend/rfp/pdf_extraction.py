@@ -0,0 +1,118 @@
+import mmap
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+from PyPDF2 import PdfReader
+
+# PDFs shorter than this are extracted inline; forking workers costs more than it saves.
+MIN_PAGES_FOR_POOL = 16
+# Each worker gets several ranges so a slow page (scanned tables, huge fonts) does not stall the pool.
+RANGES_PER_WORKER = 4
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class NoExtractableTextError(ValueError):
+    """Raised for a PDF with no text to extract, such as a scanned document."""
+
+
+def default_worker_count() -> int:
+    """Worker count from settings, falling back to the number of CPUs."""
+    try:
+        from django.conf import settings
+        workers = getattr(settings, "PDF_EXTRACTION_WORKERS", None)
+    except Exception:
+        workers = None
+    return max(1, int(workers or os.cpu_count() or 1))
+
+
+def get_extraction_pool(workers: int) -> ProcessPoolExecutor:
+    """Return a process pool of the given size, created once per process."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_in_pool(workers: int, function: Callable, calls: Sequence[tuple]) -> list:
+    """
+    Run function(*args) for each args in ``calls`` on the extraction pool of
+    the given size and return the results in order. A worker that dies (a
+    PDF crashing the parser, the OOM killer) breaks the whole pool, so a
+    broken pool is replaced and the calls retried once.
+    """
+    for attempt in range(2):
+        pool = get_extraction_pool(workers)
+        try:
+            futures = [pool.submit(function, *args) for args in calls]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            _discard_pool(workers, pool)
+            if attempt:
+                raise
+            print(f"PDF extraction pool of {workers} workers broke; retrying with a new pool")
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """
+    Extract pages [start, end) from a PDF. Runs inside a worker process, so it
+    opens its own reader rather than receiving page objects from the parent.
+    The file is memory-mapped, so workers share the OS page cache instead of
+    each buffering their own copy.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        reader = PdfReader(data)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def split_page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into contiguous ranges, a few per worker."""
+    if page_count <= 0:
+        return []
+    num_ranges = min(page_count, workers * RANGES_PER_WORKER)
+    size, remainder = divmod(page_count, num_ranges)
+    ranges = []
+    start = 0
+    for i in range(num_ranges):
+        end = start + size + (1 if i < remainder else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def extract_pages(file_path: str, workers: Optional[int] = None) -> List[dict]:
+    """
+    Extract the text of every page in a PDF, in page order.
+
+    Page ranges are spread across a process pool and each page is extracted
+    exactly once. Returns a list of {"page_number": n, "text": "..."} dicts with
+    1-based page numbers; pages without extractable text are kept with empty
+    text so numbering stays aligned with the source document.
+    """
+    workers = workers or default_worker_count()
+
+    # mmap refuses empty files, and there is nothing to extract from one anyway
+    if os.path.getsize(file_path) == 0:
+        raise NoExtractableTextError("No extractable text found in PDF (the file is empty)")
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        page_count = len(PdfReader(data).pages)
+
+    if workers == 1 or page_count < MIN_PAGES_FOR_POOL:
+        texts = _extract_page_range(file_path, 0, page_count)
+    else:
+        calls = [(file_path, start, end) for start, end in split_page_ranges(page_count, workers)]
+        texts = [text for texts in run_in_pool(workers, _extract_page_range, calls) for text in texts]
+
+    return [{"page_number": i + 1, "text": text} for i, text in enumerate(texts)]
@@ -0,0 +1,311 @@
+"""
+Deterministic extraction of the schema fields that patterns find reliably.
+
+Contact emails, the RFP number, key dates and the budget are usually stated
+in a fixed form next to a label ("Closing Date – 22 October 2024", "RFP No.
+2024-017", "not to exceed $250,000"). pre_extract() finds them in the
+extracted text with regular expressions and dateutil in a few milliseconds,
+and the analyzer only asks the LLM for the fields left empty. A field is
+filled only when every labelled mention agrees on one value; when they
+disagree, or a numeric date could be read either day or month first, the
+field is left to the LLM.
+
+Values use the analysis schema's field shape. Confidence is fixed per rule:
+a value stated beside its label scores higher than one pieced together from
+two mentions.
+"""
+import re
+from collections import Counter, OrderedDict
+from datetime import date
+from typing import Dict, List, Optional
+from dateutil import parser as date_parser
+
+# Bump whenever rules change in a way that changes results; part of the analysis cache key.
+PRE_EXTRACTION_VERSION = "3"
+
+# Characters after a label searched for its value
+LABEL_WINDOW = 160
+# Characters before a date label searched for a time of day ("by 3:00 PM on the Closing Date")
+TIME_WINDOW = 80
+
+MONTHS = (
+    r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?"
+    r"|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\.?"
+)
+WEEKDAY = r"(?:(?:Mon|Tues?|Wed(?:nes)?|Thu(?:rs)?|Fri|Sat(?:ur)?|Sun)(?:day)?,?\s+)?"
+TEXT_DATE = re.compile(
+    WEEKDAY + r"(?:\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTHS + r",?\s+\d{4}"
+    r"|" + MONTHS + r"\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})\b",
+    re.IGNORECASE,
+)
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2})\b")
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+TIME = re.compile(
+    r"\b\d{1,2}(?:[:.]\d{2})?\s*(?:[ap]\.?m\.?)(?![a-z])|\b\d{1,2}:\d{2}\s*(?:hrs|hours)?\b|\bnoon\b|\bmidday\b",
+    re.IGNORECASE,
+)
+
+DATE_LABELS = {
+    "submission_deadline": (
+        r"closing\s+(?:date|time)|submission\s+deadline|due\s+date"
+        r"|(?:proposals?|tenders?|responses?|bids?|quotes?|quotations?|submissions?)\s+(?:are\s+|must\s+be\s+)?"
+        r"(?:due|received|submitted)\b"
+        r"|deadline\s+for\s+(?:submission|proposals?|tenders?|responses?|bids?)"
+    ),
+    "clarifications_deadline": (
+        r"(?:deadline|last\s+day|closing\s+date)\s+for\s+(?:questions|clarifications?|enquiries|inquiries)"
+        r"|(?:questions|clarifications?|enquiries|inquiries)\b(?:(?!\.\s)[^\n]){0,80}?"
+        r"(?:deadline|due|close|closes|no\s+later\s+than)"
+    ),
+    "issuance_of_response_to_bidder_questions": (
+        r"(?:answers?|responses?)\s+to\s+(?:\w+\s+)?questions\s+(?:\w+\s+){0,3}?(?:issued|posted|published|provided|released)"
+    ),
+    "site_visit_date": (
+        r"site\s+(?:visit|inspection|meeting)|pre-?\s?(?:proposal|bid|tender)\s+(?:conference|meeting|briefing)"
+        r"|briefing\s+session"
+    ),
+    "contract_award_date": (
+        r"award\s+date|notice\s+of\s+award"
+        r"|notification\s+of\s+(?:award|outcome|successful)"
+    ),
+    "start_date": (
+        r"(?:contract|project|service)\s+(?:start|commencement)\s+date"
+        r"|(?:start|commencement)\s+date\s+(?:of|for)\s+(?:the\s+)?(?:contract|services?|agreement|project)"
+    ),
+    "fully_executed_agreement": (
+        r"(?:agreement|contract)\s+(?:execution|signing|executed|signed)"
+    ),
+}
+DATE_LABELS = {name: re.compile(label, re.IGNORECASE) for name, label in DATE_LABELS.items()}
+
+EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b")
+# Words near an address that mark it as the RFP's contact
+EMAIL_CONTEXT = re.compile(
+    r"question|enquir|inquir|contact|clarification|procurement|submi|tender|proposal|officer", re.IGNORECASE
+)
+IGNORED_EMAIL = re.compile(r"^(?:no-?reply|donotreply)@|@example\.", re.IGNORECASE)
+
+RFP_NUMBER = re.compile(
+    r"\b(?:RFP|RFT|RFQ|RFI|RFO|ITT|ITB|IFB|EOI|Tender|Solicitation|Bid|Request)\s*"
+    r"(?:No\.?|Number|Num\.?|#|ID|Ref(?:erence)?\.?(?:\s*No\.?)?)\s*[:.\-–—]?\s*"
+    r"([A-Z0-9][A-Z0-9\-/._]*[A-Z0-9])",
+    re.IGNORECASE,
+)
+
+BUDGET_LABEL = re.compile(
+    r"budget|not[\s-]+to[\s-]+exceed|\bNTE\b|maximum\s+(?:contract\s+)?(?:value|amount|price|fee)"
+    r"|funding\s+(?:available|allocated|of\s+up\s+to)|(?:estimated|total|indicative)\s+contract\s+value"
+    r"|upper\s+limit",
+    re.IGNORECASE,
+)
+# PyPDF2 often puts a space before punctuation ("$65 ,000", "$1 .5 million"), so
+# thousands groups and decimals may be preceded by one
+MONEY = re.compile(
+    r"(?:(?:US|AU|A|NZ|C|CA)?\$|€|£|\b(?:USD|AUD|NZD|CAD|EUR|GBP)\s?)\s?\d+(?:\s?,\s?\d{3}(?!\d))*(?:\s?\.\d+)?"
+    r"(?:\s?(?:million|billion|thousand|mil|bn|[mk])\b)?",
+    re.IGNORECASE,
+)
+# Digits straight after an amount mean it was cut short by some other extraction artifact
+MONEY_CONTINUES = re.compile(r"\s?[,.]?\s?\d")
+SPACED_PUNCTUATION = re.compile(r"\s+(?=[,.]\d)|(?<=,)\s+(?=\d)")
+MONEY_MULTIPLIERS = {"thousand": 1e3, "k": 1e3, "million": 1e6, "mil": 1e6, "m": 1e6, "billion": 1e9, "bn": 1e9}
+
+WHITESPACE = re.compile(r"\s+")
+SENTENCE_END = re.compile(r"\.\s+(?=[A-Z])|\n\s*\n|\f")
+# The full stop a time of day ends a sentence with ("by 10:00 AM."), but not the one in "a.m."
+TRAILING_STOP = re.compile(r"(?<=[ap]m)\.$", re.IGNORECASE)
+SECTION_BREAK = re.compile(r"\n\s*\n|\f")
+# Cover pages drawn with a shadow font extract with every character doubled ("RREEQQUUEESSTT")
+DOUBLED_WORD = re.compile(r"^(?:(\S)\1)+$")
+
+
+def field(value, confidence, is_interpreted=False):
+    return {"value": value, "confidence": confidence, "is_interpreted": is_interpreted}
+
+
+def undouble(text: str) -> str:
+    """Repair words extracted with every character doubled, leaving all other words alone."""
+    lines = []
+    for line in text.split("\n"):
+        words = line.split(" ")
+        doubled = [word for word in words if word]
+        if sum(map(len, doubled)) >= 6 and all(DOUBLED_WORD.match(word) for word in doubled):
+            line = " ".join(word[::2] for word in words)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _parse_date(text: str) -> Optional[date]:
+    """The date a matched date string means, or None if it is ambiguous or invalid."""
+    numeric = NUMERIC_DATE.fullmatch(text)
+    if numeric:
+        first, second = int(numeric.group(1)), int(numeric.group(2))
+        if first <= 12 and second <= 12 and first != second:
+            # 03/04/2025 is March or April depending on the country
+            return None
+        dayfirst = first > 12
+    else:
+        dayfirst = True
+    try:
+        parsed = date_parser.parse(text, dayfirst=dayfirst, fuzzy=True).date()
+    except (ValueError, OverflowError):
+        return None
+    return parsed if 1990 <= parsed.year <= 2100 else None
+
+
+def _dates_in(text: str):
+    """(matched text, date or None when ambiguous) for each date in text, in order."""
+    found = []
+    for pattern in (TEXT_DATE, ISO_DATE, NUMERIC_DATE):
+        for match in pattern.finditer(text):
+            if any(start <= match.start() < end for start, end, _, _ in found):
+                continue
+            value = WHITESPACE.sub(" ", match.group()).strip(" ,")
+            found.append((match.start(), match.end(), value, _parse_date(value)))
+    return [(value, parsed) for _, _, value, parsed in sorted(found)]
+
+
+def _window_end(text, start):
+    """End of the window after a label: LABEL_WINDOW characters, stopping at a blank line or page break."""
+    end = start + LABEL_WINDOW
+    stop = SECTION_BREAK.search(text, start, end)
+    return stop.start() if stop else end
+
+
+def _sentence_start(text, end):
+    """Start of the sentence holding position ``end``, looking back at most TIME_WINDOW characters."""
+    start = max(0, end - TIME_WINDOW)
+    # One character past ``end``, so the capital-letter lookahead can see a sentence that starts at ``end``
+    stops = list(SENTENCE_END.finditer(text, start, end + 1))
+    return stops[-1].end() if stops else start
+
+
+def _sentence_end(text, start, end):
+    """End of the sentence holding position ``start``, looking ahead no further than ``end``."""
+    stop = SENTENCE_END.search(text, start, min(len(text), end + 1))
+    return min(stop.start(), end) if stop else end
+
+
+def _time_value(match):
+    """A matched time of day without the sentence's full stop ("10:00 AM." -> "10:00 AM")."""
+    return TRAILING_STOP.sub("", WHITESPACE.sub(" ", match.group()))
+
+
+def _extract_date(text: str, label: re.Pattern) -> Optional[dict]:
+    """
+    The one date every mention of a label points at, with the time of day if
+    the mentions give exactly one. None when there is no date or they disagree.
+    """
+    dates = OrderedDict()
+    times = OrderedDict()
+    ambiguous = False
+    for match in label.finditer(text):
+        window_end = _window_end(text, match.end())
+        window = text[match.end():window_end]
+        # The first date after a label is its value; later ones belong to other labels
+        candidates = _dates_in(window)[:1]
+        for value, parsed in candidates:
+            if parsed is None:
+                ambiguous = True
+            else:
+                dates.setdefault(parsed, value)
+        # A time belongs to the label's own sentence, before or after it
+        around = text[_sentence_start(text, match.start()):_sentence_end(text, match.end(), window_end)]
+        for time_match in TIME.finditer(around):
+            value = _time_value(time_match)
+            times.setdefault(re.sub(r"[\s.]", "", value).upper(), value)
+    if ambiguous or len(dates) != 1:
+        return None
+    value = next(iter(dates.values()))
+    if len(times) == 1:
+        return field(f"{value}, {next(iter(times.values()))}", 0.85)
+    return field(value, 0.9)
+
+
+def _extract_email(text: str) -> Optional[dict]:
+    addresses = OrderedDict()
+    for match in EMAIL.finditer(text):
+        address = match.group().rstrip(".")
+        if IGNORED_EMAIL.search(address):
+            continue
+        context = text[max(0, match.start() - LABEL_WINDOW):match.start()]
+        relevant = addresses.get(address.lower(), (address, False))[1] or bool(EMAIL_CONTEXT.search(context))
+        addresses[address.lower()] = (address, relevant)
+    if len(addresses) == 1:
+        return field(next(iter(addresses.values()))[0], 0.95)
+    relevant = [address for address, is_relevant in addresses.values() if is_relevant]
+    if len(relevant) == 1:
+        return field(relevant[0], 0.8)
+    return None
+
+
+def _extract_rfp_number(text: str) -> Optional[dict]:
+    numbers = Counter()
+    spellings = {}
+    for match in RFP_NUMBER.finditer(text):
+        number = match.group(1)
+        if not any(char.isdigit() for char in number):
+            continue
+        key = number.upper()
+        numbers[key] += 1
+        spellings.setdefault(key, number)
+    if not numbers:
+        return None
+    (best, count), *others = numbers.most_common()
+    if not others:
+        return field(spellings[best], 0.95)
+    # A number quoted throughout the document beats one-off references to other documents
+    if count > sum(other for _, other in others):
+        return field(spellings[best], 0.8)
+    return None
+
+
+def _amount(money: str) -> Optional[float]:
+    digits = re.search(r"\d[\d,]*(?:\.\d+)?", money)
+    if not digits:
+        return None
+    amount = float(digits.group().replace(",", ""))
+    suffix = re.search(r"(million|billion|thousand|mil|bn|[mk])\s*$", money, re.IGNORECASE)
+    if suffix:
+        amount *= MONEY_MULTIPLIERS[suffix.group(1).lower()]
+    return amount
+
+
+def _extract_budget(text: str) -> Optional[dict]:
+    amounts = OrderedDict()
+    for match in BUDGET_LABEL.finditer(text):
+        window = text[match.end():_window_end(text, match.end())]
+        money = MONEY.search(window)
+        if money and not MONEY_CONTINUES.match(window, money.end()):
+            value = WHITESPACE.sub(" ", SPACED_PUNCTUATION.sub("", money.group())).strip()
+            amount = _amount(value)
+            if amount:
+                amounts.setdefault(amount, value)
+    if len(amounts) == 1:
+        return field(next(iter(amounts.values())), 0.85)
+    return None
+
+
+def pre_extract(text: str) -> Dict[str, Dict[str, dict]]:
+    """
+    Fields found in the RFP's extracted text, as {section: {field: value}}.
+    Only fields with a single unambiguous value are included.
+    """
+    if not text:
+        return {}
+    text = undouble(text)
+    found = {
+        "bid_summary": {"email": _extract_email(text), "rfp_number": _extract_rfp_number(text)},
+        "key_dates": {name: _extract_date(text, label) for name, label in DATE_LABELS.items()},
+        "commercials": {"budget": _extract_budget(text)},
+    }
+    return {
+        section: {name: value for name, value in fields.items() if value}
+        for section, fields in found.items()
+        if any(fields.values())
+    }
+
+
+def filled_fields(pre_extracted: Dict[str, Dict[str, dict]]) -> List[str]:
+    """"section.field" for every pre-extracted field."""
+    return [f"{section}.{name}" for section, fields in pre_extracted.items() for name in fields]
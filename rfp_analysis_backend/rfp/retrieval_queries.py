@@ -0,0 +1,177 @@
+"""
+Registry of retrieval queries for each field of the analysis schema.
+
+Instead of embedding a query per request, every section is retrieved with a
+handful of short, targeted queries ("submission deadline", "budget",
+"incumbent", ...). Their embeddings are computed once, persisted to disk and
+loaded once per process, so an analysis makes no query-embedding calls.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from .analysis_schema import SECTIONS, SECTION_QUERIES
+from .embedding_cache import get_embedding_cache
+from .embeddings import ConcurrentEmbedder, EMBEDDING_MODEL
+from .keyword_index import reciprocal_rank_fusion
+
+# Targeted queries for fields whose names alone make poor search terms.
+# Fields not listed here are searched for by their humanized name.
+FIELD_QUERIES = {
+    "strategic_summary": {
+        "overview": "project overview and scope of work",
+        "key_differentiators": "evaluation criteria and scoring",
+        "risks_and_challenges": "risks, constraints, penalties and liquidated damages",
+        "recommended_approach": "goals, objectives and desired outcomes",
+        "resource_needs": "staffing, team and resource requirements",
+        "competitive_landscape": "current vendor, incumbent and competitors",
+    },
+    "bid_summary": {
+        "client_name": "issuing organization, agency or client name",
+        "rfp_number": "RFP number, solicitation number or reference number",
+        "services_required": "services required and scope of services",
+        "client_contact": "point of contact, procurement officer name",
+        "email": "contact email address for questions",
+        "incumbent": "incumbent, current contractor or existing vendor",
+    },
+    "key_dates": {
+        "start_date": "anticipated contract start date",
+        "submission_deadline": "proposal submission deadline, proposals due date and time",
+        "clarifications_deadline": "deadline for questions and requests for clarification",
+        "issuance_of_response_to_bidder_questions": "answers to bidder questions posted by date, addenda",
+        "instruction_to_clarification_question": "how to submit questions, inquiries procedure",
+        "fully_executed_agreement": "contract execution date, agreement signed",
+        "site_visit_date": "site visit, pre-proposal conference or pre-bid meeting date",
+        "contract_award_date": "anticipated contract award or notice of award date",
+        "method_of_submission": "proposals must be submitted electronically, by mail or portal",
+        "submission_instructions": "proposal format, copies, packaging and labelling instructions",
+    },
+    "requirements": {
+        "foreign_workers_limitations": "work performed in the United States, offshore or foreign workers restrictions",
+        "notary": "notarized affidavit, notary public",
+        "on_site_requirements": "on-site presence, work location, travel requirements",
+        "resumes_required": "resumes of key personnel",
+        "registration_requirements": "vendor registration, business license, certificate of good standing",
+        "contract_length": "contract term, initial term and renewal options",
+    },
+    "checklist": {
+        "insurances": "insurance requirements, certificate of insurance, liability coverage",
+    },
+    "commercials": {
+        "budget": "budget, not to exceed amount, maximum contract value, funding available",
+        "contract_length": "contract term length and renewal periods",
+        "price_quality_ratio": "evaluation weighting of price versus technical quality",
+    },
+    "website_details": {
+        "web_address": "website URL, web address",
+        "current_cms": "current content management system, platform, hosting",
+        "preferred_cms": "preferred or required CMS platform",
+    },
+    "flags": {
+        "total_wordcount": "page limit, word limit, proposal length",
+        "targets_provided": "KPIs, targets, performance metrics",
+        "media_plan": "media plan, media buying, advertising placement",
+        "pricing_summary": "pricing proposal, cost sheet, fee schedule",
+    },
+}
+
+_query_embeddings = None
+_query_embeddings_lock = threading.Lock()
+
+
+def section_queries(section, fields=None):
+    """All retrieval queries for a section: the section query plus one per field (all fields by default)."""
+    queries = [SECTION_QUERIES[section]]
+    for field in SECTIONS[section] if fields is None else fields:
+        queries.append(FIELD_QUERIES.get(section, {}).get(field) or field.replace("_", " "))
+    return list(dict.fromkeys(queries))
+
+
+def all_queries():
+    return list(dict.fromkeys(query for section in SECTIONS for query in section_queries(section)))
+
+
+def registry_fingerprint():
+    """Changes whenever the registry or embedding model changes, invalidating persisted embeddings."""
+    payload = json.dumps({"model": EMBEDDING_MODEL, "queries": all_queries()})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def get_query_embeddings_path():
+    cache_dir = getattr(settings, "QUERY_EMBEDDINGS_DIR", os.path.join(settings.BASE_DIR, "cache"))
+    return os.path.join(cache_dir, f"query_embeddings-{registry_fingerprint()}.npz")
+
+
+def _compute_query_embeddings(queries):
+    embedder = ConcurrentEmbedder(model=EMBEDDING_MODEL)
+    return get_embedding_cache().get_or_embed(EMBEDDING_MODEL, queries, async_to_sync(embedder.embed))
+
+
+def get_query_embeddings():
+    """
+    Return {query: embedding} for every registered query. Loaded from disk
+    once per process; computed and persisted the first time the registry
+    changes.
+    """
+    global _query_embeddings
+    with _query_embeddings_lock:
+        if _query_embeddings is not None:
+            return _query_embeddings
+
+        path = get_query_embeddings_path()
+        queries = all_queries()
+        if os.path.exists(path):
+            with np.load(path) as stored:
+                _query_embeddings = dict(zip(stored["queries"].tolist(), stored["vectors"].tolist()))
+        else:
+            vectors = _compute_query_embeddings(queries)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            scratch_path = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(scratch_path, queries=np.array(queries), vectors=np.asarray(vectors, dtype=np.float32))
+            os.replace(scratch_path, path)
+            print(f"Persisted {len(queries)} query embeddings to {path}")
+            _query_embeddings = dict(zip(queries, vectors))
+        return _query_embeddings
+
+
+def retrieve_for_section(retriever, section, top_k_per_query, max_documents, executor=None, keyword_index=None,
+                         fields=None):
+    """
+    Run every query registered for a section against the vector store in
+    parallel and return the deduplicated union of hits, best-scoring first.
+    A document hit by several queries keeps its highest score.
+
+    With a keyword_index, each query also runs as a BM25 search and every
+    ranking, vector and keyword, is merged by reciprocal rank fusion, so
+    chunks matched by exact terms rank alongside semantic matches.
+
+    ``fields`` limits the field queries to those fields, e.g. the ones still
+    left for the LLM.
+    """
+    embeddings = get_query_embeddings()
+    queries = section_queries(section, fields)
+
+    def search(query):
+        return retriever.run(query_embedding=embeddings[query], top_k=top_k_per_query)["documents"]
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = list(pool.map(search, queries))
+    else:
+        results = list(executor.map(search, queries))
+
+    if keyword_index is not None:
+        results += [keyword_index.search(query, top_k=top_k_per_query) for query in queries]
+        return reciprocal_rank_fusion(results, top_k=max_documents)
+
+    best = {}
+    for documents in results:
+        for doc in documents:
+            if doc.id not in best or (doc.score or 0.0) > (best[doc.id].score or 0.0):
+                best[doc.id] = doc
+    ranked = sorted(best.values(), key=lambda doc: doc.score or 0.0, reverse=True)
+    return ranked[:max_documents]
@@ -1,43 +1,31 @@
-from typing import Dict, Any
-import os
+from typing import Dict, Any, AsyncIterator, Tuple
+import functools
 import json
+import logging
+import time
+import asyncio
 from dotenv import load_dotenv
-from asgiref.sync import async_to_sync
-from haystack import Pipeline
-from haystack.components.builders import PromptBuilder
-from haystack.components.embedders import OpenAITextEmbedder
-from haystack.components.generators import OpenAIGenerator
-from haystack_integrations.components.retrievers.pinecone import PineconeEmbeddingRetriever
-from haystack.utils import Secret
-from pinecone_store import document_store
+from django.conf import settings
+from pinecone_store import get_embedding_retriever
+from .analysis_schema import (
+    SECTIONS, SECTION_GUIDANCE, FIELD_INSTRUCTIONS,
+    empty_field, section_structure, normalize_section,
+)
+from .components import get_component_pool
+from .context_packing import pack_context, sum_stats
+from .pre_extraction import PRE_EXTRACTION_VERSION, filled_fields, pre_extract
+from .retrieval_queries import retrieve_for_section
 
 load_dotenv()
 
-class RFPAnalyzer:
-    def __init__(self, vector_store):
-        self.vector_store = vector_store
+logger = logging.getLogger(__name__)
 
-    async def analyze_rfp(self, text: str, pdf_path=None) -> Dict[str, Any]:
-        """
-        Build a pipeline to extract key RFP information and format it as JSON.
-        """
-        try:
-            # Define the query template
-            query_template = """
+LLM_MODEL = "gpt-4o"
+
+# Each section is extracted by its own prompt, filled in from this template.
+SECTION_TEMPLATE = """
             System: You are an expert RFP analyzer. Extract information from the RFP and return it ONLY as a valid JSON object. Do not include any additional text.
-            First, analyze the entire document and provide a strategic summary that includes:
-            - The core opportunity and its strategic value
-            - Key differentiators needed to win
-            - Major risks or challenges to consider
-            - Recommended approach or win themes
-            - Resource implications
-            - Any competitive insights
-            
-            For the introduction and background sections:
-            - Look for any opening paragraphs that describe the project overview
-            - Identify any background context about the organization
-            - Include historical information or previous related projects
-            - Capture the overall purpose and goals
+            {{ guidance }}
 
             Documents:
             {% for doc in documents %}
@@ -48,404 +36,178 @@ class RFPAnalyzer:
 
             Return a JSON object with exactly this structure:
 
-            {
-                "strategic_summary": {
-                    "overview": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "key_differentiators": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "risks_and_challenges": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "recommended_approach": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "resource_needs": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "competitive_landscape": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "introduction/background": {
-                    "introduction": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "background": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "bid_summary": {
-                    "client_name": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "rfp_number": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "services_required": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "client_contact": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "email": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "incumbent": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "key_dates": {
-                    "start_date": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "submission_deadline": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "clarifications_deadline": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "issuance_of_response_to_bidder_questions": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "instruction_to_clarification_question": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "fully_executed_agreement": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "site_visit_date": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "contract_award_date": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "method_of_submission": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "submission_instructions": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "work_portfolio": {
-                    "experience": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "case_studies": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "case_studies_specifications": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "integration_requirements": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "other_requirements": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "references": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "requirements": {
-                    "confidentiality": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "compliances": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "security": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "foreign_workers_limitations": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "notary": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "on_site_requirements": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "resumes_required": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "registration_requirements": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "contract_length": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "other_requirements": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "submission_details": {
-                    "method": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "instructions": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "checklist": {
-                    "insurances": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "resumes": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "business_registrations": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "commercials": {
-                    "budget": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "contract_length": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "price_quality_ratio": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "website_details": {
-                    "web_address": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "current_cms": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "preferred_cms": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                },
-                "flags": {
-                    "workload_summary": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "total_wordcount": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "targets_provided": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "design_required": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "media_plan": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "pricing_summary": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    },
-                    "notes": {
-                        "value": "",
-                        "confidence": 0.0,
-                        "is_interpreted": false
-                    }
-                }
-            }
+            {{ structure }}
 
-            For each field:
-            1. Set "value" to the extracted information from the RFP
-            2. Set "confidence" to a value between 0.0 and 1.0 indicating your confidence in the extraction
-            3. Set "is_interpreted" to true if you had to interpret or infer the information rather than directly extract it
-            
-            If information is explicitly stated in the RFP, set confidence high (0.8-1.0) and is_interpreted to false.
-            If information is implied but not explicitly stated, provide your best interpretation, set confidence lower (0.4-0.7), and set is_interpreted to true.
-            If you're making an educated guess based on context, set confidence even lower (0.1-0.3) and set is_interpreted to true.
-            If information is completely absent, leave value as empty string, set confidence to 0.0, and is_interpreted to false.
-            
-            For example:
-            - If the RFP clearly states "Budget: $500,000", set {"value": "$500,000", "confidence": 1.0, "is_interpreted": false}
-            - If the RFP mentions "work must be completed within 12 months" but doesn't explicitly state contract length, set {"value": "12 months", "confidence": 0.6, "is_interpreted": true}
-            - If there's no mention of the incumbent, leave as {"value": "", "confidence": 0.0, "is_interpreted": false}
+            {{ instructions }}
             """
 
-            # First, get the embedding for our query text
-            embed_pipeline = Pipeline()
-            embed_pipeline.add_component(
-                "text_embedder",
-                OpenAITextEmbedder(
-                    api_key=Secret.from_token(os.getenv("OPENAI_API_KEY")),
-                    model="text-embedding-ada-002"
-                )
-            )
-            
-            # Get the embedding
-            embed_result = embed_pipeline.run({
-                "text_embedder": {
-                    "text": text
-                }
-            })
-            if not embed_result.get("text_embedder", {}).get("embedding"):
-                print("No embedding generated")
-                return {}
-            
-            # Extract the embedding vector
-            query_embedding = embed_result["text_embedder"]["embedding"]
 
-            # Now use this embedding to query Pinecone
-            query_pipeline = Pipeline()
-            query_pipeline.add_component(
-                "retriever",
-                PineconeEmbeddingRetriever(document_store=self.vector_store)
-            )
-            query_pipeline.add_component("prompt_builder", PromptBuilder(template=query_template))
-            query_pipeline.add_component(
-                "llm",
-                OpenAIGenerator(
-                    api_key=Secret.from_token(os.getenv("OPENAI_API_KEY")),
-                    model="gpt-4o"
-                )
-            )
+class RFPAnalyzer:
+    def __init__(self, vector_store, keyword_index=None):
+        self.vector_store = vector_store
+        # The session's BM25 index; when given, retrieval is hybrid (see keyword_index)
+        # and fewer fused chunks carry the same recall as the vector-only top-k
+        self.keyword_index = keyword_index
+        if keyword_index is None:
+            self.top_k = getattr(settings, "ANALYSIS_SECTION_TOP_K", 10)
+        else:
+            self.top_k = getattr(settings, "ANALYSIS_HYBRID_SECTION_TOP_K", 6)
+        self.field_top_k = getattr(settings, "ANALYSIS_FIELD_TOP_K", 4)
+        self.max_concurrent_sections = getattr(settings, "ANALYSIS_MAX_CONCURRENT_SECTIONS", len(SECTIONS))
+        self.section_retries = getattr(settings, "ANALYSIS_SECTION_RETRIES", 2)
+        self.context_max_tokens = getattr(settings, "ANALYSIS_CONTEXT_MAX_TOKENS", 3000)
+        self.pre_extraction = getattr(settings, "PRE_EXTRACTION", True)
+        self.pre_extraction_min_confidence = getattr(settings, "PRE_EXTRACTION_MIN_CONFIDENCE", 0.8)
+        self.last_timings = {}
+        # pack_context stats per section of the last analysis
+        self.last_context_stats = {}
+        # "section.field" for each field the last analysis filled without the LLM
+        self.last_pre_extracted = []
+        # Sections of the last analysis left empty after every LLM attempt failed
+        self.last_failed_sections = []
+
+    def retrieval_settings(self) -> Dict[str, Any]:
+        """How sections are retrieved; part of the analysis cache key."""
+        if self.keyword_index is None:
+            return {"mode": "vector"}
+        return {"mode": "hybrid", "rrf_k": getattr(settings, "RRF_K", 60)}
+
+    def pre_extraction_settings(self) -> Dict[str, Any]:
+        """Which fields may be filled without the LLM; part of the analysis cache key."""
+        if not self.pre_extraction:
+            return {"enabled": False}
+        return {"version": PRE_EXTRACTION_VERSION, "min_confidence": self.pre_extraction_min_confidence}
+
+    def _pre_extract(self, text: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Fields the local extractors fill confidently enough to skip the LLM for them."""
+        if not self.pre_extraction or not text:
+            return {}
+        start = time.perf_counter()
+        found = {
+            section: {
+                name: value for name, value in fields.items()
+                if value["confidence"] >= self.pre_extraction_min_confidence
+            }
+            for section, fields in pre_extract(text).items()
+        }
+        found = {section: fields for section, fields in found.items() if fields}
+        logger.info("Pre-extracted %s in %.3fs", filled_fields(found), time.perf_counter() - start)
+        return found
+
+    def context_report(self) -> Dict[str, Any]:
+        """Prompt context sent by the last analysis: totals and per-section pack_context stats."""
+        return {"total": sum_stats(list(self.last_context_stats.values())), "sections": self.last_context_stats}
+
+    async def _analyze_section(self, section: str, components: Dict[str, Any],
+                               prefilled: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Retrieve the chunks relevant to one section, using the precomputed
+        per-field queries, and have the LLM fill in just that section. Only this section is retried if the reply is
+        unusable; after the last attempt its fields are left empty and the
+        section is added to ``last_failed_sections``.
 
-            # Connect the components
-            query_pipeline.connect("retriever.documents", "prompt_builder.documents")
-            query_pipeline.connect("prompt_builder.prompt", "llm.prompt")
+        Fields in ``prefilled`` were already found by the local extractors, so
+        the LLM is only asked for the rest, and not at all if none are left.
+        """
+        fields = [name for name in SECTIONS[section] if name not in prefilled]
+        if not fields:
+            return {name: prefilled[name] for name in SECTIONS[section]}
 
-            # Run the retrieval and LLM pipeline
-            result = query_pipeline.run({
-                "retriever": {"query_embedding": query_embedding},
-                "prompt_builder": {
-                    "query": "Extract all key information from this RFP document."
-                }
-            })
+        def merged(extracted):
+            return {name: prefilled.get(name) or extracted[name] for name in SECTIONS[section]}
 
-            # Add debug prints
-            print("Full result:", result)
-            print("LLM result:", result.get("llm", {}))
-            print("Raw reply:", result.get("llm", {}).get("replies", []))
+        # A dedicated pool: the loop's default executor is too small on small hosts to
+        # run every section at once, since each retrieval also waits on vector searches
+        loop = asyncio.get_running_loop()
+        executor = components["section_executor"]
+        documents = await loop.run_in_executor(
+            executor,
+            retrieve_for_section,
+            components["retriever"],
+            section,
+            self.field_top_k,
+            self.top_k,
+            components["search_executor"],
+            self.keyword_index,
+            fields,
+        )
+        # Neighbouring chunks are merged without their shared sentences and cut to the token budget
+        packed = pack_context(documents, self.context_max_tokens)
+        self.last_context_stats[section] = packed.stats
+        prompt = components["prompt_builder"].run(
+            documents=packed.documents,
+            query=f"Extract the {section} information from this RFP document.",
+            guidance=SECTION_GUIDANCE.get(section, ""),
+            structure=section_structure(section, fields),
+            instructions=FIELD_INSTRUCTIONS,
+        )["prompt"]
 
-            if isinstance(result.get("llm", {}).get("replies"), list) and result["llm"]["replies"]:
-                raw_reply = result["llm"]["replies"][0]
-                print("Raw reply content:", raw_reply)
+        for attempt in range(self.section_retries + 1):
+            try:
+                result = await loop.run_in_executor(executor, functools.partial(components["llm"].run, prompt=prompt))
+                replies = result.get("replies") or []
+                if not replies:
+                    raise ValueError("Empty reply")
                 # Strip out the markdown code block markers
-                cleaned_reply = raw_reply.replace("```json", "").replace("```", "").strip()
-                try:
-                    parsed_reply = json.loads(cleaned_reply)
-                    return parsed_reply
-                except Exception as parse_error:
-                    print(f"Failed to parse LLM reply as JSON: {parse_error}")
-                    return {}
-            return {}
+                cleaned_reply = replies[0].replace("```json", "").replace("```", "").strip()
+                return merged(normalize_section(section, json.loads(cleaned_reply), fields))
+            except Exception as e:
+                logger.warning("Section %s failed (attempt %d/%d): %s", section, attempt + 1, self.section_retries + 1, e)
+
+        self.last_failed_sections.append(section)
+        return merged({name: empty_field() for name in fields})
+
+    def _build_components(self) -> Dict[str, Any]:
+        """Pooled components shared across requests, plus a retriever for this analyzer's store."""
+        pool = get_component_pool()
+        return {
+            "retriever": get_embedding_retriever(self.vector_store, top_k=self.field_top_k),
+            "search_executor": pool.search_executor,
+            "section_executor": pool.section_executor,
+            "prompt_builder": pool.section_prompt_builder,
+            "llm": pool.llm,
+        }
+
+    async def analyze_sections(self, text: str = "") -> AsyncIterator[Tuple[str, Dict[str, Any], float]]:
+        """
+        Extract every schema section concurrently, yielding
+        (section, fields, seconds) as each one finishes.
+        """
+        components = self._build_components()
+        self.last_context_stats = {}
+        self.last_failed_sections = []
+        pre_extracted = await asyncio.to_thread(self._pre_extract, text)
+        self.last_pre_extracted = filled_fields(pre_extracted)
+        semaphore = asyncio.Semaphore(self.max_concurrent_sections)
+
+        async def run(section):
+            async with semaphore:
+                start = time.perf_counter()
+                fields = await self._analyze_section(section, components, pre_extracted.get(section, {}))
+                return section, fields, time.perf_counter() - start
+
+        for finished in asyncio.as_completed([run(section) for section in SECTIONS]):
+            yield await finished
+
+    async def analyze_rfp(self, text: str, pdf_path=None) -> Dict[str, Any]:
+        """
+        Extract key RFP information as JSON.
+
+        The schema is split into section-level jobs that run concurrently,
+        each with its own targeted retrieval, so wall-clock time is roughly
+        that of the slowest section and one malformed reply only costs that
+        section a retry. Results are merged back into the full schema shape.
+        """
+        try:
+            sections = {}
+            timings = {}
+            async for section, fields, seconds in self.analyze_sections(text):
+                sections[section] = fields
+                timings[section] = round(seconds, 2)
+            logger.info("Section timings (s): %s", timings)
+            logger.info("Section context: %s", self.context_report()["total"])
+            self.last_timings = timings
+            return {section: sections[section] for section in SECTIONS}
 
         except Exception as e:
             print(f"Error in analyze_rfp: {str(e)}")
@@ -1,79 +1,228 @@
-import os
-from pinecone import Pinecone  # Using the new Pinecone client pattern
-from openai import OpenAI
-from typing import Dict
+import time
+from typing import Dict, Iterator, List, Tuple
 import numpy as np
+from django.conf import settings
+from haystack import Document
+from pinecone_store import get_document_store, get_embedding_retriever, get_uploads_index
+from .answer_cache import get_answer_cache
+from .clients import get_openai_client
+from .context_packing import pack_context, render_context
+from .embedding_cache import get_embedding_cache
+from .keyword_index import get_session_index, reciprocal_rank_fusion
 
 class RFPChatbot:
-    def __init__(self):
-        # Initialize Pinecone with new syntax
-        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        self.index = pc.Index("rfpuploads")
-        
-        # Initialize OpenAI
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, session_id=None, client=None):
+        self.session_id = session_id
+        self.top_k = getattr(settings, "CHAT_TOP_K", 5)
+        self.context_max_tokens = getattr(settings, "CHAT_CONTEXT_MAX_TOKENS", 2000)
+        if session_id:
+            # Retrieve from the session's namespace of the shared index
+            self.retriever = get_embedding_retriever(get_document_store(session_id), top_k=self.top_k)
+        else:
+            # Per-process handle for the legacy "rfpuploads" index
+            self.index = get_uploads_index()
+        # BM25 index over the same chunks, or None when hybrid retrieval is off.
+        # Keyword indexes only exist for sessions; the legacy index has none.
+        self.keyword_index = get_session_index(session_id) if session_id else None
 
-    def get_response(self, question: str) -> Dict:
-        try:
-            # Get embedding for the question
-            print(f"Getting embedding for question: {question}")
-            embedding_response = self.client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=question
-            )
-            query_embedding = list(embedding_response.data[0].embedding)  # Convert to list
-            print(f"Generated embedding dimension: {len(query_embedding)}")
+        # Per-process OpenAI client; its connections stay open between messages
+        self.client = client or get_openai_client()
 
+    def _retrieve(self, query_embedding: List[float], question: str) -> List[Document]:
+        """
+        Return the chunks most relevant to the question, best first: the
+        vector matches, fused with the keyword matches when the session has
+        a keyword index.
+        """
+        if self.session_id:
+            documents = self.retriever.run(query_embedding=query_embedding)["documents"]
+        else:
             # Query Pinecone with default namespace
-            print("Querying Pinecone...")
             query_response = self.index.query(
                 vector=query_embedding,
-                top_k=5,
+                top_k=self.top_k,
                 include_metadata=True,
                 namespace="default"  # Explicitly query the default namespace
             )
-            print(f"Raw Pinecone response: {query_response}")
+            documents = [
+                Document(
+                    id=match.id,
+                    content=match.metadata.get('content', ''),
+                    meta={key: value for key, value in match.metadata.items() if key != 'content'},
+                    score=match.score,
+                )
+                for match in query_response.matches
+            ]
+
+        if self.keyword_index is not None:
+            keyword_documents = self.keyword_index.search(question, top_k=self.top_k)
+            documents = reciprocal_rank_fusion([documents, keyword_documents], top_k=self.top_k)
+        return documents
+
+    def _build_context(self, matches: List[Document]) -> Tuple[str, Dict]:
+        """The prompt context for the matches, packed into the token budget, and the packing stats."""
+        packed = pack_context(matches, self.context_max_tokens)
+        print(f"Packed context: {packed.stats}")
+        return render_context(packed.documents), packed.stats
+
+    def _prepare(self, question: str, timings: Dict):
+        """
+        Embed the question, then either find a cached answer for it or retrieve
+        context. Returns (query_embedding, cached response or None, matches).
+        """
+        start = time.perf_counter()
+        print(f"Getting embedding for question: {question}")
+        query_embedding = get_embedding_cache().get_or_embed(
+            "text-embedding-ada-002",
+            [question],
+            lambda texts: [
+                list(item.embedding)
+                for item in self.client.embeddings.create(model="text-embedding-ada-002", input=texts).data
+            ],
+        )[0]
+        print(f"Generated embedding dimension: {len(query_embedding)}")
+        timings["embedding"] = round(time.perf_counter() - start, 3)
+
+        # A close enough earlier question in this session already has an answer
+        cached = get_answer_cache().lookup(self.session_id, query_embedding)
+        if cached is not None:
+            print(f"Answer cache hit (similarity {cached['similarity']}): {cached['question']}")
+            cached["debug_info"] = dict(cached.get("debug_info", {}), cache={
+                "hit": True, "question": cached.pop("question"), "similarity": cached.pop("similarity"),
+            })
+            return query_embedding, cached, []
+
+        # Extract relevant text from matches
+        start = time.perf_counter()
+        print("Querying vector store...")
+        matches = self._retrieve(query_embedding, question)
+        print(f"Number of matches: {len(matches)}")
+        timings["retrieval"] = round(time.perf_counter() - start, 3)
+        return query_embedding, None, matches
 
-            # Extract relevant text from matches
-            matches = query_response.matches
-            print(f"Number of matches: {len(matches)}")
-            
+    def _no_matches(self, query_embedding: List[float]) -> Dict:
+        return {
+            "answer": "I couldn't find any relevant information in the documents. Please try rephrasing your question.",
+            "success": True,
+            "debug_info": {
+                "num_matches": 0,
+                "query_dimension": len(query_embedding),
+                "cache": {"hit": False}
+            }
+        }
+
+    def _completion_kwargs(self, question: str, context: str) -> Dict:
+        return {
+            "model": "gpt-4o",
+            "messages": [
+                {"role": "system", "content": "You are an expert RFP analyst assistant. Answer questions about the RFP document using the provided context. Be concise and specific."},
+                {"role": "user", "content": f"Context: {context}\n\nQuestion: {question}"}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 500,
+        }
+
+    def _finish(self, question: str, query_embedding: List[float], answer: str, matches: List[Document],
+                context: str, packing: Dict) -> Dict:
+        """Build the response for a generated answer and remember it in the answer cache."""
+        result = {
+            "answer": answer,
+            "success": True,
+            "debug_info": {
+                "num_matches": len(matches),
+                "context_length": len(context),
+                "context": packing,
+            }
+        }
+        try:
+            get_answer_cache().store(self.session_id, question, query_embedding, result)
+        except Exception as e:
+            print(f"Failed to cache answer: {e}")
+        result["debug_info"]["cache"] = {"hit": False}
+        return result
+
+    def get_response(self, question: str) -> Dict:
+        try:
+            start = time.perf_counter()
+            timings = {}
+            query_embedding, cached, matches = self._prepare(question, timings)
+            if cached is not None:
+                cached["debug_info"]["timings"] = dict(timings, total=round(time.perf_counter() - start, 3))
+                return cached
             if not matches:
-                return {
-                    "answer": "I couldn't find any relevant information in the documents. Please try rephrasing your question.",
-                    "success": True,
-                    "debug_info": {
-                        "num_matches": 0,
-                        "query_dimension": len(query_embedding)
-                    }
-                }
-
-            # Extract context from matches
-            context = "\n".join([match.metadata.get('content', '') for match in matches])
+                return self._no_matches(query_embedding)
+
+            # Merge neighbouring matches and pack them into the context budget
+            context, packing = self._build_context(matches)
 
             # Generate response
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert RFP analyst assistant. Answer questions about the RFP document using the provided context. Be concise and specific."},
-                    {"role": "user", "content": f"Context: {context}\n\nQuestion: {question}"}
-                ],
-                temperature=0.3,
-                max_tokens=500
+            completion_start = time.perf_counter()
+            response = self.client.chat.completions.create(**self._completion_kwargs(question, context))
+            timings["completion"] = round(time.perf_counter() - completion_start, 3)
+
+            result = self._finish(
+                question, query_embedding, response.choices[0].message.content, matches, context, packing
             )
+            timings["total"] = round(time.perf_counter() - start, 3)
+            result["debug_info"]["timings"] = timings
+            return result
 
+        except Exception as e:
+            print(f"Detailed error: {str(e)}")
             return {
-                "answer": response.choices[0].message.content,
-                "success": True,
-                "debug_info": {
-                    "num_matches": len(matches),
-                    "context_length": len(context)
-                }
+                "answer": "Sorry, I encountered an error while processing your question.",
+                "error": str(e),
+                "success": False
             }
 
+    def stream_response(self, question: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        Answer like get_response, but yield ("token", {"text": ...}) for each
+        piece of the answer as the model produces it, then ("complete", response)
+        with the same debug_info plus timings, including time to first token.
+        Failures are yielded as ("error", {...}).
+        """
+        start = time.perf_counter()
+        timings = {}
+
+        def elapsed():
+            return round(time.perf_counter() - start, 3)
+
+        try:
+            query_embedding, cached, matches = self._prepare(question, timings)
+            if cached is not None or not matches:
+                result = cached if cached is not None else self._no_matches(query_embedding)
+                timings["first_token"] = elapsed()
+                yield "token", {"text": result["answer"]}
+                timings["total"] = elapsed()
+                result["debug_info"]["timings"] = timings
+                yield "complete", result
+                return
+
+            context, packing = self._build_context(matches)
+            completion_start = time.perf_counter()
+            parts = []
+            # Leaving the block closes the HTTP stream, including when the client disconnects
+            with self.client.chat.completions.create(**self._completion_kwargs(question, context), stream=True) as stream:
+                for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if not text:
+                        continue
+                    if not parts:
+                        timings["first_token"] = elapsed()
+                    parts.append(text)
+                    yield "token", {"text": text}
+            timings["completion"] = round(time.perf_counter() - completion_start, 3)
+
+            result = self._finish(question, query_embedding, "".join(parts), matches, context, packing)
+            timings["total"] = elapsed()
+            result["debug_info"]["timings"] = timings
+            print(f"Streamed answer: first token after {timings.get('first_token')}s, total {timings['total']}s")
+            yield "complete", result
+
         except Exception as e:
             print(f"Detailed error: {str(e)}")
-            return {
+            yield "error", {
                 "answer": "Sorry, I encountered an error while processing your question.",
                 "error": str(e),
                 "success": False
@@ -0,0 +1,266 @@
+"""
+Document-to-corpus similarity.
+
+Every ingested RFP gets a compact fingerprint: the normalized centroid of its
+chunk embeddings plus up to FINGERPRINT_VECTORS representative vectors found
+by spherical k-means. Fingerprints are stored as float16 by content hash.
+
+The historical bid corpus (the "paidmediabids" index) is reduced to the same
+fingerprints once, stacked into one matrix and persisted, so comparing a new
+RFP against it is two matrix products in NumPy:
+
+- centroid similarity: cosine between the two documents' centroids
+- max-sim: for each representative vector of the new RFP, its best cosine
+  match among a past bid's representatives, averaged
+
+A past bid's score is the mean of the two. The aggregate score is the mean
+score of the closest TOP_MATCHES_FOR_AGGREGATE bids.
+"""
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+import numpy as np
+from django.conf import settings
+
+FINGERPRINT_VECTORS = 16
+KMEANS_ITERATIONS = 8
+TOP_MATCHES_FOR_AGGREGATE = 5
+
+# Metadata fields that identify which document a vector in the bid index came
+# from, in order of preference. Vectors without any of them are grouped by the
+# part of their id before the first "#" or "-chunk".
+DOCUMENT_KEYS = ("file_name", "file_path", "source", "source_id", "title", "document_id")
+
+Fingerprint = namedtuple("Fingerprint", ["centroid", "vectors", "chunks"])
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+
+def get_similarity_dir():
+    return getattr(settings, "SIMILARITY_DIR", os.path.join(settings.BASE_DIR, "cache", "similarity"))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def compute_fingerprint(embeddings, k=FINGERPRINT_VECTORS):
+    """Centroid plus up to k spherical k-means centers of a document's chunk embeddings."""
+    vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+    if not len(vectors):
+        raise ValueError("Cannot fingerprint a document without embeddings")
+    centroid = _normalize(vectors.mean(axis=0))
+    if len(vectors) <= k:
+        return Fingerprint(centroid, vectors, len(vectors))
+
+    # Seed with chunks spread evenly through the document so every part of it is represented
+    centers = vectors[np.linspace(0, len(vectors) - 1, k).astype(int)]
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centers.T, axis=1)
+        members = np.zeros((k, len(vectors)), dtype=np.float32)
+        members[assignment, np.arange(len(vectors))] = 1
+        sums = members @ vectors
+        occupied = members.sum(axis=1) > 0
+        centers[occupied] = _normalize(sums[occupied])
+    return Fingerprint(centroid, centers, len(vectors))
+
+
+def _fingerprint_path(content_hash):
+    return os.path.join(get_similarity_dir(), "fingerprints", f"{content_hash}.npz")
+
+
+def store_fingerprint(content_hash, fingerprint):
+    path = _fingerprint_path(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    scratch = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        scratch,
+        centroid=fingerprint.centroid.astype(np.float16),
+        vectors=fingerprint.vectors.astype(np.float16),
+        chunks=np.array(fingerprint.chunks),
+    )
+    os.replace(scratch, path)
+
+
+def load_fingerprint(content_hash):
+    """Return the stored fingerprint for a PDF, or None if it has never been fingerprinted."""
+    path = _fingerprint_path(content_hash)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as stored:
+        return Fingerprint(
+            stored["centroid"].astype(np.float32),
+            stored["vectors"].astype(np.float32),
+            int(stored["chunks"]),
+        )
+
+
+def fingerprint_documents(content_hash, documents):
+    """Fingerprint a PDF's embedded chunks and store the result, returning it."""
+    fingerprint = compute_fingerprint([doc.embedding for doc in documents if doc.embedding is not None])
+    store_fingerprint(content_hash, fingerprint)
+    return fingerprint
+
+
+class Corpus:
+    """Fingerprints of every past bid, stacked into matrices for vectorized scoring."""
+
+    def __init__(self, names, chunks, centroids, vectors):
+        self.names = list(names)
+        self.chunks = np.asarray(chunks)
+        # (documents, dimension) and (documents, FINGERPRINT_VECTORS, dimension)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    @classmethod
+    def from_fingerprints(cls, fingerprints):
+        """Build from {name: Fingerprint}. Short fingerprints are padded by repeating their rows."""
+        names = sorted(fingerprints)
+        vectors = []
+        for name in names:
+            rows = fingerprints[name].vectors
+            vectors.append(rows[np.arange(FINGERPRINT_VECTORS) % len(rows)])
+        return cls(
+            names,
+            [fingerprints[name].chunks for name in names],
+            [fingerprints[name].centroid for name in names],
+            vectors,
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def score(self, fingerprint):
+        """Return (scores, centroid_similarity, max_sim), one entry per past bid."""
+        centroid_similarity = self.centroids @ fingerprint.centroid
+        # One (query vectors x documents*FINGERPRINT_VECTORS) product, then the
+        # best match per query vector within each document
+        documents, k, dimension = self.vectors.shape
+        similarities = fingerprint.vectors @ self.vectors.reshape(documents * k, dimension).T
+        max_sim = similarities.reshape(len(fingerprint.vectors), documents, k).max(axis=2).mean(axis=0)
+        return (centroid_similarity + max_sim) / 2, centroid_similarity, max_sim
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        scratch = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            scratch,
+            names=np.array(self.names),
+            chunks=self.chunks,
+            centroids=self.centroids.astype(np.float16),
+            vectors=self.vectors.astype(np.float16),
+        )
+        os.replace(scratch, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            return cls(stored["names"].tolist(), stored["chunks"], stored["centroids"], stored["vectors"])
+
+
+def _document_name(vector_id, metadata):
+    for key in DOCUMENT_KEYS:
+        if metadata.get(key):
+            return str(metadata[key])
+    for separator in ("#", "-chunk"):
+        if separator in vector_id:
+            return vector_id.split(separator, 1)[0]
+    return vector_id
+
+
+def build_corpus_from_index(index, namespace="", fetch_batch=100):
+    """Fetch every vector in a Pinecone index namespace and fingerprint each source document."""
+    grouped = defaultdict(list)
+    for ids in index.list(namespace=namespace):
+        for start in range(0, len(ids), fetch_batch):
+            fetched = index.fetch(ids=ids[start:start + fetch_batch], namespace=namespace)
+            for vector_id, vector in fetched.vectors.items():
+                grouped[_document_name(vector_id, vector.metadata or {})].append(vector.values)
+    return Corpus.from_fingerprints({name: compute_fingerprint(rows) for name, rows in grouped.items()})
+
+
+class CorpusNotBuiltError(RuntimeError):
+    """Raised when the bid corpus has not been built yet."""
+
+
+def get_corpus_path():
+    index_name = getattr(settings, "SIMILARITY_CORPUS_INDEX", "paidmediabids")
+    return os.path.join(get_similarity_dir(), f"corpus-{index_name}.npz")
+
+
+def refresh_corpus():
+    """Rebuild the bid corpus from its Pinecone index and persist it."""
+    from pinecone_store import get_pinecone_client
+
+    global _corpus
+    index_name = getattr(settings, "SIMILARITY_CORPUS_INDEX", "paidmediabids")
+    namespace = getattr(settings, "SIMILARITY_CORPUS_NAMESPACE", "default")
+    start = time.perf_counter()
+    corpus = build_corpus_from_index(get_pinecone_client().Index(index_name), namespace)
+    corpus.save(get_corpus_path())
+    print(f"Built similarity corpus of {len(corpus)} bids from {index_name} in {time.perf_counter() - start:.1f}s")
+    with _corpus_lock:
+        _corpus = corpus
+    return corpus
+
+
+def get_corpus():
+    """
+    The bid corpus, loaded from disk once per process. Building it pages
+    through the whole Pinecone index, far too slow for a request, so a
+    missing corpus raises CorpusNotBuiltError instead.
+    """
+    global _corpus
+    with _corpus_lock:
+        if _corpus is None and os.path.exists(get_corpus_path()):
+            _corpus = Corpus.load(get_corpus_path())
+        if _corpus is None:
+            raise CorpusNotBuiltError(
+                "The similarity corpus has not been built; run `python manage.py build_similarity_corpus`"
+            )
+        return _corpus
+
+
+def compare_to_corpus(fingerprint, corpus, top_n=10):
+    """Rank past bids by similarity to a fingerprinted RFP."""
+    if not len(corpus):
+        return {"similarity_score": 0.0, "matches": [], "total_documents_compared": 0}
+    scores, centroid_similarity, max_sim = corpus.score(fingerprint)
+    order = np.argsort(-scores)
+    matches = [
+        {
+            "document": corpus.names[i],
+            "score": round(float(scores[i]), 4),
+            "centroid_similarity": round(float(centroid_similarity[i]), 4),
+            "max_sim": round(float(max_sim[i]), 4),
+            "chunks": int(corpus.chunks[i]),
+        }
+        for i in order[:top_n]
+    ]
+    aggregate = float(scores[order[:TOP_MATCHES_FOR_AGGREGATE]].mean())
+    return {
+        "similarity_score": round(aggregate, 4),
+        "matches": matches,
+        "total_documents_compared": len(corpus),
+    }
+
+
+def get_fingerprint(content_hash):
+    """
+    Stored fingerprint for a PDF, falling back to fingerprinting its cached
+    chunks for PDFs ingested before fingerprints existed.
+    """
+    from . import ingestion_cache
+    from .embeddings import EMBEDDING_MODEL
+    from .ingestion import chunking_settings
+
+    fingerprint = load_fingerprint(content_hash)
+    if fingerprint is not None:
+        return fingerprint
+    cached = ingestion_cache.load(ingestion_cache.ingestion_cache_key(content_hash, chunking_settings(), EMBEDDING_MODEL))
+    if cached is None:
+        return None
+    return fingerprint_documents(content_hash, cached.documents)
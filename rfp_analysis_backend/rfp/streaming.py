@@ -0,0 +1,87 @@
+"""
+Server-sent events helpers.
+
+Views run under WSGI, where StreamingHttpResponse needs a plain iterator.
+iterate_async() runs an async generator on its own event loop in a worker
+thread and hands its items over through a queue, so results reach the client
+as soon as they are produced.
+"""
+import asyncio
+import json
+import queue
+import threading
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event, data):
+    """Format one SSE message with a JSON payload."""
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def iterate_async(make_generator):
+    """
+    Iterate synchronously over the async generator returned by make_generator().
+    Exceptions raised by the generator are re-raised in the caller. If the
+    caller stops early (e.g. the client disconnected), the generator is closed
+    at its next yield.
+    """
+    items = queue.Queue()
+    stopped = threading.Event()
+
+    async def produce():
+        generator = make_generator()
+        try:
+            async for item in generator:
+                items.put(("item", item))
+                if stopped.is_set():
+                    break
+        finally:
+            await generator.aclose()
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            items.put(("error", e))
+        finally:
+            items.put(("done", None))
+
+    thread = threading.Thread(target=run, name="sse-producer", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stopped.set()
+
+
+def sse_response(events):
+    """StreamingHttpResponse for an iterator of formatted SSE messages."""
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx and similar proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF views accept "Accept: text/event-stream" (sent by EventSource).
+    The response body is streamed by the view; this only renders error payloads.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return sse_event("error", data).encode(self.charset)
@@ -0,0 +1,43 @@
+"""
+Token counting with the tokenizer used by OpenAI's embedding and chat models.
+
+The tiktoken encoding is loaded once per process. If it cannot be loaded
+(tiktoken downloads its BPE file on first use, so an offline machine without
+a TIKTOKEN_CACHE_DIR has none), counts fall back to an estimate of one token
+per four characters, which is close for English prose.
+"""
+import functools
+import math
+from typing import List
+
+ENCODING_NAME = "cl100k_base"
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(name=ENCODING_NAME):
+    """The tiktoken encoding, or None if it is unavailable."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"tiktoken encoding {name} unavailable, estimating token counts instead: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_tokens(text: str, max_tokens: int) -> List[str]:
+    """Cut text into consecutive pieces of at most max_tokens tokens each."""
+    encoding = get_encoding()
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
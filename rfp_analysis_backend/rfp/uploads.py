@@ -0,0 +1,63 @@
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+SpooledUpload = namedtuple("SpooledUpload", ["path", "sha256", "size"])
+
+# Used when an upload did not come through the hashing handler.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream every upload straight to a temporary file on disk, hashing the
+    chunks as they arrive. The finished file gets a ``sha256`` attribute, so
+    nothing has to read the upload back into memory to identify it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.hasher.hexdigest()
+        return uploaded_file
+
+
+@contextmanager
+def spool_upload(uploaded_file):
+    """
+    Yield a SpooledUpload for an uploaded file: a path on disk the PDF parser
+    can open, plus the SHA-256 of its contents.
+
+    Uploads handled by HashingTemporaryFileUploadHandler are used in place.
+    Anything else (e.g. in-memory uploads from another handler) is copied to a
+    temporary file chunk by chunk, which is removed again on exit.
+    """
+    sha256 = getattr(uploaded_file, "sha256", None)
+    if sha256 and hasattr(uploaded_file, "temporary_file_path"):
+        yield SpooledUpload(uploaded_file.temporary_file_path(), sha256, uploaded_file.size)
+        return
+
+    hasher = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".upload.pdf", dir=settings.FILE_UPLOAD_TEMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as destination:
+            for chunk in uploaded_file.chunks(COPY_CHUNK_SIZE):
+                hasher.update(chunk)
+                destination.write(chunk)
+                size += len(chunk)
+        yield SpooledUpload(path, hasher.hexdigest(), size)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
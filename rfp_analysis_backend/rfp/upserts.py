@@ -0,0 +1,150 @@
+"""
+Batched, concurrent writes of embedded chunks into a session document store.
+
+BatchUpserter takes documents as they become available, groups them into
+batches bounded by both document count and estimated request size (Pinecone
+rejects upserts over 2 MB), and writes each full batch on the per-process
+upsert executor while the caller keeps producing. Every session store shares
+its backend's index handle, so concurrent batches reuse one connection pool.
+
+Stores with a deferred_save() context (LocalVectorDocumentStore) persist once
+when the upserter closes rather than after every batch.
+
+Batches are written with DuplicatePolicy.OVERWRITE, so a failed batch can be
+retried on its own without duplicating anything an earlier attempt wrote.
+"""
+import contextlib
+import json
+import random
+import threading
+import time
+from django.conf import settings
+from haystack.document_stores.types import DuplicatePolicy
+
+# A 1536-d float serialized as JSON, as in a Pinecone REST upsert, is about this many bytes
+BYTES_PER_EMBEDDING_VALUE = 20
+
+
+class UpsertError(RuntimeError):
+    """Raised when batches still fail after their retries."""
+
+
+def payload_bytes(document):
+    """Rough size of a document's upsert request payload."""
+    meta = json.dumps(document.meta, default=str)
+    return (len(document.embedding or ()) * BYTES_PER_EMBEDDING_VALUE
+            + len((document.content or "").encode("utf-8")) + len(meta))
+
+
+class BatchUpserter:
+    """
+    Write documents to a document store in size-bounded batches, several at
+    once. Use as a context manager: add() documents as they are embedded, and
+    leaving the block waits for every batch, raising UpsertError if any batch
+    failed all its attempts. Counters are kept in ``stats``.
+    """
+
+    def __init__(self, document_store, batch_size=None, max_batch_bytes=None, max_retries=None, executor=None):
+        self.document_store = document_store
+        self.batch_size = batch_size or getattr(settings, "UPSERT_BATCH_SIZE", 100)
+        self.max_batch_bytes = max_batch_bytes or getattr(settings, "UPSERT_MAX_BATCH_BYTES", 1_500_000)
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, "UPSERT_MAX_RETRIES", 3)
+        if executor is None:
+            from .components import get_component_pool
+
+            executor = get_component_pool().upsert_executor
+        self.executor = executor
+        self.stats = {"documents": 0, "written": 0, "batches": 0, "retries": 0, "failed_batches": 0}
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_bytes = 0
+        self._futures = []
+        self._errors = []
+        self._start = None
+        deferred_save = getattr(document_store, "deferred_save", None)
+        self._saving = deferred_save() if deferred_save else contextlib.nullcontext()
+
+    @property
+    def written(self):
+        return self.stats["written"]
+
+    def add(self, documents):
+        """Queue embedded documents; every batch that fills up is sent immediately."""
+        with self._lock:
+            if self._start is None:
+                self._start = time.perf_counter()
+            for doc in documents:
+                size = payload_bytes(doc)
+                if self._pending and (len(self._pending) >= self.batch_size
+                                      or self._pending_bytes + size > self.max_batch_bytes):
+                    self._send()
+                self._pending.append(doc)
+                self._pending_bytes += size
+                self.stats["documents"] += 1
+            if len(self._pending) >= self.batch_size:
+                self._send()
+
+    def _send(self):
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        self.stats["batches"] += 1
+        self._futures.append(self.executor.submit(self._write, batch))
+
+    def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.document_store.write_documents(batch, policy=DuplicatePolicy.OVERWRITE)
+                with self._lock:
+                    self.stats["written"] += len(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.stats["failed_batches"] += 1
+                        self._errors.append(e)
+                    print(f"Upsert of {len(batch)} documents failed after {attempt + 1} attempts: {e}")
+                    return
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(min(10.0, 0.5 * 2 ** attempt) * (1 + random.random() * 0.25))
+
+    def wait(self):
+        """Send the last partial batch and block until every batch has finished."""
+        with self._lock:
+            if self._pending:
+                self._send()
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """Wait for every batch and return the number of documents written."""
+        self.wait()
+        if self._start is not None:
+            self.stats["seconds"] = round(time.perf_counter() - self._start, 3)
+        print(f"Upserted {self.written} of {self.stats['documents']} documents: {self.stats}")
+        if self._errors:
+            raise UpsertError(f"{self.stats['failed_batches']} of {self.stats['batches']} upsert batches failed; "
+                              f"last error: {self._errors[-1]}")
+        return self.written
+
+    def __enter__(self):
+        self._saving.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.close()
+            else:
+                # Let in-flight batches finish so nothing is written after the caller gives up
+                self.wait()
+        finally:
+            self._saving.__exit__(None, None, None)
+        return False
+
+
+def upsert_documents(document_store, documents):
+    """Write already-embedded documents in concurrent batches; returns how many were written."""
+    with BatchUpserter(document_store) as upserter:
+        upserter.add(documents)
+    return upserter.written
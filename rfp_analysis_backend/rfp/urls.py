@@ -4,10 +4,20 @@ from . import views
 urlpatterns = [
     path('upload_pdf/', views.upload_pdf, name='upload_pdf'),
     path('analyze-pdf/', views.analyze_pdf, name='analyze_pdf'),
+    path('ingest/', views.submit_ingestion_job, name='submit_ingestion_job'),
+    path('ingest/<uuid:job_id>/', views.ingestion_job_status, name='ingestion_job_status'),
+    path('ingest/<uuid:job_id>/retry/', views.retry_ingestion_job, name='retry_ingestion_job'),
     path('analyze/', views.analyze_rfp, name='analyze_rfp'),
+    path('analyze/stream/', views.analyze_rfp_stream, name='analyze_rfp_stream'),
+    path('analyze/batch/', views.analyze_batch, name='analyze_batch'),
+    path('analyze/invalidate/', views.invalidate_analysis_cache, name='invalidate_analysis_cache'),
     path('chat/', views.chat_with_rfp, name='chat_with_rfp'),
+    path('chat/stream/', views.chat_stream, name='chat_stream'),
+    path('chat/cache/', views.chat_answer_cache, name='chat_answer_cache'),
     path('matrix/', views.generate_bid_matrix, name='generate_bid_matrix'),
+    path('matrix/<int:doc_id>/', views.generate_bid_matrix, name='generate_document_bid_matrix'),
     path('download/', views.download_matrix, name='download_matrix'),
+    path('download/<int:doc_id>/', views.download_matrix, name='download_document_matrix'),
     path('compare-indexes/', views.compare_indexes, name='compare-indexes'),
     path('download-report/', views.download_report, name='download_report'),
     path('cleanup-session/', views.cleanup_session, name='cleanup_session'),
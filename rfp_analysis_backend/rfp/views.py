@@ -1,37 +1,45 @@
 import os
 import uuid
+from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from django.http import JsonResponse, HttpResponse
-from rest_framework.decorators import api_view, parser_classes
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.parsers import MultiPartParser
-from PyPDF2 import PdfReader
-from haystack import Document
-from haystack.components.preprocessors import DocumentSplitter
-from haystack.components.embedders import OpenAIDocumentEmbedder
-from haystack.utils import Secret
-from pinecone_store import document_store, get_document_store, reset_document_store
-from .rfp_analyzer import RFPAnalyzer
+from rest_framework.renderers import JSONRenderer
+from .uploads import spool_upload
+from .streaming import EventStreamRenderer
+from .models import RFPDocument
 from asgiref.sync import async_to_sync
-from .rfp_chatbot import RFPChatbot
 from rest_framework.response import Response
 from rest_framework import status
-import json
-import asyncio
-from pinecone_store import Pinecone
-import numpy as np
-from openpyxl import Workbook
 from datetime import datetime
-from pinecone_store import get_session_index_name, pc, index_name_base
-from django.conf import settings
 
-# Create a global analyzer instance using our Pinecone document store.
-analyzer = RFPAnalyzer(vector_store=document_store)
+# Haystack, Pinecone, OpenAI and openpyxl are imported inside the views that
+# use them, so loading the URLconf (e.g. `manage.py check`) stays fast and
+# never needs network access.
+
+_analyzer = None
+
+
+def get_analyzer():
+    """Shared analyzer for endpoints that don't need a session's documents, created on first use."""
+    global _analyzer
+    if _analyzer is None:
+        from .rfp_analyzer import RFPAnalyzer
+
+        _analyzer = RFPAnalyzer(vector_store=None)
+    return _analyzer
 
-def extract_text_from_pdf(file_path):
+def extract_text_from_pdf(file_path, workers=None):
     """
     Extract text from a PDF file.
+
+    Pages are extracted in parallel by the page-level extraction engine and
+    joined with form feeds, so the splitter can keep track of page numbers.
     """
+    from .ingestion import pages_to_text
+    from .pdf_extraction import NoExtractableTextError, extract_pages
+
     try:
         # Check if the file exists at the given path
         if not os.path.exists(file_path):
@@ -40,15 +48,13 @@ def extract_text_from_pdf(file_path):
             if not os.path.exists(absolute_path):
                 raise FileNotFoundError(f"File not found at {file_path} or {absolute_path}")
             file_path = absolute_path
-        
-        with open(file_path, "rb") as f:
-            reader = PdfReader(f)
-            extracted_text = "\n".join(
-                [page.extract_text() for page in reader.pages if page.extract_text()]
-            )
-            if not extracted_text:
-                raise ValueError("No extractable text found in PDF")
-            return extracted_text
+
+        pages = extract_pages(file_path, workers=workers)
+        extracted_text = pages_to_text(pages)
+        if not extracted_text.strip():
+            raise NoExtractableTextError("No extractable text found in PDF")
+        print(f"Extracted {len(pages)} pages from {file_path}")
+        return extracted_text
     except Exception as e:
         print(f"PDF extraction failed: {e}")
         raise
@@ -60,35 +66,14 @@ def upload_pdf(request):
     Upload an RFP PDF file, extract text, split it into chunks,
     compute 1536-d OpenAI embeddings, and index them into Pinecone.
     """
+    from PyPDF2.errors import PdfReadError
+    from .ingestion import ingest_session
+
     try:
         file = request.FILES.get("file")
         if not file or not file.name.endswith(".pdf"):
             return JsonResponse({"error": "Invalid file"}, status=400)
 
-        # Reset the document store for new upload
-        print("Resetting document store")
-        global document_store
-        document_store = reset_document_store()
-
-        # Generate a unique identifier for this document
-        unique_id = str(uuid.uuid4())
-        file_path = f"rfp_documents/{unique_id}_{file.name}"
-        file_name = default_storage.save(file_path, ContentFile(file.read()))
-        print(f"Saved PDF at: {default_storage.path(file_name)}")
-
-        # Extract text from the PDF
-        try:
-            extracted_text = extract_text_from_pdf(default_storage.path(file_name))
-        except Exception as e:
-            return JsonResponse({"error": f"Failed to read PDF: {str(e)}"}, status=500)
-
-        # Split the text into document chunks
-        splitter = DocumentSplitter(split_by="sentence", split_length=3, split_overlap=1)
-        splitter.warm_up()
-        docs = [Document(content=extracted_text)]
-        split_docs = splitter.run(docs)["documents"]
-        print(f"Split into {len(split_docs)} document chunks")
-
         # Get OpenAI API key
         openai_api_key = os.environ.get("OPENAI_API_KEY")
         if not openai_api_key:
@@ -97,27 +82,14 @@ def upload_pdf(request):
                 status=500,
             )
 
-        # Embed documents
-        document_embedder = OpenAIDocumentEmbedder(
-            api_key=Secret.from_token(openai_api_key),
-            model="text-embedding-ada-002"
-        )
-        embedding_results = document_embedder.run(split_docs)
-        embedded_docs = embedding_results["documents"]
-
-        # Debug: Log embedding dimensions
-        for i, doc in enumerate(embedded_docs):
-            if doc.embedding:
-                print(f"Document {i} embedding dimension: {len(doc.embedding)}")
-            else:
-                print(f"Document {i} has no embedding.")
-
-        # Index documents
-        document_store.write_documents(embedded_docs)
-        print("Documents written to Pinecone document store.")
-
-        # Clean up the file after processing
-        default_storage.delete(file_name)
+        # Replace the default store's documents, ingesting straight from the
+        # spooled upload; the file is never read into memory
+        with spool_upload(file) as upload:
+            print(f"Spooled PDF at: {upload.path} (sha256: {upload.sha256})")
+            try:
+                ingest_session(upload.path, upload.sha256, None, file_name=file.name)
+            except (ValueError, PdfReadError) as e:
+                return JsonResponse({"error": f"Failed to read PDF: {str(e)}"}, status=500)
 
         return JsonResponse({
             "success": True,
@@ -134,6 +106,8 @@ def upload_pdf(request):
 @parser_classes([MultiPartParser])
 def analyze_pdf(request):
     """Process and index the PDF in Pinecone."""
+    from .ingestion import ingest_session
+
     try:
         print("analyze_pdf view called")
         print("Request data:", request.data)
@@ -153,45 +127,18 @@ def analyze_pdf(request):
         uploaded_file = request.FILES['file']
         print(f"Received file: {uploaded_file.name}, size: {uploaded_file.size}")
         
-        # Save the file temporarily
-        file_path = default_storage.save(f"uploads/{uploaded_file.name}", ContentFile(uploaded_file.read()))
-        print(f"Saved file to: {file_path}")
-        
-        # Get the absolute path to the file
-        absolute_file_path = default_storage.path(file_path)
-        print(f"Absolute file path: {absolute_file_path}")
-        
-        # Reset the document store for this session
-        document_store = reset_document_store(session_id)
-        print(f"Reset document store for session: {session_id}")
-
-        # Extract and process the PDF
-        extracted_text = extract_text_from_pdf(absolute_file_path)
-        print(f"Extracted text length: {len(extracted_text)}")
-        
-        # Split into chunks and embed
-        splitter = DocumentSplitter(split_by="sentence", split_length=3, split_overlap=1)
-        # Warm up the splitter before using it
-        splitter.warm_up()
-        
-        docs = [Document(content=extracted_text)]
-        split_docs = splitter.run(docs)["documents"]
-
         # Get OpenAI API key
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             return JsonResponse({"error": "OpenAI API key not found"}, status=500)
 
-        # Embed the documents
-        embedder = OpenAIDocumentEmbedder(api_key=Secret.from_token(api_key))
-        
-        embedded_docs = embedder.run(split_docs)["documents"]
-
-        # Write to Pinecone
-        document_store.write_documents(embedded_docs)
-
-        # Clean up the temporary file
-        default_storage.delete(file_path)
+        # Replace the session's documents: extract, split, embed and index
+        # straight from the spooled upload. Identical PDFs are served from the
+        # content-addressed ingestion cache.
+        with spool_upload(uploaded_file) as upload:
+            print(f"Spooled file to: {upload.path} (sha256: {upload.sha256})")
+            ingestion, _ = ingest_session(upload.path, upload.sha256, session_id, file_name=uploaded_file.name)
+        print(f"Indexed {len(ingestion.documents)} chunks (cache hit: {ingestion.cache_hit})")
 
         return JsonResponse({
             "success": True,
@@ -207,27 +154,133 @@ def analyze_pdf(request):
             "error": f"Analysis failed: {str(e)}"
         }, status=500)
 
+@api_view(["POST"])
+@parser_classes([MultiPartParser])
+def submit_ingestion_job(request):
+    """
+    Queue a PDF for background ingestion and return its job id right away.
+    Poll ingest/<job_id>/ for progress; the session is ready for analyze/
+    once the job has succeeded.
+    """
+    from .jobs import submit_ingestion, job_status
+
+    try:
+        uploaded_file = request.FILES.get("file")
+        if not uploaded_file or not uploaded_file.name.lower().endswith(".pdf"):
+            return JsonResponse({"error": "No PDF file provided"}, status=400)
+        if not os.getenv("OPENAI_API_KEY"):
+            return JsonResponse({"error": "OpenAI API key not found"}, status=500)
+
+        session_id = request.data.get('session_id') or str(uuid.uuid4())
+        with spool_upload(uploaded_file) as upload:
+            job = submit_ingestion(upload, uploaded_file.name, session_id)
+        print(f"Queued ingestion job {job.id} for session {session_id}")
+
+        return JsonResponse({
+            "success": True,
+            **job_status(job),
+            "status_url": request.build_absolute_uri(f"{job.id}/"),
+        }, status=202)
+
+    except Exception as e:
+        print(f"Error in submit_ingestion_job: {str(e)}")
+        return JsonResponse({
+            "error": f"Failed to queue ingestion: {str(e)}"
+        }, status=500)
+
+@api_view(["GET"])
+def ingestion_job_status(request, job_id):
+    """Report an ingestion job's status and per-stage progress."""
+    from .jobs import get_worker_pool, job_status
+    from .models import IngestionJob
+
+    # Make sure this process is working the queue, e.g. after a restart
+    get_worker_pool().start()
+    try:
+        job = IngestionJob.objects.get(pk=job_id)
+    except IngestionJob.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return JsonResponse({"success": True, **job_status(job)})
+
+@api_view(["POST"])
+def retry_ingestion_job(request, job_id):
+    """Requeue a failed ingestion job."""
+    from .jobs import job_status, retry_job
+    from .models import IngestionJob
+
+    try:
+        job = IngestionJob.objects.get(pk=job_id)
+    except IngestionJob.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    if job.status != IngestionJob.FAILED:
+        return JsonResponse({"error": f"Only failed jobs can be retried (job is {job.status})"}, status=409)
+    try:
+        retry_job(job)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=410)
+    job.refresh_from_db()
+    return JsonResponse({"success": True, **job_status(job)})
+
 @api_view(["POST"])
 def analyze_rfp(request):
-    """Analyze the RFP using the indexed documents."""
+    """
+    Analyze the RFP using the indexed documents.
+
+    Results are stored on the session's RFPDocument and served from the
+    database for repeat requests; pass "refresh": true to re-run the analysis.
+    The response's cache_status is "hit", "miss", "refreshed", "bypass"
+    (no uploaded document to key the result on) or "incomplete" (the sections
+    in failed_sections got no usable LLM reply, so the result was not stored
+    and the next request tries again). "context" reports the prompt
+    tokens each section sent after packing and how many packing saved, and
+    "pre_extracted" lists the fields filled from the text without the LLM.
+    """
+    from pinecone_store import get_document_store
+    from . import analysis_cache
+    from .keyword_index import get_session_index
+    from .rfp_analyzer import RFPAnalyzer
+
     try:
         # Get the session ID
         session_id = request.data.get('session_id')
+        refresh = bool(request.data.get('refresh'))
         
         # Get the document store for this session
         document_store = get_document_store(session_id)
         
-        # Create an analyzer with the session-specific document store
-        analyzer = RFPAnalyzer(vector_store=document_store)
+        # Create an analyzer with the session-specific document and keyword stores
+        analyzer = RFPAnalyzer(vector_store=document_store, keyword_index=get_session_index(session_id))
 
-        
-        # Use the analyzer to analyze the indexed documents
-        result = async_to_sync(analyzer.analyze_rfp)("", "")
+        document, cache_key = analysis_cache.resolve(session_id, analyzer)
+        if cache_key and not refresh:
+            cached = analysis_cache.load(document.content_hash, cache_key)
+            if cached:
+                return JsonResponse({
+                    "success": True,
+                    "result": cached["result"],
+                    "session_id": session_id,
+                    "cache_status": "hit",
+                })
+
+        # Analyze the indexed documents; fields the local extractors find in
+        # the extracted text are filled without the LLM
+        result = async_to_sync(analyzer.analyze_rfp)(document.extracted_text if document else "")
+
+        cache_status = "bypass"
+        if analyzer.last_failed_sections:
+            cache_status = "incomplete"
+        elif cache_key and result:
+            analysis_cache.store(document, cache_key, result, analyzer.last_timings)
+            cache_status = "refreshed" if refresh else "miss"
         
         return JsonResponse({
             "success": True,
             "result": result,
-            "session_id": session_id
+            "session_id": session_id,
+            "cache_status": cache_status,
+            "failed_sections": analyzer.last_failed_sections,
+            "context": analyzer.context_report(),
+            "pre_extracted": analyzer.last_pre_extracted,
         })
 
     except Exception as e:
@@ -238,47 +291,263 @@ def analyze_rfp(request):
             "error": f"Analysis failed: {str(e)}"
         }, status=500)
 
+@api_view(["GET", "POST"])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def analyze_rfp_stream(request):
+    """
+    Analyze the RFP like analyze/, but stream each schema section to the
+    client as server-sent events the moment it is extracted.
+
+    Emits one "section" event per section ({section, fields, seconds,
+    completed, total, context}), then a "complete" event with the merged result in
+    schema order, or an "error" event if the analysis fails. GET is accepted
+    so browsers can connect with EventSource. Stored results are replayed
+    from the database the same way analyze/ serves them, and the "complete"
+    event carries the cache_status and failed_sections.
+    """
+    import time
+    from pinecone_store import get_document_store
+    from . import analysis_cache
+    from .analysis_schema import SECTIONS
+    from .keyword_index import get_session_index
+    from .rfp_analyzer import RFPAnalyzer
+    from .streaming import iterate_async, sse_event, sse_response
+
+    params = request.data or request.query_params
+    session_id = params.get('session_id')
+    refresh = str(params.get('refresh', '')).lower() in ('1', 'true', 'yes')
+    analyzer = RFPAnalyzer(vector_store=get_document_store(session_id), keyword_index=get_session_index(session_id))
+
+    def cached_sections(entry):
+        for section in SECTIONS:
+            yield section, entry["result"][section], 0.0
+
+    def events():
+        start = time.perf_counter()
+        sections = {}
+        timings = {}
+        try:
+            document, cache_key = analysis_cache.resolve(session_id, analyzer)
+            cached = None
+            if cache_key and not refresh:
+                cached = analysis_cache.load(document.content_hash, cache_key)
+
+            if cached:
+                cache_status = "hit"
+                results = cached_sections(cached)
+            else:
+                cache_status = "bypass"
+                text = document.extracted_text if document else ""
+                results = iterate_async(lambda: analyzer.analyze_sections(text))
+
+            for section, fields, seconds in results:
+                sections[section] = fields
+                timings[section] = round(seconds, 2)
+                yield sse_event("section", {
+                    "section": section,
+                    "fields": fields,
+                    "seconds": timings[section],
+                    "completed": len(sections),
+                    "total": len(SECTIONS),
+                    "context": analyzer.last_context_stats.get(section),
+                })
+            result = {section: sections[section] for section in SECTIONS}
+            failed_sections = analyzer.last_failed_sections if not cached else []
+            if failed_sections:
+                cache_status = "incomplete"
+            elif cache_key and not cached:
+                analysis_cache.store(document, cache_key, result, timings)
+                cache_status = "refreshed" if refresh else "miss"
+            yield sse_event("complete", {
+                "success": True,
+                "result": result,
+                "timings": timings,
+                "total_seconds": round(time.perf_counter() - start, 2),
+                "session_id": session_id,
+                "cache_status": cache_status,
+                "failed_sections": failed_sections,
+                "context": analyzer.context_report() if not cached else None,
+                "pre_extracted": analyzer.last_pre_extracted if not cached else None,
+            })
+        except Exception as e:
+            import traceback
+            print(f"Error in analyze_rfp_stream: {str(e)}")
+            print(traceback.format_exc())
+            yield sse_event("error", {"error": f"Analysis failed: {str(e)}"})
+
+    return sse_response(events())
+
 @api_view(["POST"])
-def generate_bid_matrix(request, doc_id):
+@parser_classes([MultiPartParser])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def analyze_batch(request):
     """
-    Generate a bid matrix based on an RFP document.
+    Ingest and analyze many RFPs in one request: upload PDFs or zip archives
+    of PDFs as "files". Each PDF gets its own session, so it can be chatted
+    with or re-analyzed afterwards like any other upload.
+
+    PDFs flow through a pipeline of stages (extracting, embedding, indexing,
+    analyzing), each with its own concurrency limit, so all stages are busy
+    at once; see batch.py. Results stream back as server-sent events: a
+    "batch" event listing the accepted files, a "document" event per PDF as
+    soon as it finishes ({index, file_name, status, session_id, document_id,
+    cache, timings, result, ...}), then a "complete" event with per-stage
+    stats. Pass "analyze": false to only ingest.
     """
-    result = async_to_sync(analyzer.generate_bid_matrix)({"doc_id": doc_id})
-    return JsonResponse({"matrix": result})
+    import shutil
+    import tempfile
+    import time
+    from .batch import BatchError, batch_settings, build_pipeline, spool_batch
+    from .streaming import sse_event, sse_response
+
+    limits = batch_settings()
+    uploaded_files = request.FILES.getlist('files') or request.FILES.getlist('file')
+    if not uploaded_files:
+        return JsonResponse({"error": "No files provided"}, status=400)
+    analyze_documents = str(request.data.get('analyze', 'true')).lower() in ('1', 'true', 'yes')
+
+    batch_dir = tempfile.mkdtemp(prefix="rfp-batch-", dir=settings.FILE_UPLOAD_TEMP_DIR)
+    streaming = False
+    try:
+        items = spool_batch(uploaded_files, batch_dir, limits["max_files"], limits["max_archive_bytes"])
+        pipeline = build_pipeline(analyze_documents, limits)
+        streaming = True
+    except BatchError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    finally:
+        # Once streaming, the response's generator removes the directory
+        if not streaming:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    def events():
+        start = time.perf_counter()
+        try:
+            yield sse_event("batch", {
+                "total": len(items),
+                "files": [item.file_name for item in items],
+                "stages": {stage.name: stage.concurrency for stage in pipeline.stages},
+                "max_in_flight": pipeline.max_in_flight,
+            })
+            succeeded = 0
+            for completed, item in enumerate(pipeline.run(items), start=1):
+                succeeded += not item.error
+                yield sse_event("document", dict(item.report(), completed=completed, total=len(items)))
+            yield sse_event("complete", {
+                "success": True,
+                "total": len(items),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded,
+                "total_seconds": round(time.perf_counter() - start, 2),
+                "stages": pipeline.stats,
+            })
+        except Exception as e:
+            import traceback
+            print(f"Error in analyze_batch: {str(e)}")
+            print(traceback.format_exc())
+            yield sse_event("error", {"error": f"Batch analysis failed: {str(e)}"})
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
 
-@api_view(["GET"])
-def download_matrix(request, doc_id):
+    return sse_response(events())
+
+@api_view(["POST"])
+def invalidate_analysis_cache(request):
     """
-    Download the bid matrix as an Excel file.
+    Drop stored analyses so the next analyze/ call re-runs the LLM. Pass a
+    session_id or content_hash to invalidate one PDF, or "all": true for
+    every document.
     """
-    import io
-    import pandas as pd
-
-    data = {
-        "Requirement": [],
-        "Priority": [],
-        "Complexity": [],
-        "Status": [],
-        "Assigned To": [],
-        "Notes": [],
-    }
-    df = pd.DataFrame(data)
-    excel_buffer = io.BytesIO()
-    df.to_excel(excel_buffer, index=False)
-    excel_buffer.seek(0)
-
-    response = HttpResponse(
-        excel_buffer.read(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response["Content-Disposition"] = f"attachment; filename=bid_matrix_{doc_id}.xlsx"
-    return response
+    from . import analysis_cache
+
+    try:
+        content_hash = request.data.get('content_hash')
+        session_id = request.data.get('session_id')
+        if session_id and not content_hash:
+            document = analysis_cache.get_session_document(session_id)
+            if document is None:
+                return JsonResponse({"error": "No document found for session"}, status=404)
+            content_hash = document.content_hash
+        if not content_hash and not request.data.get('all'):
+            return JsonResponse({"error": "Provide session_id, content_hash or all"}, status=400)
+
+        invalidated = analysis_cache.invalidate(content_hash or None)
+        return JsonResponse({
+            "success": True,
+            "invalidated_documents": invalidated,
+        })
+
+    except Exception as e:
+        print(f"Error in invalidate_analysis_cache: {str(e)}")
+        return JsonResponse({
+            "error": f"Failed to invalidate analysis cache: {str(e)}"
+        }, status=500)
+
+def _analysis_for_export(data):
+    """
+    Return (label, document, result) for the analysis an export or matrix is
+    built from: "rfpData" as the client holds it, or the latest stored
+    analysis of "doc_id" or of the PDF last uploaded in "session_id". Raises
+    LookupError when there is nothing to build from.
+    """
+    from . import analysis_cache
+
+    rfp_data = data.get('rfpData')
+    if rfp_data:
+        return "Current RFP", None, rfp_data
+
+    doc_id = data.get('doc_id')
+    if doc_id:
+        document = RFPDocument.objects.defer("extracted_text").filter(pk=doc_id).first()
+    else:
+        document = analysis_cache.get_session_document(data.get('session_id'))
+    if document is None:
+        raise LookupError("No document found; pass rfpData, doc_id or session_id")
+    entry = analysis_cache.latest_entry(document)
+    if entry is None:
+        raise LookupError(f"Document {document.pk} has not been analyzed yet")
+    return os.path.basename(document.file.name), document, entry["result"]
+
+@api_view(["POST"])
+def generate_bid_matrix(request, doc_id=None):
+    """
+    Generate a bid matrix from an RFP's analysis: "rfpData", or the latest
+    stored analysis of the document (doc_id in the URL or body) or session.
+    """
+    data = dict(request.data.items(), doc_id=doc_id) if doc_id else request.data
+    try:
+        _, _, result = _analysis_for_export(data)
+    except LookupError as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    matrix = async_to_sync(get_analyzer().generate_bid_matrix)(result)
+    return JsonResponse({"matrix": matrix})
+
+@api_view(["GET", "POST"])
+def download_matrix(request, doc_id=None):
+    """
+    Download the bid matrix as an Excel file, streamed as it is written.
+    Takes the same inputs as matrix/: doc_id in the URL, or doc_id,
+    session_id (query string or body) or rfpData (body).
+    """
+    from .exports import write_matrix, xlsx_response
+
+    data = request.data if request.method == "POST" else request.query_params
+    if doc_id:
+        data = dict(data.items(), doc_id=doc_id)
+    try:
+        _, document, result = _analysis_for_export(data)
+    except LookupError as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    matrix = async_to_sync(get_analyzer().generate_bid_matrix)(result)
+    filename = f"bid_matrix_{document.pk}.xlsx" if document else "bid_matrix.xlsx"
+    return xlsx_response(lambda workbook: write_matrix(workbook, matrix), filename)
 
 @api_view(['POST'])
 def chat_with_rfp(request):
     """
     Endpoint to chat with all RFP documents in the index
     """
+    from .rfp_chatbot import RFPChatbot
+
     try:
         print("Chat endpoint called")
         print(f"Request data: {request.data}")
@@ -296,7 +565,7 @@ def chat_with_rfp(request):
         try:
             # Initialize chatbot without analysis_id
             print("Initializing chatbot")
-            chatbot = RFPChatbot()
+            chatbot = RFPChatbot(session_id=request.data.get('session_id'))
             
             # Get response
             print("Getting response from chatbot")
@@ -328,190 +597,199 @@ def chat_with_rfp(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-@api_view(["GET"])
-def compare_indexes(request):
-    """Compare documents in uswebbid against rfp-index for similarity."""
+@api_view(["GET", "POST"])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def chat_stream(request):
+    """
+    Answer a chat question like chat/, streaming the answer as server-sent
+    events while the model writes it.
+
+    Emits "token" events ({text}) as pieces of the answer arrive, then one
+    "complete" event with the full answer and debug_info (num_matches,
+    context_length, cache and timings, including first_token: seconds from
+    the request to the first token), or an "error" event. GET is accepted so
+    browsers can connect with EventSource.
+    """
+    from .rfp_chatbot import RFPChatbot
+    from .streaming import sse_event, sse_response
+
+    params = request.data or request.query_params
+    question = params.get('question')
+    if not question:
+        return Response({"error": "Question is required"}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
-        # Initialize Pinecone
-        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        
-        # Get both indexes
-        uswebbid = pc.Index("paidmediabids")
-        rfp = pc.Index("rfpupload")
-        
-        # Get vectors from rfp-index
-        rfp_response = rfp.query(
-            vector=[1.0] * 1536,
-            top_k=400,
-            include_values=True,
-            include_metadata=True,
-            namespace="default"
-        ).to_dict()
-
-        # Get the first vector from rfp-index results
-        if rfp_response.get('matches'):
-            rfp_vector = rfp_response['matches'][0]['values']
-            
-            # Use this vector to query uswebbid
-            uswebbid_response = uswebbid.query(
-                vector=rfp_vector,
-                top_k=400,
-                include_values=True,
-                include_metadata=True,
-                namespace="default"
-            ).to_dict()
-            
-            # Calculate average similarity score
-            scores = [match['score'] for match in uswebbid_response.get('matches', [])]
-            average_similarity = sum(scores) / len(scores) if scores else 0
-            
-            return JsonResponse({
-                'success': True,
-                'similarity_score': round(average_similarity, 4),
-                'total_documents_compared': len(scores)
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': 'No vectors found in rfpupload index'
-            })
+        chatbot = RFPChatbot(session_id=params.get('session_id'))
+    except Exception as e:
+        print(f"Error in chat_stream: {str(e)}")
+        return Response(
+            {"error": f"Failed to process chat request: {str(e)}", "success": False},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    def events():
+        for event, data in chatbot.stream_response(question):
+            yield sse_event(event, data)
+
+    return sse_response(events())
+
+@api_view(["GET", "POST"])
+def chat_answer_cache(request):
+    """
+    GET: hit rate and entry counts of the chat answer cache, optionally for
+    one session_id. POST: drop cached answers for a session_id, or "all": true.
+    """
+    from .answer_cache import get_answer_cache
+
+    try:
+        cache = get_answer_cache()
+        if request.method == "GET":
+            return JsonResponse({"success": True, **cache.stats(request.query_params.get('session_id'))})
+
+        session_id = request.data.get('session_id')
+        if not session_id and not request.data.get('all'):
+            return JsonResponse({"error": "Provide session_id or all"}, status=400)
+        invalidated = cache.invalidate(session_id, all_sessions=bool(request.data.get('all')))
+        return JsonResponse({"success": True, "invalidated_answers": invalidated})
 
     except Exception as e:
-        print(f"Error: {str(e)}")
+        print(f"Error in chat_answer_cache: {str(e)}")
         return JsonResponse({
-            'success': False,
-            'error': str(e)
+            "error": f"Failed to access the answer cache: {str(e)}"
         }, status=500)
 
-@api_view(["POST"])  # Change to POST to receive data
-def download_report(request):
-    """Download the RFP analysis as an Excel report."""
+@api_view(["GET"])
+def compare_indexes(request):
+    """
+    Compare the session's RFP against the historical bid corpus (paidmediabids).
+
+    Uses the fingerprint stored when the RFP was ingested and the cached
+    corpus matrix, so no vectors are fetched from Pinecone per request.
+    Returns the closest past bids and an aggregate similarity_score.
+    Without a session_id the most recently uploaded RFP is compared.
+    """
+    import time
+    from .analysis_cache import get_session_document
+    from .similarity import CorpusNotBuiltError, compare_to_corpus, get_corpus, get_fingerprint
+
     try:
-        print("Starting report generation...")
-        
-        # Get the RFP data from the request
-        rfp_data = request.data.get('rfpData', {})
-        print(f"Received RFP data: {rfp_data}")  # Debug log
+        top_n = int(request.query_params.get('top_n', 10))
+    except ValueError:
+        top_n = 0
+    if top_n < 1:
+        return JsonResponse({
+            'success': False,
+            'error': 'top_n must be a positive integer'
+        }, status=400)
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "RFP Analysis Report"
+    try:
+        start = time.perf_counter()
+        session_id = request.query_params.get('session_id')
 
-        # Add title and date
-        ws['A1'] = "RFP Analysis Report"
-        ws['A2'] = f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        ws.merge_cells('A1:F1')
-        ws.merge_cells('A2:F2')
-        
-        current_row = 4
+        if session_id:
+            document = get_session_document(session_id)
+        else:
+            document = RFPDocument.objects.exclude(content_hash="").order_by("-uploaded_at", "-id").first()
+        if document is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'No uploaded RFP found to compare'
+            }, status=404)
 
-        def add_section(title, data):
-            nonlocal current_row
-            try:
-                # Add section title
-                ws.cell(row=current_row, column=1, value=title)
-                ws.merge_cells(f'A{current_row}:F{current_row}')
-                current_row += 1
-
-                # Add data
-                if isinstance(data, dict):
-                    for key, value in data.items():
-                        ws.cell(row=current_row, column=1, value=str(key).replace('_', ' ').title())
-                        ws.cell(row=current_row, column=2, value=str(value))
-                        current_row += 1
-                
-                current_row += 1
-            except Exception as e:
-                print(f"Error in add_section for {title}: {str(e)}")
-                raise
-
-        # Map the sections to the RFP data structure
-        sections = {
-            "Strategic Summary": rfp_data.get('strategic_summary', {}),
-            "Introduction/Background": rfp_data.get('introduction/background', {}),
-            "Bid Summary": rfp_data.get('bid_summary', {}),
-            "Key Dates": rfp_data.get('key_dates', {}),
-            "Work Portfolio": rfp_data.get('work_portfolio', {}),
-            "Requirements": rfp_data.get('requirements', {}),
-            "Website Details": rfp_data.get('website_details', {}),
-            "Commercials": rfp_data.get('commercials', {}),
-            "Flags": rfp_data.get('flags', {})
-        }
-
-        for section_title, section_data in sections.items():
-            print(f"Processing section: {section_title}")
-            add_section(section_title, section_data)
-
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=rfp_analysis_report.xlsx'
+        fingerprint = get_fingerprint(document.content_hash)
+        if fingerprint is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'No embeddings found for this RFP; upload it again'
+            }, status=404)
 
-        wb.save(response)
-        print("Report generated successfully")
-        return response
+        comparison = compare_to_corpus(fingerprint, get_corpus(), top_n=top_n)
+        return JsonResponse({
+            'success': True,
+            **comparison,
+            'document': document.file.name,
+            'seconds': round(time.perf_counter() - start, 4),
+        })
 
+    except CorpusNotBuiltError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=503)
     except Exception as e:
-        print(f"Error generating report: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        print(f"Error: {str(e)}")
         return JsonResponse({
             'success': False,
             'error': str(e)
         }, status=500)
 
+@api_view(["POST"])
+def download_report(request):
+    """
+    Download RFP analyses as an Excel report, streamed as it is written.
+
+    Send "rfpData" for the analysis on screen, or report on stored analyses
+    with "doc_ids", "session_ids" or "all": true. The report has a Summary
+    sheet with one row per RFP and a Details sheet with every field's value,
+    confidence and whether it was interpreted. Documents are read from the
+    database one at a time, so reports over hundreds of RFPs use bounded
+    memory; documents never analyzed are left out.
+    """
+    from . import analysis_cache
+    from .exports import write_report, xlsx_response
+
+    rfp_data = request.data.get('rfpData')
+    if rfp_data:
+        return xlsx_response(
+            lambda workbook: write_report(workbook, [("Current RFP", None, rfp_data)]),
+            "rfp_analysis_report.xlsx",
+        )
+
+    documents = RFPDocument.objects.exclude(content_hash="")
+    if request.data.get('doc_ids'):
+        documents = documents.filter(pk__in=request.data['doc_ids'])
+    elif request.data.get('session_ids'):
+        documents = documents.filter(session_id__in=request.data['session_ids'])
+    elif not request.data.get('all'):
+        return JsonResponse({"error": "Provide rfpData, doc_ids, session_ids or all"}, status=400)
+    if not documents.exists():
+        return JsonResponse({"error": "No documents found"}, status=404)
+
+    def analyses():
+        rows = documents.only("id", "file", "uploaded_at", "content_hash", "analysis_results")
+        for document in rows.order_by("uploaded_at", "id").iterator(chunk_size=50):
+            entry = analysis_cache.latest_entry(document)
+            if entry is not None:
+                uploaded = document.uploaded_at.strftime('%Y-%m-%d %H:%M')
+                yield os.path.basename(document.file.name), uploaded, entry["result"]
+
+    filename = f"rfp_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return xlsx_response(lambda workbook: write_report(workbook, analyses()), filename)
+
 @api_view(["POST"])
 def cleanup_session(request):
     """Clean up a session's resources."""
+    from pinecone_store import get_session_namespace, delete_session
+    from .answer_cache import invalidate_session
+    from .keyword_index import delete_session_index
+
     try:
         session_id = request.data.get('session_id')
         if not session_id:
             return JsonResponse({"error": "No session ID provided"}, status=400)
         
-        # Get the index name for this session
-        index_name = get_session_index_name(session_id)
-        print(f"Cleaning up session {session_id}, index name: {index_name}")
-        
-        # SAFETY CHECK: Only delete if it's a session index
-        # This prevents deletion of static indexes
-        if index_name.startswith(f"{index_name_base}-") and index_name != index_name_base:
-            print(f"Index {index_name} is a session index, checking if it exists...")
-            
-            # List all indexes to check if this one exists
-            existing_indexes = pc.list_indexes().names()
-            print(f"Existing indexes: {existing_indexes}")
-            
-            if index_name in existing_indexes:
-                # Check if the index is protected
-                protected_indexes = getattr(settings, 'PROTECTED_INDEXES', [])
-                print(f"Protected indexes: {protected_indexes}")
-                
-                if index_name in protected_indexes:
-                    print(f"Index {index_name} is protected, not deleting")
-                    return JsonResponse({
-                        "error": "Cannot delete protected index",
-                        "message": f"Index {index_name} is protected"
-                    }, status=403)
-                else:
-                    print(f"Deleting index {index_name}")
-                    pc.delete_index(index_name)
-                    return JsonResponse({
-                        "success": True,
-                        "message": f"Session {session_id} cleaned up successfully"
-                    })
-            else:
-                print(f"Index {index_name} not found in existing indexes")
-                return JsonResponse({
-                    "success": True,
-                    "message": f"No index found for session {session_id}"
-                })
-        else:
-            print(f"Index {index_name} is not a session index, not deleting")
-            return JsonResponse({
-                "error": "Cannot delete non-session index",
-                "message": f"Index {index_name} appears to be a static index"
-            }, status=403)
+        # Sessions are namespaces of the shared session index, so cleaning up
+        # never deletes an index and cannot touch the static ones.
+        namespace = get_session_namespace(session_id)
+        print(f"Cleaning up session {session_id}, namespace: {namespace}")
+        delete_session(session_id)
+        delete_session_index(session_id)
+        invalidate_session(session_id)
+
+        return JsonResponse({
+            "success": True,
+            "message": f"Session {session_id} cleaned up successfully"
+        })
             
     except Exception as e:
         import traceback
@@ -0,0 +1,37 @@
+import time
+import pinecone_store
+from .components import get_component_pool
+from .embedding_cache import get_embedding_cache
+from .retrieval_queries import get_query_embeddings
+
+
+def warm_up():
+    """
+    Build this process's long-lived clients and caches before it serves
+    requests. Nothing is created at import time, so pre-fork servers should
+    call this once per worker after forking, e.g. in gunicorn.conf.py:
+
+        def post_fork(server, worker):
+            from rfp.warmup import warm_up
+            warm_up()
+
+    Returns how long each step took, in seconds.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    pinecone_store.warm_up()
+    timings["vector_store"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    get_embedding_cache()
+    timings["embedding_cache"] = round(time.perf_counter() - start, 3)
+
+    timings["components"] = get_component_pool().warm_up()
+
+    start = time.perf_counter()
+    get_query_embeddings()
+    timings["query_embeddings"] = round(time.perf_counter() - start, 3)
+
+    print(f"Warm-up finished: {timings}")
+    return timings
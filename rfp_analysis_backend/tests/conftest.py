@@ -0,0 +1,32 @@
+"""
+Test setup: Django settings with the in-memory session backend, a fake
+OpenAI key and every on-disk cache in a temporary directory, so tests never
+touch the network or the development caches.
+"""
+import os
+import tempfile
+
+_cache_dir = tempfile.mkdtemp(prefix="rfp-tests-")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ["VECTOR_STORE_BACKEND"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+for name, path in (("INGESTION_CACHE_DIR", "ingestion"), ("EMBEDDING_CACHE_PATH", "embeddings.sqlite3"),
+                   ("ANSWER_CACHE_PATH", "answers.sqlite3"), ("KEYWORD_INDEX_DIR", "keyword_index"),
+                   ("SIMILARITY_DIR", "similarity"), ("QUERY_EMBEDDINGS_DIR", "query_embeddings")):
+    os.environ[name] = os.path.join(_cache_dir, path)
+
+import django  # noqa: E402
+
+django.setup()
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def db():
+    """A test database with migrations applied, shared by the whole run."""
+    from django.test.utils import setup_databases, teardown_databases
+
+    databases = setup_databases(verbosity=0, interactive=False)
+    yield
+    teardown_databases(databases, verbosity=0)
@@ -0,0 +1,52 @@
+import json
+import pytest
+from django.test import Client, override_settings
+from rfp import rfp_analyzer
+from rfp.analysis_schema import SECTIONS
+from rfp.components import get_component_pool
+from rfp.models import RFPDocument
+from rfp.rfp_analyzer import RFPAnalyzer
+
+
+class FailingLLM:
+    def run(self, prompt):
+        raise RuntimeError("insufficient_quota")
+
+
+class PromptBuilder:
+    def run(self, **kwargs):
+        return {"prompt": "prompt"}
+
+
+@pytest.fixture
+def llm_outage(db, monkeypatch):
+    monkeypatch.setattr(rfp_analyzer, "retrieve_for_section", lambda *args: [])
+    monkeypatch.setattr(RFPAnalyzer, "_build_components", lambda self: {
+        "retriever": None, "search_executor": None, "section_executor": get_component_pool().section_executor,
+        "prompt_builder": PromptBuilder(), "llm": FailingLLM(),
+    })
+    RFPDocument.objects.filter(session_id="outage").delete()
+    document = RFPDocument.objects.create(file="rfp.pdf", content_hash="b" * 64, session_id="outage")
+    with override_settings(ANALYSIS_SECTION_RETRIES=0, PRE_EXTRACTION=False):
+        yield document
+
+
+def test_an_analysis_with_failed_sections_is_not_stored(llm_outage):
+    for _ in range(2):
+        response = Client().post("/api/rfp/analyze/", {"session_id": "outage"}, content_type="application/json")
+        body = response.json()
+        assert body["cache_status"] == "incomplete"
+        assert sorted(body["failed_sections"]) == sorted(SECTIONS)
+    llm_outage.refresh_from_db()
+    assert llm_outage.analysis_results == {}
+
+
+def test_the_stream_reports_failed_sections_and_stores_nothing(llm_outage):
+    response = Client().get("/api/rfp/analyze/stream/", {"session_id": "outage"})
+    events = b"".join(response.streaming_content).decode().strip().split("\n\n")
+    complete = json.loads(events[-1].split("data: ", 1)[1])
+    assert events[-1].startswith("event: complete")
+    assert complete["cache_status"] == "incomplete"
+    assert sorted(complete["failed_sections"]) == sorted(SECTIONS)
+    llm_outage.refresh_from_db()
+    assert llm_outage.analysis_results == {}
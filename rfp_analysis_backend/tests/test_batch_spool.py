@@ -0,0 +1,51 @@
+import io
+import zipfile
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rfp.batch import BatchError, spool_batch
+
+
+def archive(**members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def spool(tmp_path, name, data):
+    return spool_batch([SimpleUploadedFile(name, data)], str(tmp_path), 10, 1024 * 1024)
+
+
+def test_spools_the_pdfs_inside_an_archive(tmp_path):
+    items = spool(tmp_path, "rfps.zip", archive(**{"b.pdf": b"%PDF-b", "a.pdf": b"%PDF-a", "notes.txt": b"x"}))
+    assert [item.file_name for item in items] == ["a.pdf", "b.pdf"]
+    assert open(items[0].path, "rb").read() == b"%PDF-a"
+
+
+def test_rejects_a_file_that_is_not_a_zip(tmp_path):
+    with pytest.raises(BatchError, match="not a valid zip"):
+        spool(tmp_path, "rfps.zip", b"not a zip")
+
+
+def test_rejects_a_corrupt_member(tmp_path):
+    data = bytearray(archive(**{"a.pdf": b"%PDF-" + b"x" * 1000}))
+    # Flip a byte of the compressed data, after the 30-byte local header and the name
+    data[30 + len("a.pdf") + 2] ^= 0xFF
+    with pytest.raises(BatchError, match="Cannot read a.pdf"):
+        spool(tmp_path, "rfps.zip", bytes(data))
+
+
+def test_rejects_unsupported_compression(tmp_path):
+    data = bytearray(archive(**{"a.pdf": b"%PDF-a"}))
+    # Compression method 99 (AES) in the local header and the central directory
+    data[8:10] = (99).to_bytes(2, "little")
+    central = data.index(b"PK\x01\x02")
+    data[central + 10:central + 12] = (99).to_bytes(2, "little")
+    with pytest.raises(BatchError, match="Cannot read a.pdf"):
+        spool(tmp_path, "rfps.zip", bytes(data))
+
+
+def test_rejects_an_archive_that_unpacks_too_large(tmp_path):
+    with pytest.raises(BatchError, match="unpacks to more than"):
+        spool_batch([SimpleUploadedFile("rfps.zip", archive(**{"a.pdf": b"x" * 4096}))], str(tmp_path), 10, 1024)
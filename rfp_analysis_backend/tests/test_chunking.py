@@ -0,0 +1,81 @@
+import sys
+import pytest
+from rfp import tokens
+from rfp.chunking import TokenChunker
+from rfp.tokens import count_tokens, split_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Count tokens with the four-characters-per-token estimate, so budgets do not depend on tiktoken."""
+    monkeypatch.setattr(tokens, "get_encoding", lambda name=tokens.ENCODING_NAME: None)
+
+
+def sentences(prefix, count):
+    return " ".join(f"{prefix} sentence {number} is about the scope." for number in range(count))
+
+
+def chunk(pages, max_tokens=50, overlap_tokens=10, min_tokens=20):
+    chunker = TokenChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens, min_tokens=min_tokens)
+    return chunker.run(pages)["documents"]
+
+
+def test_chunks_never_span_pages():
+    pages = [{"page_number": 1, "text": sentences("Alpha", 7)}, {"page_number": 2, "text": sentences("Beta", 7)}]
+    documents = chunk(pages)
+    assert {doc.meta["page_number"] for doc in documents} == {1, 2}
+    for doc in documents:
+        prefix = "Alpha" if doc.meta["page_number"] == 1 else "Beta"
+        assert doc.content.startswith(prefix)
+        assert ("Beta" if prefix == "Alpha" else "Alpha") not in doc.content
+        assert count_tokens(doc.content) <= 50
+    assert [doc.meta["split_id"] for doc in documents] == list(range(len(documents)))
+
+
+def test_section_is_carried_over_to_the_next_page():
+    pages = [
+        {"page_number": 1, "text": "SECTION C - SCOPE OF WORK\n" + sentences("Alpha", 3)},
+        {"page_number": 2, "text": sentences("Beta", 3)},
+    ]
+    documents = chunk(pages)
+    assert documents[0].content.startswith("SECTION C - SCOPE OF WORK")
+    assert {doc.meta["section"] for doc in documents} == {"SECTION C - SCOPE OF WORK"}
+    assert documents[-1].meta["page_number"] == 2
+
+
+def test_overlap_stays_within_the_overlap_budget():
+    documents = chunk([{"page_number": 1, "text": sentences("Alpha", 20)}], overlap_tokens=12)
+    assert len(documents) > 2
+    def split(content):
+        return [sentence.rstrip(".") for sentence in content.split(". ")]
+
+    for previous, current in zip(documents, documents[1:]):
+        shared = [s for s in split(current.content) if s in split(previous.content)]
+        assert shared, "consecutive chunks on a page should overlap"
+        assert current.content.startswith(shared[0])
+        assert sum(count_tokens(s + ".") for s in shared) <= 12
+
+
+def test_heading_waits_for_the_chunk_to_reach_min_tokens():
+    short = chunk([{"page_number": 1, "text": "Intro words.\n1.2 Contact Information\nEmail the buyer."}])
+    assert len(short) == 1
+    assert short[0].meta["section"] == ""
+
+    long_intro = sentences("Alpha", 3)
+    documents = chunk([{"page_number": 1, "text": long_intro + "\n1.2 Contact Information\nEmail the buyer."}])
+    assert documents[-1].content == "1.2 Contact Information Email the buyer."
+    assert documents[-1].meta["section"] == "1.2 Contact Information"
+    assert "Contact Information" not in documents[0].content
+
+
+def test_token_counts_fall_back_to_an_estimate_without_tiktoken(monkeypatch):
+    monkeypatch.undo()
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    tokens.get_encoding.cache_clear()
+    try:
+        assert tokens.get_encoding() is None
+        assert count_tokens("abcdefghi") == 3
+        assert split_tokens("abcdefghij", 2) == ["abcdefgh", "ij"]
+        assert chunk([{"page_number": 1, "text": sentences("Alpha", 7)}])
+    finally:
+        tokens.get_encoding.cache_clear()
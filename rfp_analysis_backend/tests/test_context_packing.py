@@ -0,0 +1,104 @@
+import pytest
+from haystack import Document
+from rfp import tokens
+from rfp.chunking import split_sentences
+from rfp.context_packing import pack_context, render_context, sentence_tokens
+from rfp.tokens import count_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Count tokens with the four-characters-per-token estimate, so budgets do not depend on tiktoken."""
+    monkeypatch.setattr(tokens, "get_encoding", lambda name=tokens.ENCODING_NAME: None)
+    sentence_tokens.cache_clear()
+    yield
+    sentence_tokens.cache_clear()
+
+
+def sentence(number):
+    return f"Sentence {number} covers item {number} of the scope."
+
+
+def chunk(split_id, first, last, score=1.0, page=1):
+    """A chunk holding sentences first..last of the PDF."""
+    return Document(
+        id=f"chunk-{split_id}",
+        content=" ".join(sentence(number) for number in range(first, last + 1)),
+        meta={"split_id": split_id, "page_number": page},
+        score=score,
+    )
+
+
+def budget_for(doc):
+    """Tokens pack_context budgets for a chunk: each sentence plus its joining space."""
+    return sum(sentence_tokens(part) + 1 for part in split_sentences(doc.content))
+
+
+def test_neighbouring_chunks_merge_without_their_shared_sentences():
+    # Chunk 1 repeats sentence 3, the last of chunk 0, and comes back first
+    documents = [chunk(1, 3, 6, score=0.9, page=2), chunk(0, 0, 3, score=0.5, page=1)]
+    packed = pack_context(documents, max_tokens=1000)
+    assert len(packed.documents) == 1
+    passage = packed.documents[0]
+    assert passage.content == " ".join(sentence(number) for number in range(7))
+    assert passage.content.count(sentence(3)) == 1
+    assert passage.meta["split_id"] == 0
+    assert passage.meta["page_numbers"] == [1, 2]
+    assert passage.score == 0.9
+    assert packed.stats["chunks"] == 2
+    assert packed.stats["passages"] == 1
+    assert packed.stats["raw_tokens"] == count_tokens(render_context(documents))
+    assert packed.stats["saved_tokens"] > 0
+
+
+def test_chunks_that_are_not_neighbours_stay_apart_in_reading_order():
+    documents = [chunk(5, 20, 22), chunk(2, 8, 10), chunk(5, 20, 22)]
+    packed = pack_context(documents, max_tokens=1000)
+    assert [doc.meta["split_id"] for doc in packed.documents] == [2, 5]
+    assert packed.stats["passages"] == 2
+
+
+def test_chunks_without_a_split_id_stand_alone():
+    legacy = Document(id="legacy", content=sentence(3), meta={"page_number": 4})
+    packed = pack_context([legacy, chunk(0, 0, 3)], max_tokens=1000)
+    # Sentence 3 is repeated, but the legacy chunk cannot be placed next to chunk 0
+    assert [doc.content for doc in packed.documents] == [chunk(0, 0, 3).content, sentence(3)]
+
+
+def test_packing_stops_at_the_token_budget():
+    documents = [chunk(0, 0, 9), chunk(4, 40, 49)]
+    budget = budget_for(documents[0]) + 5
+    packed = pack_context(documents, max_tokens=budget)
+    # The less relevant chunk does not fit at all, and too little of it would fit to be worth sending
+    assert [doc.content for doc in packed.documents] == [documents[0].content]
+    assert packed.stats["packed_tokens"] <= budget
+    assert packed.stats["truncated_passages"] == 0
+
+
+def test_a_less_relevant_passage_is_cut_at_a_sentence_when_enough_of_it_fits():
+    documents = [chunk(0, 0, 9), chunk(4, 40, 49)]
+    budget = budget_for(documents[0]) + 60
+    packed = pack_context(documents, max_tokens=budget)
+    assert len(packed.documents) == 2
+    assert packed.documents[0].content == documents[0].content
+    cut = packed.documents[1].content
+    assert documents[1].content.startswith(cut) and cut != documents[1].content
+    assert cut.endswith("scope.")
+    assert packed.stats["truncated_passages"] == 1
+    assert packed.stats["packed_tokens"] <= budget
+
+
+def test_a_passage_over_budget_is_cut_to_its_best_ranked_chunk():
+    # Chunk 1 is the better match; the merged passage is too long to send whole
+    documents = [chunk(1, 10, 19, score=0.9), chunk(0, 0, 10, score=0.4)]
+    budget = budget_for(documents[0]) + 5
+    packed = pack_context(documents, max_tokens=budget)
+    assert [doc.content for doc in packed.documents] == [documents[0].content]
+    assert packed.stats["truncated_passages"] == 1
+    assert packed.stats["packed_tokens"] <= budget
+
+
+def test_no_budget_sends_nothing():
+    packed = pack_context([chunk(0, 0, 3)], max_tokens=0)
+    assert packed.documents == []
+    assert packed.stats["packed_tokens"] == 0
@@ -0,0 +1,36 @@
+import sqlite3
+from rfp.embedding_cache import EmbeddingCache
+
+
+def stored(cache):
+    """Entry count and vector bytes summed straight from the table."""
+    return cache._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+
+
+def test_size_total_follows_inserts_replacements_and_evictions(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_bytes=10 * 16)
+    cache.put_many("m", ["a", "b"], [[1.0] * 4, [2.0] * 4])
+    cache.put_many("m", ["a"], [[3.0] * 8])
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == stored(cache) == (2, 48)
+    assert cache.get_many("m", ["a"]) == [[3.0] * 8]
+
+    cache.put_many("m", [str(i) for i in range(10)], [[float(i)] * 4 for i in range(10)])
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"]) == stored(cache)
+    assert stats["bytes"] <= 10 * 16 * 0.9
+
+
+def test_an_existing_cache_is_summed_once_when_opened(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, "
+                 "last_used REAL NOT NULL)")
+    conn.execute("INSERT INTO embeddings VALUES ('k', 'm', ?, 0)", [b"\0" * 32])
+    conn.commit()
+    conn.close()
+
+    stats = EmbeddingCache(path).stats()
+    assert (stats["entries"], stats["bytes"]) == (1, 32)
+    stats = EmbeddingCache(path).stats()
+    assert (stats["entries"], stats["bytes"]) == (1, 32)
@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import pytest
+from django.test import override_settings
+from haystack import Document
+from rfp import ingestion_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    with override_settings(INGESTION_CACHE_DIR=str(tmp_path)):
+        yield tmp_path
+
+
+def store(key="k"):
+    pages = [{"page_number": 1, "text": "one two"}]
+    documents = [Document(content=text, embedding=[float(index), 1.0]) for index, text in enumerate(["one", "two"])]
+    ingestion_cache.store(key, pages, documents)
+    return pages, documents
+
+
+def test_round_trips_pages_and_embedded_chunks():
+    pages, documents = store()
+    cached = ingestion_cache.load("k")
+    assert cached.pages == pages
+    assert [(doc.content, doc.embedding) for doc in cached.documents] == [("one", [0.0, 1.0]), ("two", [1.0, 1.0])]
+
+
+def test_an_entry_with_fewer_vectors_than_chunks_is_a_miss_and_removed(cache_dir):
+    store()
+    np.save(cache_dir / "k" / "vectors.npy", np.ones((1, 2), dtype=np.float32))
+    assert ingestion_cache.load("k") is None
+    assert not os.path.exists(cache_dir / "k")
@@ -0,0 +1,70 @@
+import pytest
+from django.test import override_settings
+from PyPDF2.errors import PdfReadError
+from rfp import ingestion
+from rfp.jobs import claim_next_job, run_job
+from rfp.models import IngestionJob
+from rfp.pdf_extraction import NoExtractableTextError
+
+
+@pytest.fixture
+def job(db, tmp_path):
+    IngestionJob.objects.all().delete()
+    IngestionJob.objects.create(session_id="s", file_name="rfp.pdf", file_path=str(tmp_path / "source.pdf"),
+                                content_hash="0" * 64)
+    with override_settings(INGESTION_JOB_MAX_ATTEMPTS=2):
+        yield claim_next_job()
+
+
+def fail_with(monkeypatch, error):
+    def ingest_session(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(ingestion, "ingest_session", ingest_session)
+
+
+@pytest.mark.parametrize("error", [PdfReadError("EOF marker not found"), NoExtractableTextError("No text")])
+def test_an_unreadable_pdf_fails_at_once(job, monkeypatch, error):
+    fail_with(monkeypatch, error)
+    run_job(job)
+    job.refresh_from_db()
+    assert job.status == IngestionJob.FAILED
+    assert job.error.startswith("Failed to read PDF")
+
+
+@pytest.mark.parametrize("error", [ValueError("bad embedding response"), RuntimeError("timed out")])
+def test_other_errors_are_retried_until_attempts_run_out(job, monkeypatch, error):
+    fail_with(monkeypatch, error)
+    run_job(job)
+    job.refresh_from_db()
+    assert job.status == IngestionJob.QUEUED
+
+    run_job(claim_next_job())
+    job.refresh_from_db()
+    assert job.status == IngestionJob.FAILED
+    assert job.attempts == 2
+    assert job.error == str(error)
+
+
+class FakeEmbedder:
+    """Embeds every text as the same vector, handing each batch to on_batch as the real embedder does."""
+
+    def __init__(self, model=None):
+        pass
+
+    async def embed(self, texts, on_batch=None):
+        vectors = [[1.0, 0.0, 0.0] for _ in texts]
+        for start in range(0, len(vectors), 2):
+            if on_batch is not None:
+                on_batch(start, vectors[start:start + 2])
+        return vectors
+
+
+def test_a_job_records_progress_from_the_embedders_batch_callbacks(job, monkeypatch):
+    pages = [{"page_number": 1, "text": f"Job {job.id} scope of work. " * 40}]
+    monkeypatch.setattr(ingestion, "extract", lambda file_path, checkpoint_dir=None: (pages, False))
+    monkeypatch.setattr(ingestion, "ConcurrentEmbedder", FakeEmbedder)
+    run_job(job)
+    job.refresh_from_db()
+    assert job.status == IngestionJob.SUCCEEDED, job.error
+    assert job.progress["stages"]["indexing"]["status"] == "done"
+    assert job.progress["stages"]["embedding"]["embedded"] == job.progress["stages"]["indexing"]["indexed"]
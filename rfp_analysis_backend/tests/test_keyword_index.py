@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+import pytest
+from haystack import Document
+from rfp import keyword_index, rfp_chatbot
+from rfp.keyword_index import (BM25Index, build_session_index, delete_session_index, get_session_index,
+                               reciprocal_rank_fusion)
+
+CHUNKS = [
+    Document(id="number", content="Proposals must quote RFP number ACU-RFT-037 on the cover page."),
+    Document(id="contact", content="Questions go to tenders@example.edu before the closing date."),
+    Document(id="budget", content="The budget for the work is $65,000 including GST."),
+    Document(id="scope", content="The scope covers the design of the website and the design of the app."),
+]
+
+
+def ids(documents):
+    return [doc.id for doc in documents]
+
+
+@pytest.fixture
+def session_id():
+    yield "keyword-index-test"
+    delete_session_index("keyword-index-test")
+
+
+def test_exact_strings_and_their_parts_match():
+    index = BM25Index(CHUNKS)
+    assert ids(index.search("ACU-RFT-037")) == ["number"]
+    assert ids(index.search("what is 037")) == ["number"]
+    assert ids(index.search("tenders@example.edu")) == ["contact"]
+    assert ids(index.search("$65,000")) == ["budget"]
+
+
+def test_documents_sharing_no_term_are_left_out():
+    assert BM25Index(CHUNKS).search("the of and") == []
+    assert BM25Index(CHUNKS).search("insurance") == []
+    assert BM25Index([]).search("budget") == []
+
+
+def test_more_occurrences_score_higher_and_scores_are_set():
+    index = BM25Index(CHUNKS + [
+        Document(id="once", content="Design notes for the portal and the intranet."),
+        Document(id="twice", content="Design notes for the portal design and intranet."),
+    ])
+    results = index.search("design")
+    scores = {doc.id: doc.score for doc in results}
+    assert set(scores) == {"once", "twice", "scope"}
+    assert scores["twice"] > scores["once"] > 0
+    assert [doc.score for doc in results] == sorted(scores.values(), reverse=True)
+    # Searches return copies; the indexed documents keep no score
+    assert all(doc.score is None for doc in index.documents)
+
+
+def test_top_k_keeps_the_best_documents():
+    index = BM25Index(CHUNKS)
+    everything = index.search("budget design rfp questions", top_k=10)
+    assert len(everything) == 4
+    assert index.search("budget design rfp questions", top_k=2) == everything[:2]
+
+
+def test_fusion_favours_documents_ranked_by_both_lists():
+    a, b, c = (Document(id=name, content=name) for name in "abc")
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], k=60)
+    assert ids(fused) == ["b", "a", "c"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 62)
+    assert fused[1].score == pytest.approx(1 / 61)
+
+
+def test_fusion_orders_by_summed_reciprocal_rank_and_truncates():
+    a, b, c, d = (Document(id=name, content=name) for name in "abcd")
+    fused = reciprocal_rank_fusion([[a, b, c], [d, c, a]], k=1, top_k=3)
+    # a: 1/2 + 1/4, c: 1/4 + 1/3, d: 1/2, b: 1/3
+    assert ids(fused) == ["a", "c", "d"]
+    assert [doc.score for doc in fused] == pytest.approx([3 / 4, 7 / 12, 1 / 2])
+
+
+def test_session_index_is_saved_and_reloaded(session_id):
+    assert get_session_index(session_id) is None
+    built = build_session_index(session_id, CHUNKS)
+    assert get_session_index(session_id) is built
+
+    # Another process only sees the file
+    keyword_index._indexes.clear()
+    reloaded = get_session_index(session_id)
+    assert reloaded is not built
+    assert [doc.content for doc in reloaded.documents] == [doc.content for doc in CHUNKS]
+    assert ids(reloaded.search("ACU-RFT-037")) == ids(built.search("ACU-RFT-037"))
+
+    delete_session_index(session_id)
+    assert get_session_index(session_id) is None
+
+
+def test_session_index_is_reloaded_after_another_process_rebuilds_it(session_id):
+    stale = build_session_index(session_id, CHUNKS)
+    path = keyword_index._index_path(session_id)
+    keyword_index._indexes.clear()
+    build_session_index(session_id, CHUNKS[:1])
+    # Our cached copy is older than the file
+    keyword_index._indexes[path] = (0, stale)
+    assert len(get_session_index(session_id)) == 1
+
+
+class FakeUploadsIndex:
+    def query(self, **kwargs):
+        match = SimpleNamespace(id="legacy", score=0.9, metadata={"content": "Legacy upload chunk", "page": 1})
+        return SimpleNamespace(matches=[match])
+
+
+class FakeRetriever:
+    def run(self, query_embedding):
+        return {"documents": [Document(id="vector", content="Vector match")]}
+
+
+def test_chat_without_a_session_uses_only_the_legacy_vector_matches(monkeypatch):
+    monkeypatch.setattr(rfp_chatbot, "get_uploads_index", FakeUploadsIndex)
+    # The "default" namespace has a keyword index over a different corpus
+    build_session_index(None, CHUNKS)
+    try:
+        chatbot = rfp_chatbot.RFPChatbot(client=object())
+        assert chatbot.keyword_index is None
+        documents = chatbot._retrieve([0.0], "ACU-RFT-037")
+    finally:
+        delete_session_index(None)
+    assert ids(documents) == ["legacy"]
+    assert documents[0].meta == {"page": 1}
+
+
+def test_chat_in_a_session_fuses_vector_and_keyword_matches(monkeypatch, session_id):
+    monkeypatch.setattr(rfp_chatbot, "get_embedding_retriever", lambda store, top_k: FakeRetriever())
+    build_session_index(session_id, CHUNKS)
+    documents = rfp_chatbot.RFPChatbot(session_id=session_id, client=object())._retrieve([0.0], "ACU-RFT-037")
+    assert set(ids(documents)) == {"vector", "number"}
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from haystack import Document
+from pinecone_store import EMBEDDING_DIMENSION, LocalSessionBackend
+from rfp.local_store import LocalVectorDocumentStore
+from rfp.upserts import BatchUpserter
+
+
+def documents(*contents, dimension=2):
+    return [Document(content=content, embedding=[1.0, float(index)] + [0.0] * (dimension - 2))
+            for index, content in enumerate(contents)]
+
+
+def test_upserter_persists_the_store_once(tmp_path, monkeypatch):
+    store = LocalVectorDocumentStore(path=str(tmp_path), dimension=2)
+    saves = []
+    save = store._save
+    monkeypatch.setattr(store, "_save", lambda: saves.append(1) or save())
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with BatchUpserter(store, batch_size=2, executor=executor) as upserter:
+            upserter.add(documents(*"abcdefg"))
+    assert upserter.written == 7
+    assert len(saves) == 1
+    assert LocalVectorDocumentStore(path=str(tmp_path), dimension=2).count_documents() == 7
+
+
+def test_writes_outside_an_upserter_persist_immediately(tmp_path):
+    store = LocalVectorDocumentStore(path=str(tmp_path), dimension=2)
+    store.write_documents(documents("a", "b"))
+    assert LocalVectorDocumentStore(path=str(tmp_path), dimension=2).count_documents() == 2
+
+
+def test_get_store_reloads_a_store_saved_by_another_process(tmp_path):
+    ours, theirs = LocalSessionBackend(base_dir=str(tmp_path)), LocalSessionBackend(base_dir=str(tmp_path))
+    ours.get_store("s").write_documents(documents("a", dimension=EMBEDDING_DIMENSION))
+    assert ours.get_store("s") is ours.get_store("s")
+
+    theirs.get_store("s").write_documents(documents("b", "c", dimension=EMBEDDING_DIMENSION))
+    assert ours.get_store("s").count_documents() == 3
+
+    theirs.clear("s")
+    assert ours.get_store("s").count_documents() == 0
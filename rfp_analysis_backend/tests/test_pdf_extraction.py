@@ -0,0 +1,30 @@
+import os
+import pytest
+from rfp import pdf_extraction
+from rfp.pdf_extraction import NoExtractableTextError, extract_pages, run_in_pool
+
+
+def crash_once(marker):
+    """Kill the worker process the first time it runs, breaking its pool."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def test_an_empty_file_has_no_extractable_text(tmp_path):
+    path = tmp_path / "empty.pdf"
+    path.write_bytes(b"")
+    with pytest.raises(NoExtractableTextError):
+        extract_pages(str(path))
+
+
+def test_a_broken_pool_is_replaced_and_the_calls_retried(tmp_path):
+    workers = 3
+    first = pdf_extraction.get_extraction_pool(workers)
+    try:
+        assert run_in_pool(workers, crash_once, [(str(tmp_path / "marker"),)]) == ["ok"]
+        assert pdf_extraction.get_extraction_pool(workers) is not first
+    finally:
+        pdf_extraction.get_extraction_pool(workers).shutdown()
+        pdf_extraction._pools.pop(workers, None)
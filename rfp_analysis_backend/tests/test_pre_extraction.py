@@ -0,0 +1,57 @@
+from rfp.pre_extraction import pre_extract
+
+
+def key_dates(text):
+    return pre_extract(text).get("key_dates", {})
+
+
+def test_time_in_previous_sentence_is_not_attached():
+    dates = key_dates("Proposals are due by 3:00 PM on March 5, 2025. Questions due February 20, 2025.")
+    assert dates["submission_deadline"]["value"] == "March 5, 2025, 3:00 PM"
+    assert dates["clarifications_deadline"] == {
+        "value": "February 20, 2025", "confidence": 0.9, "is_interpreted": False,
+    }
+
+
+def test_time_in_own_sentence_is_attached_without_full_stop():
+    dates = key_dates("Proposals due March 5, 2025 at 2:00 PM. Questions due February 20, 2025 by 10:00 AM.")
+    assert dates["submission_deadline"]["value"] == "March 5, 2025, 2:00 PM"
+    assert dates["clarifications_deadline"]["value"] == "February 20, 2025, 10:00 AM"
+
+
+def test_time_before_label_in_same_sentence_is_attached():
+    dates = key_dates("Questions are due by 10:00 AM on February 20, 2025. Proposals are due March 5, 2025.")
+    assert dates["clarifications_deadline"]["value"] == "February 20, 2025, 10:00 AM"
+    assert dates["submission_deadline"]["value"] == "March 5, 2025"
+
+
+def test_abbreviated_meridiem_keeps_its_dots():
+    dates = key_dates("Questions due February 20, 2025 at 10:00 a.m.\n\nMore details follow.")
+    assert dates["clarifications_deadline"]["value"] == "February 20, 2025, 10:00 a.m."
+
+
+def test_conflicting_dates_are_left_to_the_llm():
+    dates = key_dates("Questions due February 20, 2025.\n\nClarifications close March 1, 2025.")
+    assert "clarifications_deadline" not in dates
+
+
+def test_ambiguous_numeric_date_is_left_to_the_llm():
+    assert "submission_deadline" not in key_dates("Closing date: 03/04/2025")
+
+
+def budget(text):
+    return pre_extract(text).get("commercials", {}).get("budget")
+
+
+def test_budget_with_a_space_before_the_thousands_comma():
+    # As PyPDF2 extracts the Cape Cod sample RFP
+    text = "a one -time budget up of $65 ,000 has  been \nallocated for the entirety of the project."
+    assert budget(text) == {"value": "$65,000", "confidence": 0.85, "is_interpreted": False}
+
+
+def test_budget_with_a_space_before_the_decimal_point():
+    assert budget("The total budget is $1 .5 million.")["value"] == "$1.5 million"
+
+
+def test_budget_cut_short_by_stray_digits_is_left_to_the_llm():
+    assert budget("The budget is $6 5,000 for the project.") is None
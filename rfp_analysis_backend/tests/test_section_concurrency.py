@@ -0,0 +1,46 @@
+import json
+import threading
+import time
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from rfp import rfp_analyzer
+from rfp.analysis_schema import SECTIONS
+from rfp.components import get_component_pool
+from rfp.rfp_analyzer import RFPAnalyzer
+
+
+class SlowLLM:
+    """Answers every section after a pause, recording how many calls were in flight at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def run(self, prompt):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.3)
+        with self.lock:
+            self.running -= 1
+        return {"replies": [json.dumps({})]}
+
+
+class PromptBuilder:
+    def run(self, **kwargs):
+        return {"prompt": "prompt"}
+
+
+def test_every_section_runs_at_once_whatever_the_cpu_count(monkeypatch):
+    llm = SlowLLM()
+    monkeypatch.setattr(rfp_analyzer, "retrieve_for_section", lambda *args: [])
+    monkeypatch.setattr(RFPAnalyzer, "_build_components", lambda self: {
+        "retriever": None, "search_executor": None, "section_executor": get_component_pool().section_executor,
+        "prompt_builder": PromptBuilder(), "llm": llm,
+    })
+    with override_settings(PRE_EXTRACTION=False):
+        analyzer = RFPAnalyzer(vector_store=None)
+        result = async_to_sync(analyzer.analyze_rfp)("")
+    assert list(result) == list(SECTIONS)
+    assert llm.peak == len(SECTIONS)
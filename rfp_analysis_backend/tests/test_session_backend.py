@@ -0,0 +1,63 @@
+import pytest
+from haystack import Document
+import pinecone_store
+from pinecone_store import (
+    InMemorySessionBackend, delete_session, get_document_store, get_embedding_retriever, reset_document_store,
+    use_backend,
+)
+
+
+@pytest.fixture
+def backend():
+    previous = pinecone_store._backend
+    fake = InMemorySessionBackend()
+    use_backend(fake)
+    yield fake
+    use_backend(previous)
+
+
+def write(session_id, *contents):
+    get_document_store(session_id).write_documents([
+        Document(content=content, embedding=[1.0, float(index)]) for index, content in enumerate(contents)
+    ])
+
+
+def retrieve(session_id):
+    store = get_document_store(session_id)
+    documents = get_embedding_retriever(store, top_k=10).run(query_embedding=[1.0, 0.0])["documents"]
+    return sorted(doc.content for doc in documents)
+
+
+def test_use_backend_swaps_the_session_backend(backend):
+    assert pinecone_store.get_backend() is backend
+
+
+def test_retrieval_only_sees_the_sessions_own_documents(backend):
+    write("a", "alpha one", "alpha two")
+    write("b", "beta")
+    assert retrieve("a") == ["alpha one", "alpha two"]
+    assert retrieve("b") == ["beta"]
+
+
+def test_reset_clears_only_that_session(backend):
+    write("a", "alpha")
+    write("b", "beta")
+    store = reset_document_store("a")
+    assert store.count_documents() == 0
+    assert retrieve("a") == []
+    assert retrieve("b") == ["beta"]
+
+
+def test_delete_session_leaves_other_sessions(backend):
+    write("a", "alpha")
+    write("b", "beta")
+    delete_session("b")
+    assert retrieve("b") == []
+    assert retrieve("a") == ["alpha"]
+
+
+def test_sessions_without_id_use_the_default_namespace(backend):
+    write(None, "shared")
+    write("a", "alpha")
+    assert retrieve(None) == ["shared"]
+    assert retrieve("a") == ["alpha"]
@@ -0,0 +1,31 @@
+import pytest
+from django.test import Client
+from rfp import similarity
+from rfp.models import RFPDocument
+
+
+@pytest.fixture
+def no_corpus(monkeypatch, tmp_path):
+    monkeypatch.setattr(similarity, "_corpus", None)
+    monkeypatch.setattr(similarity, "get_corpus_path", lambda: str(tmp_path / "corpus.npz"))
+    monkeypatch.setattr(similarity, "refresh_corpus", lambda: pytest.fail("built the corpus in a request"))
+
+
+def test_a_missing_corpus_asks_for_the_build_command(no_corpus):
+    with pytest.raises(similarity.CorpusNotBuiltError, match="build_similarity_corpus"):
+        similarity.get_corpus()
+
+
+@pytest.mark.parametrize("top_n", ["ten", "0", "-3"])
+def test_compare_indexes_rejects_a_bad_top_n(db, top_n):
+    response = Client().get("/api/rfp/compare-indexes/", {"top_n": top_n})
+    assert response.status_code == 400
+    assert "top_n" in response.json()["error"]
+
+
+def test_compare_indexes_without_a_corpus_is_unavailable(db, no_corpus, monkeypatch):
+    RFPDocument.objects.create(file="rfp.pdf", content_hash="a" * 64, session_id="s", extracted_text="text")
+    monkeypatch.setattr(similarity, "get_fingerprint", lambda content_hash: object())
+    response = Client().get("/api/rfp/compare-indexes/", {"session_id": "s"})
+    assert response.status_code == 503
+    assert "build_similarity_corpus" in response.json()["error"]
@@ -0,0 +1,66 @@
+"""
+Import-time budget: loading the app must stay fast and offline.
+
+Each check runs in a fresh interpreter with no API keys and an unreachable
+proxy, so any network call during startup fails loudly. Loading the URLconf
+(and with it rfp.views) must not import the heavy client libraries, and
+`manage.py check` and importing pinecone_store must finish within
+STARTUP_BUDGET_SECONDS (median of a few runs).
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 2.0))
+RUNS = 3
+
+# Must only be imported once a request needs them
+DEFERRED_MODULES = ["haystack", "haystack_integrations", "pinecone", "openai", "openpyxl"]
+
+LOAD_URLCONF = f"""
+import os, sys
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+import django
+django.setup()
+import config.urls
+import rfp.views
+loaded = [name for name in {DEFERRED_MODULES!r} if name in sys.modules]
+if loaded:
+    sys.exit("Imported at startup: " + ", ".join(loaded))
+"""
+
+
+def offline_env():
+    env = dict(os.environ)
+    for key in ("PINECONE_API_KEY", "PINECONE_ENV", "OPENAI_API_KEY", "DJANGO_SETTINGS_MODULE"):
+        env.pop(key, None)
+    # Anything that tries to reach the network at startup goes nowhere
+    env.update({"HTTP_PROXY": "http://127.0.0.1:9", "HTTPS_PROXY": "http://127.0.0.1:9", "NO_PROXY": ""})
+    return env
+
+
+def median_seconds(command):
+    durations = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=BACKEND_DIR, env=offline_env(), capture_output=True, text=True)
+        durations.append(time.perf_counter() - start)
+        assert result.returncode == 0, result.stderr
+    return statistics.median(durations)
+
+
+def test_urlconf_defers_client_libraries():
+    result = subprocess.run([sys.executable, "-c", LOAD_URLCONF], cwd=BACKEND_DIR, env=offline_env(),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_manage_py_check_within_budget():
+    assert median_seconds([sys.executable, "manage.py", "check"]) <= BUDGET_SECONDS
+
+
+def test_pinecone_store_import_within_budget():
+    assert median_seconds([sys.executable, "-c", "import pinecone_store"]) <= BUDGET_SECONDS
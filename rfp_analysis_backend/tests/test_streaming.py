@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+import pytest
+from django.test import Client
+from haystack import Document
+from rfp import rfp_chatbot
+from rfp.answer_cache import get_answer_cache
+from rfp.streaming import iterate_async, sse_event, sse_response
+
+SESSION_ID = "streaming-test"
+
+
+def parse_events(body):
+    """(event, data) for each SSE message in a response body."""
+    events = []
+    for message in body.decode().split("\n\n"):
+        if not message:
+            continue
+        event, data = message.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_sse_event_frames_one_json_message():
+    assert sse_event("token", {"text": "a\nb"}) == 'event: token\ndata: {"text": "a\\nb"}\n\n'
+
+
+def test_sse_response_streams_the_events_unbuffered():
+    response = sse_response(iter([sse_event("token", {"text": "a"}), sse_event("complete", {})]))
+    assert response["Content-Type"] == "text/event-stream"
+    assert response["Cache-Control"] == "no-cache"
+    assert response["X-Accel-Buffering"] == "no"
+    assert parse_events(b"".join(response.streaming_content)) == [("token", {"text": "a"}), ("complete", {})]
+
+
+def test_iterate_async_yields_the_generators_items_in_order():
+    async def numbers():
+        for number in range(5):
+            await asyncio.sleep(0)
+            yield number
+
+    assert list(iterate_async(numbers)) == [0, 1, 2, 3, 4]
+
+
+def test_iterate_async_reraises_the_generators_error():
+    async def failing():
+        yield 1
+        raise ValueError("boom")
+
+    items = iterate_async(failing)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="boom"):
+        next(items)
+
+
+def test_iterate_async_closes_the_generator_when_the_caller_stops():
+    produced = []
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            while True:
+                produced.append(len(produced))
+                yield produced[-1]
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    items = iterate_async(endless)
+    assert [next(items), next(items)] == [0, 1]
+    items.close()
+    # Closed at its next yield rather than left running
+    assert closed.wait(timeout=5)
+    assert len(produced) <= 3
+
+
+class FakeStream:
+    """Streamed chat completion; records whether the HTTP stream was closed."""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def __iter__(self):
+        for text in self.parts:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeOpenAI:
+    def __init__(self, parts=("The budget ", "is $65,000."), error=None):
+        self.stream = FakeStream(parts)
+        self.error = error
+        self.embeddings = SimpleNamespace(create=self.embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.complete))
+
+    def embed(self, model, input):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(text)), 1.0]) for text in input])
+
+    def complete(self, **kwargs):
+        assert kwargs["stream"] is True
+        if self.error:
+            raise self.error
+        return self.stream
+
+
+class FakeRetriever:
+    def run(self, query_embedding):
+        return {"documents": [Document(id="budget", content="The budget is $65,000.", meta={"split_id": 0})]}
+
+
+@pytest.fixture
+def openai(monkeypatch):
+    client = FakeOpenAI()
+    monkeypatch.setattr(rfp_chatbot, "get_openai_client", lambda: client)
+    monkeypatch.setattr(rfp_chatbot, "get_embedding_retriever", lambda store, top_k: FakeRetriever())
+    get_answer_cache().invalidate(SESSION_ID)
+    yield client
+    get_answer_cache().invalidate(SESSION_ID)
+
+
+def test_chat_stream_sends_tokens_then_the_complete_answer(openai):
+    response = Client().post("/api/rfp/chat/stream/", {"question": "What is the budget?", "session_id": SESSION_ID},
+                             content_type="application/json")
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/event-stream"
+    events = parse_events(b"".join(response.streaming_content))
+    assert events[:2] == [("token", {"text": "The budget "}), ("token", {"text": "is $65,000."})]
+    event, result = events[2]
+    assert event == "complete" and len(events) == 3
+    assert result["answer"] == "The budget is $65,000."
+    assert result["debug_info"]["num_matches"] == 1
+    assert result["debug_info"]["cache"] == {"hit": False}
+    assert "first_token" in result["debug_info"]["timings"]
+    assert openai.stream.closed
+
+
+def test_chat_stream_accepts_get_for_event_source(openai):
+    response = Client().get("/api/rfp/chat/stream/", {"question": "What is the budget?", "session_id": SESSION_ID},
+                            HTTP_ACCEPT="text/event-stream")
+    assert [event for event, _ in parse_events(b"".join(response.streaming_content))] == ["token", "token", "complete"]
+
+
+def test_chat_stream_stops_generating_when_the_client_disconnects(openai):
+    response = Client().post("/api/rfp/chat/stream/", {"question": "What is the budget?", "session_id": SESSION_ID},
+                             content_type="application/json")
+    content = iter(response.streaming_content)
+    assert parse_events(next(content)) == [("token", {"text": "The budget "})]
+    # The server closes the response when the client goes away
+    response.close()
+    assert openai.stream.closed
+    # The answer was never finished, so it is not cached
+    assert get_answer_cache().lookup(SESSION_ID, [float(len("What is the budget?")), 1.0]) is None
+
+
+def test_chat_stream_reports_failures_as_an_error_event(openai):
+    openai.error = RuntimeError("rate limited")
+    response = Client().post("/api/rfp/chat/stream/", {"question": "What is the budget?", "session_id": SESSION_ID},
+                             content_type="application/json")
+    assert response.status_code == 200
+    [(event, data)] = parse_events(b"".join(response.streaming_content))
+    assert event == "error"
+    assert data["success"] is False
+    assert data["error"] == "rate limited"
+
+
+def test_chat_stream_requires_a_question(openai):
+    response = Client().post("/api/rfp/chat/stream/", {}, content_type="application/json")
+    assert response.status_code == 400
+    assert response.json() == {"error": "Question is required"}